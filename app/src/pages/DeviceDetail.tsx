@@ -162,6 +162,7 @@ interface Device {
   documentation: Documentation[];
   specification: Specification[];
   qr_code: string | null;
+  qr_url?: string | null;
 }
 
 const DeviceDetail = () => {
@@ -243,16 +244,16 @@ const DeviceDetail = () => {
   };
 
   const handleDownloadQR = () => {
-    if (device?.qr_code) {
+    if (device?.qr_url || device?.qr_code) {
       const link = document.createElement("a");
-      link.href = device.qr_code;
+      link.href = device.qr_url || device.qr_code;
       link.download = `device_${device.id}_qr.png`;
       link.click();
     }
   };
   const handlePrintQR = () => {
-    if (device?.qr_code) {
-      const printWindow = window.open(device.qr_code);
+    if (device?.qr_url || device?.qr_code) {
+      const printWindow = window.open(device.qr_url || device.qr_code);
       printWindow?.print();
     }
   };
@@ -586,10 +587,10 @@ const DeviceDetail = () => {
                             device.Room || "N/A"
                           )}
                         </dd>
-                        {device.qr_code && (
+                        {(device.qr_url || device.qr_code) && (
                         <div className="flex flex-col items-center space-y-2">
                           <img
-                            src={device.qr_code}
+                            src={device.qr_url || device.qr_code}
                             alt={`QR Code for ${device.make_model}`}
                             className="w-24 h-24 object-contain border rounded-md"
                           />
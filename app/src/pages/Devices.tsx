@@ -103,9 +103,16 @@ const Devices = () => {
 
     const fetchDevices = async () => {
       try {
-        const response = await axios.get(`${baseUrl}/api/${hospitalId}/devices/`, { headers });
-        setDevices(response.data);
-        setFilteredDevices(response.data);
+        // The registry is keyset-paginated; follow `next` until the last page
+        let url = `${baseUrl}/api/${hospitalId}/devices/?expand=calibrations,service_logs&limit=200`;
+        const allDevices: Device[] = [];
+        while (url) {
+          const response = await axios.get(url, { headers });
+          allDevices.push(...response.data.results);
+          url = response.data.next;
+        }
+        setDevices(allDevices);
+        setFilteredDevices(allDevices);
       } catch (error) {
         console.error('Fetch error:', error.response?.data);
         toast({ title: 'Error', description: 'Failed to fetch devices.', variant: 'destructive' });
@@ -35,6 +35,7 @@ interface InventoryItem {
   location: string;
   sku: string;
   qr_code: string | null;
+  qr_url?: string | null;
 }
 
 interface Category {
@@ -143,7 +144,19 @@ const Inventory = () => {
   });
 
   const exportMutation = useMutation<AxiosResponse<Blob>, unknown, void>({
-    mutationFn: () => axios.get(`${baseUrl}/api/${hospitalId}/inventory/export/`, { headers, responseType: 'blob' }),
+    // Export exactly what the list shows, across all pages
+    mutationFn: () => axios.get(`${baseUrl}/api/${hospitalId}/inventory/export/`, {
+      headers,
+      responseType: 'blob',
+      params: {
+        search: searchQuery || undefined,
+        category__id: filters.category || undefined,
+        stock_level: filters.stock_level || undefined,
+        expiry_soon: filters.expiry_soon || undefined,
+        location: filters.location || undefined,
+        ordering: `${sortConfig.direction === 'desc' ? '-' : ''}${sortConfig.key}`
+      }
+    }),
     onSuccess: (response) => {
       const url = window.URL.createObjectURL(new Blob([response.data]));
       const link = document.createElement('a');
@@ -245,9 +258,9 @@ const Inventory = () => {
   };
 
   const handleDownloadQR = (item: InventoryItem) => {
-    if (item.qr_code) {
+    if (item.qr_url || item.qr_code) {
       const link = document.createElement('a');
-      link.href = item.qr_code;
+      link.href = item.qr_url || item.qr_code;
       link.download = `item_${item.id}_qr.png`;
       document.body.appendChild(link);
       link.click();
@@ -256,8 +269,8 @@ const Inventory = () => {
   };
 
   const handlePrintQR = (item: InventoryItem) => {
-    if (item.qr_code) {
-      const printWindow = window.open(item.qr_code);
+    if (item.qr_url || item.qr_code) {
+      const printWindow = window.open(item.qr_url || item.qr_code);
       printWindow?.print();
       printWindow?.close();
     }
@@ -841,10 +854,10 @@ const Inventory = () => {
               <DialogHeader>
                 <DialogTitle>QR Code for {qrModalItem?.name}</DialogTitle>
               </DialogHeader>
-              {qrModalItem?.qr_code ? (
+              {(qrModalItem?.qr_url || qrModalItem?.qr_code) ? (
                 <div className="flex flex-col items-center gap-4">
                   <img
-                    src={qrModalItem.qr_code}
+                    src={qrModalItem.qr_url || qrModalItem.qr_code}
                     alt={`QR Code for ${qrModalItem.name}`}
                     className="w-48 h-48 object-contain border rounded-md"
                   />
@@ -3,6 +3,10 @@ ASGI config for backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Long-lived responses such as the dashboard event stream
+(dashboard.views.DashboardStreamView) should be served through this entry
+point, e.g. ``gunicorn backend.asgi:application -k uvicorn.workers.UvicornWorker``.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
@@ -0,0 +1,150 @@
+"""
+Opt-in SQL profiling per resolved URL name.
+
+Enable with ``QUERY_PROFILING = True``. Every request then records its query
+count, total database time and slowest statements into an in-memory ring
+buffer, readable by admins at ``/api/debug/sql-profile/``. ``QUERY_BUDGETS``
+maps URL names to the most queries a request may issue (``QUERY_BUDGET_DEFAULT``
+covers the rest); ``QUERY_BUDGET_ACTION`` is ``'log'`` or ``'raise'``, the
+latter meant for test runs.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import ExitStack
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+logger = logging.getLogger(__name__)
+
+SLOWEST_PER_REQUEST = 5
+SQL_PREVIEW_LENGTH = 500
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryProfile:
+    """Collects the statements of one request; used as a connection execute wrapper."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.total += duration
+            self.slowest.append((duration, sql[:SQL_PREVIEW_LENGTH]))
+            if len(self.slowest) > SLOWEST_PER_REQUEST * 4:
+                self.trim()
+
+    def trim(self):
+        self.slowest = sorted(self.slowest, reverse=True)[:SLOWEST_PER_REQUEST]
+
+
+class ProfileBuffer:
+    """Thread-safe ring buffer of per-request samples."""
+
+    def __init__(self, size):
+        self.samples = deque(maxlen=size)
+        self.lock = threading.Lock()
+
+    def add(self, url_name, profile):
+        profile.trim()
+        with self.lock:
+            self.samples.append((url_name, profile.count, profile.total, profile.slowest))
+
+    def clear(self):
+        with self.lock:
+            self.samples.clear()
+
+    def report(self):
+        with self.lock:
+            samples = list(self.samples)
+        grouped = defaultdict(list)
+        for url_name, count, total, slowest in samples:
+            grouped[url_name].append((count, total, slowest))
+
+        report = {}
+        for url_name, rows in grouped.items():
+            counts = [count for count, _, _ in rows]
+            totals = [total for _, total, _ in rows]
+            slowest = sorted((s for _, _, statements in rows for s in statements), reverse=True)
+            budget = get_budget(url_name)
+            report[url_name] = {
+                "requests": len(rows),
+                "avg_queries": round(sum(counts) / len(rows), 1),
+                "max_queries": max(counts),
+                "avg_db_ms": round(sum(totals) / len(rows) * 1000, 2),
+                "max_db_ms": round(max(totals) * 1000, 2),
+                "budget": budget,
+                "over_budget": sum(1 for count in counts if budget is not None and count > budget),
+                "slowest": [
+                    {"ms": round(duration * 1000, 2), "sql": sql}
+                    for duration, sql in slowest[:SLOWEST_PER_REQUEST]
+                ],
+            }
+        return dict(sorted(report.items(), key=lambda item: item[1]['avg_db_ms'], reverse=True))
+
+
+buffer = ProfileBuffer(getattr(settings, 'QUERY_PROFILING_BUFFER_SIZE', 1000))
+
+
+def get_budget(url_name):
+    return getattr(settings, 'QUERY_BUDGETS', {}).get(url_name, getattr(settings, 'QUERY_BUDGET_DEFAULT', None))
+
+
+class QueryProfilingMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_PROFILING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profile = QueryProfile()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(profile))
+            response = self.get_response(request)
+
+        match = getattr(request, 'resolver_match', None)
+        url_name = (match.view_name if match else None) or request.path
+        buffer.add(url_name, profile)
+        self.check_budget(url_name, profile)
+        return response
+
+    def check_budget(self, url_name, profile):
+        budget = get_budget(url_name)
+        if budget is None or profile.count <= budget:
+            return
+        message = f"{url_name} issued {profile.count} queries (budget {budget})"
+        if getattr(settings, 'QUERY_BUDGET_ACTION', 'log') == 'raise':
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+class QueryProfileReportView(APIView):
+    """Admin-only JSON report of the profiling buffer; DELETE clears it."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            "enabled": getattr(settings, 'QUERY_PROFILING', False),
+            "views": buffer.report(),
+        })
+
+    def delete(self, request):
+        buffer.clear()
+        return Response(status=204)
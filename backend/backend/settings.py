@@ -53,6 +53,7 @@ INSTALLED_APPS = [
     'patient.apps.PatientConfig',
     'ml_test.apps.MlTestConfig',
     'dashboard.apps.DashboardConfig',
+    'qrcodes.apps.QrcodesConfig',
 ]
 
 MIDDLEWARE = [
@@ -64,6 +65,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'backend.profiling.QueryProfilingMiddleware',
 ]
 
 REST_FRAMEWORK = {
@@ -123,10 +125,99 @@ else:
         'PORT': '5432',
     }
 }
-    
 
 
-    
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Local memory by default; set REDIS_URL (requires the redis package) to share
+# the cache across gunicorn workers. Dashboard streams pick up changes from
+# other workers through the stored HospitalChangeCounter, with or without it.
+
+REDIS_URL = config('REDIS_URL', default='')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'meditrackpro',
+        }
+    }
+
+DASHBOARD_CACHE_ALIAS = 'default'
+DASHBOARD_CACHE_TIMEOUT = config('DASHBOARD_CACHE_TIMEOUT', default=60, cast=int)
+# MTBF/MTTR reports (dashboard/reliability.py); dropped on incident and service
+# changes and rewarmed by `manage.py compute_reliability`
+RELIABILITY_CACHE_TIMEOUT = config('RELIABILITY_CACHE_TIMEOUT', default=6 * 60 * 60, cast=int)
+
+
+# SQL profiling (see backend/profiling.py)
+# Off by default; the report is served to admins at /api/debug/sql-profile/.
+
+QUERY_PROFILING = config('QUERY_PROFILING', default=False, cast=bool)
+QUERY_PROFILING_BUFFER_SIZE = 1000
+QUERY_BUDGET_DEFAULT = None
+QUERY_BUDGETS = {
+    'dashboard-stats': 12,
+    'dashboard-group': 10,
+}
+# 'raise' makes an overrun fail the request; the dashboard tests turn it on
+# themselves, other runs can with QUERY_PROFILING=1 QUERY_BUDGET_ACTION=raise
+QUERY_BUDGET_ACTION = config('QUERY_BUDGET_ACTION', default='log')
+
+
+# QR codes (see qrcodes/)
+# Codes are rendered on demand through a size-capped disk cache. Set
+# QR_STORE_IMAGES to also keep a PNG per device/item in MEDIA_ROOT, rendered by
+# the queue. By default (QR_WORKER 'command') the queue is drained by a
+# separate `manage.py process_qr_jobs` process, which keeps polling; 'thread'
+# instead starts a background worker in every process that queues a job.
+
+QR_CACHE_DIR = config('QR_CACHE_DIR', default=str(BASE_DIR / 'cache' / 'qr'))
+QR_CACHE_MAX_BYTES = config('QR_CACHE_MAX_BYTES', default=256 * 1024 * 1024, cast=int)
+QR_STORE_IMAGES = config('QR_STORE_IMAGES', default=False, cast=bool)
+QR_WORKER = config('QR_WORKER', default='command')
+QR_BATCH_SIZE = 50
+QR_RENDER_THREADS = 4
+
+
+# Preventive maintenance (see device/scheduler.py)
+# `manage.py schedule_calibrations` books calibrations due within PM_HORIZON_DAYS;
+# PM_SCHEDULER 'thread' also runs it every PM_SCHEDULER_INTERVAL seconds in each
+# process (reruns are no-ops, so several processes are safe).
+
+PM_HORIZON_DAYS = config('PM_HORIZON_DAYS', default=14, cast=int)
+PM_CREATE_TICKETS = config('PM_CREATE_TICKETS', default=False, cast=bool)
+PM_SCHEDULER = config('PM_SCHEDULER', default=None)
+PM_SCHEDULER_INTERVAL = 3600
+
+
+# Logging
+# App loggers write one key=value line per record to stderr. LOG_LEVEL=DEBUG
+# adds per-record traces such as device next_calibration changes.
+
+LOG_LEVEL = config('LOG_LEVEL', default='INFO')
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'keyvalue': {'format': 'time=%(asctime)s level=%(levelname)s logger=%(name)s %(message)s'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'keyvalue'},
+    },
+    'loggers': {
+        app: {'handlers': ['console'], 'level': LOG_LEVEL, 'propagate': False}
+        for app in ('backend', 'device', 'qrcodes')
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
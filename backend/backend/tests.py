@@ -0,0 +1,68 @@
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from hospitals.testing import create_hospital, create_user
+from .profiling import QueryBudgetExceeded, QueryProfilingMiddleware, buffer
+
+
+@override_settings(QUERY_PROFILING=True, QUERY_BUDGETS={}, QUERY_BUDGET_DEFAULT=None)
+class QueryProfilingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_user(is_staff=True)
+        cls.user = create_user('user@example.com')
+        cls.hospital = create_hospital(cls.admin)
+
+    def setUp(self):
+        cache.clear()
+        buffer.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.stats_url = reverse('dashboard-stats', kwargs={'hospital_id': self.hospital.id})
+        self.report_url = reverse('sql-profile')
+
+    def test_disabled_middleware_is_not_used(self):
+        with override_settings(QUERY_PROFILING=False):
+            with self.assertRaises(MiddlewareNotUsed):
+                QueryProfilingMiddleware(lambda request: None)
+
+    def test_records_queries_per_url_name(self):
+        self.client.get(self.stats_url)
+        self.client.get(self.stats_url)
+        stats = buffer.report()['dashboard-stats']
+        self.assertEqual(stats['requests'], 2)
+        self.assertGreater(stats['max_queries'], 0)
+        self.assertGreaterEqual(stats['max_db_ms'], stats['avg_db_ms'])
+        self.assertTrue(stats['slowest'])
+        self.assertEqual(stats['slowest'][0]['ms'], max(s['ms'] for s in stats['slowest']))
+        self.assertIsNone(stats['budget'])
+
+    def test_report_is_admin_only_and_delete_resets(self):
+        self.client.get(self.stats_url)
+        response = self.client.get(self.report_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['enabled'])
+        self.assertIn('dashboard-stats', response.data['views'])
+
+        other = APIClient()
+        other.force_authenticate(self.user)
+        self.assertEqual(other.get(self.report_url).status_code, 403)
+        self.assertEqual(other.delete(self.report_url).status_code, 403)
+
+        self.assertEqual(self.client.delete(self.report_url).status_code, 204)
+        self.assertNotIn('dashboard-stats', buffer.report())
+
+    def test_budget_overrun_raises(self):
+        with override_settings(QUERY_BUDGETS={'dashboard-stats': 1}, QUERY_BUDGET_ACTION='raise'):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(self.stats_url)
+            self.assertEqual(buffer.report()['dashboard-stats']['over_budget'], 1)
+
+    def test_budget_overrun_is_logged(self):
+        with override_settings(QUERY_BUDGETS={'dashboard-stats': 1}, QUERY_BUDGET_ACTION='log'):
+            with self.assertLogs('backend.profiling', 'WARNING') as logs:
+                response = self.client.get(self.stats_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('dashboard-stats issued', logs.output[0])
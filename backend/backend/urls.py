@@ -3,6 +3,7 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from .profiling import QueryProfileReportView
 
 
 urlpatterns = [
@@ -17,7 +18,9 @@ urlpatterns = [
     path('api/', include('patient.urls')),
     path('api/', include('ml_test.urls')),
     path('api/', include('dashboard.urls')),
+    path('api/', include('qrcodes.urls')),
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('api/debug/sql-profile/', QueryProfileReportView.as_view(), name='sql-profile'),
 
 ]   + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
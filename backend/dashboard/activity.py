@@ -0,0 +1,44 @@
+from .models import ActivityEvent
+
+
+def actor_name(employee):
+    if employee is None:
+        return 'System'
+    return employee.user.get_full_name() or employee.user.username
+
+
+def activity_event(hospital_id, kind, action, item, actor=None, target=None):
+    """An unsaved event, for callers that write many at once with bulk_create."""
+    return ActivityEvent(
+        hospital_id=hospital_id,
+        kind=kind,
+        actor=actor,
+        actor_name=actor_name(actor),
+        action=action,
+        item=str(item)[:255],
+        target_type=target._meta.model_name if target is not None else '',
+        target_id=target.pk if target is not None else None,
+    )
+
+
+def record_activity(hospital_id, kind, action, item, actor=None, target=None):
+    """Append one event to a hospital's activity feed."""
+    event = activity_event(hospital_id, kind, action, item, actor=actor, target=target)
+    event.save()
+    return event
+
+
+def serialize_activity(event):
+    return {
+        "id": f"evt-{event['id']}",
+        "user": event['actor_name'],
+        "action": event['action'],
+        "item": event['item'],
+        "time": event['created_at'].isoformat(),
+    }
+
+
+def recent_activity(hospital_id, limit=5):
+    events = ActivityEvent.objects.filter(hospital_id=hospital_id) \
+        .values('id', 'actor_name', 'action', 'item', 'created_at')[:limit]
+    return [serialize_activity(event) for event in events]
@@ -1,3 +1,7 @@
 from django.contrib import admin
+from .models import DailyHospitalMetrics, MonthlyChartCounter, ActivityEvent, Alert
 
-# Register your models here.
+admin.site.register(DailyHospitalMetrics)
+admin.site.register(MonthlyChartCounter)
+admin.site.register(ActivityEvent)
+admin.site.register(Alert)
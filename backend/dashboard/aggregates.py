@@ -0,0 +1,174 @@
+from inventory.models import InventoryItem
+from device.models import Device, Calibration
+from suppliers.models import Supplier
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber
+from .activity import recent_activity
+from .models import DailyHospitalMetrics, MonthlyChartCounter, Alert
+from django.utils import timezone
+
+BASELINE_FIELDS = ('total_inventory_items', 'low_stock_items', 'devices_under_maintenance', 'active_suppliers')
+
+
+def build_metric_cards(counts, baseline=None):
+    """
+    Shape the metric-card section from current counts and the optional
+    DailyHospitalMetrics baseline; both use the BASELINE_FIELDS names.
+    """
+    def change(field):
+        return counts[field] - baseline[field] if baseline else 0
+
+    return {
+        "total_inventory_items": counts['total_inventory_items'],
+        "devices_under_maintenance": counts['devices_under_maintenance'],
+        "low_stock_alerts": counts['low_stock_items'],
+        "active_suppliers": counts['active_suppliers'],
+        "trends": {
+            "low_stock_change": change('low_stock_items'),
+            "total_inventory_change": change('total_inventory_items'),
+            "devices_under_maintenance_change": change('devices_under_maintenance'),
+            "active_suppliers_change": change('active_suppliers'),
+        }
+    }
+
+
+class DashboardAggregator:
+    """
+    Builds the DashboardStatsView payload for one hospital.
+
+    Every count the metric cards need is folded into a single conditional
+    aggregate (Count(filter=Q(...))) per table, so a dashboard load costs one
+    round-trip per table instead of one per number.
+    """
+    SECTIONS = (
+        'metrics', 'alerts', 'upcoming_maintenance',
+        'inventory_categories', 'charts', 'recent_activity',
+    )
+    ALERT_LIMIT = 3
+    # Alert type -> the dashboard "type" the frontend groups by
+    ALERT_KINDS = {
+        Alert.LOW_STOCK: 'inventory',
+        Alert.EXPIRING: 'inventory',
+        Alert.CALIBRATION_DUE: 'device',
+    }
+
+    def __init__(self, hospital_id, today=None):
+        self.hospital_id = hospital_id
+        self.today = today or timezone.now().date()
+        self.first_day_current_month = self.today.replace(day=1)
+        self._inventory_counts = None
+        self._device_counts = None
+
+    # --- Per-table aggregates ---
+
+    def inventory_counts(self):
+        if self._inventory_counts is None:
+            self._inventory_counts = InventoryItem.objects.filter(hospital_id=self.hospital_id).aggregate(
+                total=Count('id'),
+                low_stock=Count('id', filter=Q(stock_level='Low')),
+            )
+        return self._inventory_counts
+
+    def device_counts(self):
+        if self._device_counts is None:
+            self._device_counts = Device.objects.filter(hospital_id=self.hospital_id).aggregate(
+                under_maintenance=Count('id', filter=Q(is_active='Under_Maintenance')),
+            )
+        return self._device_counts
+
+    def supplier_counts(self):
+        return Supplier.objects.filter(hospital_id=self.hospital_id).aggregate(
+            active=Count('id', filter=Q(status='Active')),
+        )
+
+    def baseline_metrics(self):
+        """The last daily rollup recorded before the current month started."""
+        return DailyHospitalMetrics.objects.filter(
+            hospital_id=self.hospital_id, date__lt=self.first_day_current_month
+        ).order_by('-date').values(*BASELINE_FIELDS).first()
+
+    # --- Sections ---
+
+    def metrics(self):
+        inventory = self.inventory_counts()
+        counts = {
+            'total_inventory_items': inventory['total'],
+            'low_stock_items': inventory['low_stock'],
+            'devices_under_maintenance': self.device_counts()['under_maintenance'],
+            'active_suppliers': self.supplier_counts()['active'],
+        }
+        return build_metric_cards(counts, self.baseline_metrics())
+
+    def alerts(self):
+        # Open alerts are materialized by dashboard.alerts; take the first few
+        # of each type in one query by ranking within each type
+        open_alerts = Alert.objects.filter(hospital_id=self.hospital_id, is_open=True) \
+            .annotate(rank=Window(
+                RowNumber(), partition_by=F('type'),
+                order_by=[F('due_date').asc(nulls_last=True), F('updated_at').desc()],
+            )) \
+            .filter(rank__lte=self.ALERT_LIMIT) \
+            .values('id', 'type', 'target_id', 'priority', 'title', 'description', 'due_date', 'updated_at')
+        alerts = []
+        for alert in open_alerts:
+            kind = self.ALERT_KINDS[alert['type']]
+            alerts.append({
+                "id": f"{kind[:3]}-{alert['id']}", "type": kind, "priority": alert['priority'],
+                "alert_type": alert['type'],
+                "title": alert['title'],
+                "description": alert['description'],
+                "time": (alert['due_date'] or alert['updated_at']).isoformat()
+            })
+        return sorted(alerts, key=lambda x: x['time'], reverse=True)
+
+    def upcoming_maintenance(self):
+        upcoming_cal = Calibration.objects.filter(
+            device__hospital_id=self.hospital_id, status='scheduled', calibration_date__gte=self.today
+        ).select_related('device').order_by('calibration_date')[:self.ALERT_LIMIT]
+        return [
+            {
+                "id": f"cal-{cal.id}",
+                "device": cal.device.make_model,
+                "type": "Calibration",
+                "date": cal.calibration_date.isoformat(),
+                "status": "scheduled"
+            }
+            for cal in upcoming_cal
+        ]
+
+    def inventory_categories(self):
+        total_item_count = self.inventory_counts()['total']
+        if not total_item_count:
+            return []
+        # Group the items rather than annotating categories so the total above is reused
+        categories = InventoryItem.objects.filter(hospital_id=self.hospital_id, category__isnull=False) \
+            .values('category__name') \
+            .annotate(item_count=Count('id')) \
+            .order_by('-item_count')
+        return [
+            {
+                "name": cat['category__name'],
+                "percentage": round((cat['item_count'] / total_item_count) * 100, 1)
+            }
+            for cat in categories
+        ]
+
+    def charts(self):
+        # Monthly counters are maintained incrementally (see dashboard.signals),
+        # so this reads one row per month instead of grouping the history
+        counters = MonthlyChartCounter.objects.filter(
+            hospital_id=self.hospital_id, value__gt=0
+        ).order_by('month').values_list('metric', 'month', 'value')
+
+        charts = {"inventory_overview": [], "maintenance_overview": [], "stock_in_overview": [], "stock_out_overview": []}
+        for metric, month, value in counters:
+            charts[f"{metric}_overview"].append({"name": month.strftime('%b'), "value": value})
+        return charts
+
+    def recent_activity(self):
+        return recent_activity(self.hospital_id)
+
+    def build(self, sections=None):
+        """Return the dashboard payload, computing only ``sections`` if given."""
+        sections = sections or self.SECTIONS
+        return {name: getattr(self, name)() for name in self.SECTIONS if name in sections}
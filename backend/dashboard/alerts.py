@@ -0,0 +1,156 @@
+from datetime import timedelta
+from django.db import transaction
+from django.utils import timezone
+from inventory.models import InventoryItem
+from device.models import Device
+from .cache import invalidate_dashboard
+from .models import Alert
+
+ALERT_WINDOW_DAYS = 30
+
+INVENTORY = 'inventoryitem'
+DEVICE = 'device'
+
+
+def desired_inventory_alerts(item, today):
+    """The alerts an inventory item should currently have, keyed by type."""
+    desired = {}
+    if item.quantity <= item.reorder_level:
+        desired[Alert.LOW_STOCK] = {
+            'priority': 'high',
+            'title': 'Low stock alert',
+            'description': f"{item.name} is running low ({item.quantity} remaining)",
+            'due_date': None,
+        }
+    if item.expiry_date and item.expiry_date <= today + timedelta(days=ALERT_WINDOW_DAYS):
+        expired = item.expiry_date < today
+        desired[Alert.EXPIRING] = {
+            'priority': 'high' if expired else 'medium',
+            'title': 'Stock expired' if expired else 'Stock expiring soon',
+            'description': f"{item.name} ({item.batch or item.sku}) expires on {item.expiry_date.isoformat()}",
+            'due_date': item.expiry_date,
+        }
+    return desired
+
+
+def desired_device_alerts(device, today):
+    desired = {}
+    if device.next_calibration and device.next_calibration <= today + timedelta(days=ALERT_WINDOW_DAYS):
+        overdue = device.next_calibration < today
+        desired[Alert.CALIBRATION_DUE] = {
+            'priority': 'high' if overdue else 'medium',
+            'title': 'Calibration overdue' if overdue else 'Calibration due',
+            'description': f"{device.make_model} (SN: {device.serial_number}) requires calibration",
+            'due_date': device.next_calibration,
+        }
+    return desired
+
+
+def reconcile(targets, existing, touched=None):
+    """
+    Bring open alerts in line with ``targets``, a dict of
+    (target_type, target_id) -> (hospital_id, {type: fields}). ``existing`` is
+    every open alert for those targets. Returns (opened, updated, resolved);
+    hospitals with a changed alert are added to the ``touched`` set if given.
+    """
+    now = timezone.now()
+    current = {(a.target_type, a.target_id, a.type): a for a in existing}
+    to_create, to_update, to_resolve = [], [], []
+
+    for (target_type, target_id), (hospital_id, desired) in targets.items():
+        for alert_type, fields in desired.items():
+            alert = current.pop((target_type, target_id, alert_type), None)
+            if alert is None:
+                to_create.append(Alert(hospital_id=hospital_id, type=alert_type, target_type=target_type,
+                                       target_id=target_id, **fields))
+            elif any(getattr(alert, name) != value for name, value in fields.items()):
+                for name, value in fields.items():
+                    setattr(alert, name, value)
+                alert.updated_at = now
+                to_update.append(alert)
+    # Whatever is left no longer matches a condition
+    to_resolve = [alert.pk for alert in current.values()]
+    if touched is not None:
+        touched.update(alert.hospital_id for alert in to_create + to_update + list(current.values()))
+
+    with transaction.atomic():
+        if to_resolve:
+            Alert.objects.filter(pk__in=to_resolve).update(is_open=False, resolved_at=now, updated_at=now)
+        if to_update:
+            Alert.objects.bulk_update(to_update, ['priority', 'title', 'description', 'due_date', 'updated_at'],
+                                      batch_size=500)
+        if to_create:
+            Alert.objects.bulk_create(to_create, batch_size=500)
+    return len(to_create), len(to_update), len(to_resolve)
+
+
+def _open_alerts(target_type, target_ids):
+    return Alert.objects.filter(is_open=True, target_type=target_type, target_id__in=target_ids)
+
+
+def refresh_inventory_alerts(items, today=None, touched=None):
+    today = today or timezone.now().date()
+    targets = {(INVENTORY, item.pk): (item.hospital_id, desired_inventory_alerts(item, today)) for item in items}
+    return reconcile(targets, _open_alerts(INVENTORY, [item.pk for item in items]), touched)
+
+
+def refresh_device_alerts(devices, today=None, touched=None):
+    today = today or timezone.now().date()
+    targets = {(DEVICE, device.pk): (device.hospital_id, desired_device_alerts(device, today)) for device in devices}
+    return reconcile(targets, _open_alerts(DEVICE, [device.pk for device in devices]), touched)
+
+
+def resolve_target_alerts(target_type, target_id):
+    now = timezone.now()
+    Alert.objects.filter(is_open=True, target_type=target_type, target_id=target_id) \
+        .update(is_open=False, resolved_at=now, updated_at=now)
+
+
+def _chunks(queryset, size):
+    batch = []
+    for obj in queryset.iterator(chunk_size=size):
+        batch.append(obj)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def sweep_alerts(today=None, full=False, chunk_size=1000):
+    """
+    Re-evaluate rows whose alerts can change with the date alone: anything
+    inside the expiry/calibration window plus targets that already have an open
+    time-based alert. ``full`` re-evaluates every row, catching changes made by
+    bulk updates that bypass save signals. Dashboards of the hospitals whose
+    alerts changed are invalidated on commit.
+    """
+    today = today or timezone.now().date()
+    horizon = today + timedelta(days=ALERT_WINDOW_DAYS)
+    items = InventoryItem.objects.only(
+        'id', 'hospital_id', 'name', 'sku', 'batch', 'quantity', 'reorder_level', 'expiry_date'
+    )
+    devices = Device.objects.only('id', 'hospital_id', 'make_model', 'serial_number', 'next_calibration')
+    if not full:
+        open_items = Alert.objects.filter(is_open=True, type=Alert.EXPIRING).values('target_id')
+        open_devices = Alert.objects.filter(is_open=True, type=Alert.CALIBRATION_DUE).values('target_id')
+        items = items.filter(expiry_date__lte=horizon) | items.filter(id__in=open_items)
+        devices = devices.filter(next_calibration__lte=horizon) | devices.filter(id__in=open_devices)
+
+    totals, touched = [0, 0, 0], set()
+    for batch in _chunks(items.order_by('id'), chunk_size):
+        totals = [a + b for a, b in zip(totals, refresh_inventory_alerts(batch, today, touched))]
+    for batch in _chunks(devices.order_by('id'), chunk_size):
+        totals = [a + b for a, b in zip(totals, refresh_device_alerts(batch, today, touched))]
+    if full:
+        # Targets that were deleted without signals firing
+        stale = Alert.objects.filter(is_open=True, target_type=INVENTORY).exclude(
+            target_id__in=InventoryItem.objects.values('id')
+        ) | Alert.objects.filter(is_open=True, target_type=DEVICE).exclude(
+            target_id__in=Device.objects.values('id')
+        )
+        touched.update(stale.values_list('hospital_id', flat=True).distinct())
+        totals[2] += stale.update(is_open=False, resolved_at=timezone.now())
+    for hospital_id in touched:
+        invalidate_dashboard(hospital_id)
+    return tuple(totals)
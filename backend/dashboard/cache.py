@@ -0,0 +1,162 @@
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F
+from django.dispatch import Signal
+from django.utils import timezone
+from hospitals.models import Hospital
+from .aggregates import DashboardAggregator
+from .models import HospitalChangeCounter
+
+# Snapshots are stored under the hospital's current generation, mirrored in the
+# cache from its HospitalChangeCounter version, so invalidating is one atomic
+# increment and stale snapshots simply age out.
+GENERATION_KEY = 'dashboard:gen:{hospital_id}'
+SNAPSHOT_KEY = 'dashboard:snapshot:{hospital_id}:{generation}'
+METRICS_KEY = 'dashboard:metrics:{hospital_id}:{generation}'
+
+LOCK_TIMEOUT = 10  # seconds a rebuild may hold the lock
+WAIT_INTERVAL = 0.05  # seconds between polls while another worker rebuilds
+
+# Sent with hospital_id after a hospital's cached dashboard is invalidated
+dashboard_invalidated = Signal()
+
+
+def get_cache():
+    return caches[getattr(settings, 'DASHBOARD_CACHE_ALIAS', 'default')]
+
+
+def get_timeout():
+    return getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 60)
+
+
+def current_version(hospital_id):
+    """Return (version, changed_at) from the hospital's change counter, or None."""
+    return HospitalChangeCounter.objects.filter(hospital_id=hospital_id) \
+        .values_list('version', 'changed_at').first()
+
+
+def get_generation(hospital_id):
+    cache = get_cache()
+    key = GENERATION_KEY.format(hospital_id=hospital_id)
+    generation = cache.get(key)
+    if generation is None:
+        version = current_version(hospital_id)
+        cache.add(key, version[0] if version else 0, timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def get_generations(hospital_ids):
+    """Bulk form of get_generation: one cache round-trip, plus one query for any misses."""
+    cache = get_cache()
+    keys = {GENERATION_KEY.format(hospital_id=hospital_id): hospital_id for hospital_id in hospital_ids}
+    generations = {keys[key]: generation for key, generation in cache.get_many(keys).items()}
+    missing = [hospital_id for hospital_id in hospital_ids if hospital_id not in generations]
+    if missing:
+        versions = dict(HospitalChangeCounter.objects.filter(hospital_id__in=missing)
+                        .values_list('hospital_id', 'version'))
+        for hospital_id in missing:
+            key = GENERATION_KEY.format(hospital_id=hospital_id)
+            cache.add(key, versions.get(hospital_id, 0), timeout=None)
+            generations[hospital_id] = cache.get(key)
+    return generations
+
+
+def get_cached_metrics(hospital_ids):
+    """
+    Return ({hospital_id: metric cards} for cache hits, generations). A full
+    dashboard snapshot counts as a hit too since it embeds the metric cards.
+    """
+    cache = get_cache()
+    generations = get_generations(hospital_ids)
+    keys = {}
+    for hospital_id, generation in generations.items():
+        keys[METRICS_KEY.format(hospital_id=hospital_id, generation=generation)] = hospital_id
+        keys[SNAPSHOT_KEY.format(hospital_id=hospital_id, generation=generation)] = hospital_id
+    hits = {}
+    for key, value in cache.get_many(keys).items():
+        hits[keys[key]] = value['metrics'] if key.startswith('dashboard:snapshot:') else value
+    return hits, generations
+
+
+def set_cached_metrics(metrics, generations):
+    get_cache().set_many({
+        METRICS_KEY.format(hospital_id=hospital_id, generation=generations[hospital_id]): cards
+        for hospital_id, cards in metrics.items()
+    }, timeout=get_timeout())
+
+
+def bump_version(hospital_id):
+    """Increment the hospital's change counter and return the new version (None if it is gone)."""
+    now = timezone.now()
+    counters = HospitalChangeCounter.objects.filter(hospital_id=hospital_id)
+    if not counters.update(version=F('version') + 1, changed_at=now):
+        if not Hospital.objects.filter(id=hospital_id).exists():
+            return None
+        HospitalChangeCounter.objects.bulk_create(
+            [HospitalChangeCounter(hospital_id=hospital_id, version=0, changed_at=now)], ignore_conflicts=True
+        )
+        counters.update(version=F('version') + 1, changed_at=now)
+    return counters.values_list('version', flat=True).first()
+
+
+def invalidate_dashboard(hospital_id):
+    """Drop the cached dashboard for a hospital once the current transaction commits."""
+    def bump():
+        version = bump_version(hospital_id)
+        if version is None:
+            return
+        get_cache().set(GENERATION_KEY.format(hospital_id=hospital_id), version, timeout=None)
+        dashboard_invalidated.send(sender=None, hospital_id=hospital_id)
+    transaction.on_commit(bump)
+
+
+def get_dashboard_snapshot(hospital_id, build=None, sections=None, generation=None):
+    """
+    Return the dashboard payload for a hospital, rebuilding it at most once
+    per generation no matter how many requests miss at the same time.
+    ``sections`` limits the payload (and the work) to those sections; a cached
+    full snapshot still serves such requests.
+    """
+    cache = get_cache()
+    if generation is None:
+        generation = get_generation(hospital_id)
+    snapshot_key = SNAPSHOT_KEY.format(hospital_id=hospital_id, generation=generation)
+    sections = tuple(name for name in DashboardAggregator.SECTIONS if name in sections) if sections else None
+
+    if sections and sections != DashboardAggregator.SECTIONS:
+        full = cache.get(snapshot_key)
+        if full is not None:
+            return {name: full[name] for name in sections}
+        snapshot_key = f"{snapshot_key}:{','.join(sections)}"
+    build = build or (lambda: DashboardAggregator(hospital_id).build(sections))
+
+    payload = cache.get(snapshot_key)
+    if payload is not None:
+        return payload
+
+    lock_key = f"{snapshot_key}:lock"
+    if cache.add(lock_key, 1, timeout=LOCK_TIMEOUT):
+        try:
+            payload = build()
+            cache.set(snapshot_key, payload, timeout=get_timeout())
+        finally:
+            cache.delete(lock_key)
+        return payload
+
+    # Another worker is rebuilding this generation; wait for its result
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        payload = cache.get(snapshot_key)
+        if payload is not None:
+            return payload
+        if not cache.get(lock_key):
+            break
+    payload = cache.get(snapshot_key)
+    if payload is not None:
+        return payload
+    # The rebuild failed or timed out; serve a fresh payload without caching it
+    return build()
@@ -0,0 +1,70 @@
+from datetime import datetime
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from inventory.models import InventoryItem, StockMovement
+from device.models import ServiceLog
+from .models import MonthlyChartCounter
+
+
+def month_of(value):
+    """First day of the month containing a date or datetime, in the current timezone."""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        value = timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+    return value.replace(day=1)
+
+
+def bump(hospital_id, metric, month, delta):
+    """Atomically add ``delta`` to one month's counter, creating it if needed."""
+    if not month or not delta:
+        return
+    counter, created = MonthlyChartCounter.objects.get_or_create(
+        hospital_id=hospital_id, metric=metric, month=month, defaults={'value': delta}
+    )
+    if not created:
+        MonthlyChartCounter.objects.filter(pk=counter.pk).update(value=F('value') + delta)
+
+
+def move(hospital_id, metric, old_month, new_month):
+    """Move one row's contribution from ``old_month`` to ``new_month`` (either may be None)."""
+    if old_month == new_month:
+        return
+    bump(hospital_id, metric, old_month, -1)
+    bump(hospital_id, metric, new_month, 1)
+
+
+def rebuild_chart_counters(hospital_ids=None):
+    """Recompute every counter from the live tables. Used for backfill and drift repair."""
+    items = InventoryItem.objects.all()
+    logs = ServiceLog.objects.filter(status='completed')
+    movements = StockMovement.objects.all()
+    counters = MonthlyChartCounter.objects.all()
+    if hospital_ids is not None:
+        items = items.filter(hospital_id__in=hospital_ids)
+        logs = logs.filter(device__hospital_id__in=hospital_ids)
+        movements = movements.filter(hospital_id__in=hospital_ids)
+        counters = counters.filter(hospital_id__in=hospital_ids)
+
+    movement_months = movements.annotate(month=TruncMonth('created_at')).values('hospital_id', 'month')
+    sources = [
+        (MonthlyChartCounter.INVENTORY, items.annotate(month=TruncMonth('last_updated'))
+            .values('hospital_id', 'month'), Count('id')),
+        (MonthlyChartCounter.MAINTENANCE, logs.annotate(month=TruncMonth('service_date'))
+            .values('month', hospital_id=F('device__hospital_id')), Count('id')),
+        (MonthlyChartCounter.STOCK_IN, movement_months.filter(quantity__gt=0), Sum('quantity')),
+        (MonthlyChartCounter.STOCK_OUT, movement_months.filter(quantity__lt=0), -Sum('quantity')),
+    ]
+    rows = []
+    for metric, queryset, value in sources:
+        for row in queryset.annotate(value=value).order_by():
+            rows.append(MonthlyChartCounter(
+                hospital_id=row['hospital_id'], metric=metric, month=month_of(row['month']), value=row['value'],
+            ))
+
+    with transaction.atomic():
+        counters.delete()
+        MonthlyChartCounter.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
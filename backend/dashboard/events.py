@@ -0,0 +1,131 @@
+import asyncio
+import json
+import threading
+import time
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.dispatch import receiver
+from .cache import current_version, dashboard_invalidated, get_dashboard_snapshot
+
+# Sections worth pushing live; the rest change rarely enough for a refetch
+STREAM_SECTIONS = ('metrics', 'alerts', 'recent_activity')
+
+
+def stored_version(hospital_id):
+    version = current_version(hospital_id)
+    return version[0] if version else 0
+
+
+def format_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+
+
+class _HospitalGroup:
+    def __init__(self, loop):
+        self.loop = loop
+        self.subscribers = set()
+        self.last = None
+        self.version = None  # HospitalChangeCounter version behind ``last``
+        self.checked_at = 0.0
+        self.refresh_pending = False
+
+
+class DashboardBroadcaster:
+    """
+    In-process channel layer for dashboard streams.
+
+    Subscribers of a hospital share one group: when the hospital's data
+    changes the payload is rebuilt once, diffed against the last broadcast and
+    only the changed sections are fanned out to every subscriber queue.
+    Notifications may come from any thread (signal handlers run in request
+    threads); they are handed to the group's event loop and coalesced while a
+    refresh is already queued.
+
+    The dashboard_invalidated signal only fires in the process that saved the
+    change. Changes saved by other workers or management commands are picked
+    up by check(), which streams call on every keep-alive tick and which
+    compares the hospital's stored change counter with the version last
+    broadcast. Payloads are built for that stored version, so a process whose
+    cache has not seen the change still rebuilds.
+    """
+    CHECK_INTERVAL = 5  # seconds; a group reads its counter at most this often
+
+    def __init__(self, build=None, version=None):
+        self.build = build or get_dashboard_snapshot
+        self.version = version or stored_version
+        self._groups = {}
+        self._lock = threading.Lock()
+
+    async def subscribe(self, hospital_id):
+        """Join a hospital's group and return (queue, current streamed sections)."""
+        queue = asyncio.Queue()
+        with self._lock:
+            group = self._groups.get(hospital_id)
+            if group is None:
+                group = self._groups[hospital_id] = _HospitalGroup(asyncio.get_running_loop())
+            group.subscribers.add(queue)
+        if group.last is None:
+            group.version = await sync_to_async(self.version)(hospital_id)
+            group.last = self._select(await sync_to_async(self.build)(
+                hospital_id, sections=STREAM_SECTIONS, generation=group.version,
+            ))
+        return queue, group.last
+
+    def unsubscribe(self, hospital_id, queue):
+        with self._lock:
+            group = self._groups.get(hospital_id)
+            if group is None:
+                return
+            group.subscribers.discard(queue)
+            if not group.subscribers:
+                del self._groups[hospital_id]
+
+    def notify(self, hospital_id):
+        """Schedule a diff broadcast for a hospital if anyone is listening."""
+        with self._lock:
+            group = self._groups.get(hospital_id)
+            if group is None or group.refresh_pending:
+                return
+            group.refresh_pending = True
+        group.loop.call_soon_threadsafe(
+            lambda: group.loop.create_task(self.refresh(hospital_id, group))
+        )
+
+    async def check(self, hospital_id):
+        """Schedule a refresh if the hospital changed since the last broadcast, in any process."""
+        group = self._groups.get(hospital_id)
+        now = time.monotonic()
+        if group is None or group.refresh_pending or now - group.checked_at < self.CHECK_INTERVAL:
+            return
+        group.checked_at = now
+        if await sync_to_async(self.version)(hospital_id) != group.version:
+            self.notify(hospital_id)
+
+    async def refresh(self, hospital_id, group):
+        group.refresh_pending = False
+        version = await sync_to_async(self.version)(hospital_id)
+        current = self._select(await sync_to_async(self.build)(
+            hospital_id, sections=STREAM_SECTIONS, generation=version,
+        ))
+        previous = group.last or {}
+        changed = {name: value for name, value in current.items() if previous.get(name) != value}
+        group.last, group.version = current, version
+        if changed:
+            for queue in list(group.subscribers):
+                queue.put_nowait(changed)
+
+    def subscriber_count(self, hospital_id):
+        group = self._groups.get(hospital_id)
+        return len(group.subscribers) if group else 0
+
+    @staticmethod
+    def _select(payload):
+        return {name: payload[name] for name in STREAM_SECTIONS if name in payload}
+
+
+broadcaster = DashboardBroadcaster()
+
+
+@receiver(dashboard_invalidated)
+def broadcast_dashboard_change(sender, hospital_id, **kwargs):
+    broadcaster.notify(hospital_id)
@@ -0,0 +1,38 @@
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+from .aggregates import BASELINE_FIELDS, build_metric_cards
+from .cache import get_cached_metrics, set_cached_metrics
+from .models import DailyHospitalMetrics
+from .rollups import collect_hospital_metrics
+
+
+def batch_baselines(hospital_ids, first_day_current_month):
+    """Latest pre-month DailyHospitalMetrics row for each hospital, in one query."""
+    latest = DailyHospitalMetrics.objects.filter(
+        hospital_id=OuterRef('hospital_id'), date__lt=first_day_current_month
+    ).order_by('-date').values('date')[:1]
+    rows = DailyHospitalMetrics.objects.filter(
+        hospital_id__in=hospital_ids, date=Subquery(latest)
+    ).values('hospital_id', *BASELINE_FIELDS)
+    return {row.pop('hospital_id'): row for row in rows}
+
+
+def group_metric_cards(hospital_ids, today=None):
+    """
+    Metric cards for many hospitals at once. Cached cards are reused; the rest
+    are computed with one GROUP BY hospital_id query per table plus one for
+    the trend baselines, independent of how many hospitals miss.
+    """
+    today = today or timezone.now().date()
+    cards, generations = get_cached_metrics(hospital_ids)
+    missing = [hospital_id for hospital_id in hospital_ids if hospital_id not in cards]
+    if missing:
+        counts = collect_hospital_metrics(today, missing)
+        baselines = batch_baselines(missing, today.replace(day=1))
+        computed = {
+            hospital_id: build_metric_cards(counts[hospital_id], baselines.get(hospital_id))
+            for hospital_id in missing
+        }
+        set_cached_metrics(computed, generations)
+        cards.update(computed)
+    return cards
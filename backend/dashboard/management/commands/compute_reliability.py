@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from dashboard.reliability import CHUNK_SIZE, warm_reliability
+
+
+class Command(BaseCommand):
+    help = 'Compute MTBF/MTTR for every hospital in one pass and cache the reports (run nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hospital', type=int, action='append', dest='hospitals',
+                            help='Only this hospital id; repeatable')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                            help='Rows fetched per database round-trip while extracting')
+
+    def handle(self, *args, **options):
+        reports = warm_reliability(options['hospitals'], chunk_size=options['chunk_size'])
+        failures = sum(report['overall']['failures'] for report in reports.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Cached reliability for {len(reports)} hospitals ({failures} failures analysed)'
+        ))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from dashboard.counters import rebuild_chart_counters
+from dashboard.cache import invalidate_dashboard
+from hospitals.models import Hospital
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the monthly dashboard chart counters from inventory and service history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hospital', type=int, action='append', dest='hospitals',
+                            help='Limit to a hospital id (repeatable)')
+
+    def handle(self, *args, **options):
+        count = rebuild_chart_counters(options['hospitals'])
+        hospital_ids = options['hospitals'] or Hospital.objects.values_list('id', flat=True)
+        for hospital_id in hospital_ids:
+            invalidate_dashboard(hospital_id)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} monthly counter(s)'))
@@ -0,0 +1,28 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from dashboard.rollups import rollup_daily_metrics
+
+
+class Command(BaseCommand):
+    help = "Write today's DailyHospitalMetrics row per hospital (rerunning overwrites it)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Day to record, YYYY-MM-DD; must be today, since the counts '
+                                           'are taken from current state (defaults to today)')
+        parser.add_argument('--hospital', type=int, action='append', dest='hospitals',
+                            help='Limit to a hospital id (repeatable)')
+
+    def handle(self, *args, **options):
+        if options['date']:
+            try:
+                day = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError(f"Invalid --date {options['date']!r}, expected YYYY-MM-DD")
+        else:
+            day = timezone.localdate()
+        try:
+            count = rollup_daily_metrics(day, options['hospitals'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(f'Rolled up metrics for {count} hospital(s) on {day}'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from dashboard.alerts import sweep_alerts
+
+
+class Command(BaseCommand):
+    help = 'Open, update and resolve alerts whose state depends on the date (run nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Re-evaluate every inventory item and device, not just time-based candidates')
+
+    def handle(self, *args, **options):
+        opened, updated, resolved = sweep_alerts(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Alerts opened: {opened}, updated: {updated}, resolved: {resolved}'
+        ))
@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-17 15:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('hospitals', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyHospitalMetrics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('total_inventory_items', models.PositiveIntegerField(default=0)),
+                ('low_stock_items', models.PositiveIntegerField(default=0)),
+                ('devices_under_maintenance', models.PositiveIntegerField(default=0)),
+                ('calibrations_due', models.PositiveIntegerField(default=0)),
+                ('active_suppliers', models.PositiveIntegerField(default=0)),
+                ('open_tickets', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('hospital', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_metrics', to='hospitals.hospital')),
+            ],
+            options={
+                'ordering': ['-date'],
+                'constraints': [models.UniqueConstraint(fields=('hospital', 'date'), name='unique_daily_metrics_per_hospital')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-17 15:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0001_initial'),
+        ('hospitals', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyChartCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(choices=[('inventory', 'Inventory items by last update'), ('maintenance', 'Completed service logs')], max_length=20)),
+                ('month', models.DateField()),
+                ('value', models.IntegerField(default=0)),
+                ('hospital', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chart_counters', to='hospitals.hospital')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('hospital', 'metric', 'month'), name='unique_chart_counter_per_month')],
+            },
+        ),
+    ]
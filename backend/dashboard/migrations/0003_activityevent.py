@@ -0,0 +1,64 @@
+# Generated by Django 5.2 on 2026-10-17 15:03
+
+import datetime
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def backfill_maintenance_events(apps, schema_editor):
+    """Seed the feed with completed service logs, which it used to be built from."""
+    ServiceLog = apps.get_model('device', 'ServiceLog')
+    ActivityEvent = apps.get_model('dashboard', 'ActivityEvent')
+    logs = ServiceLog.objects.filter(status='completed').select_related('device', 'engineer__user')
+    batch = []
+    for log in logs.iterator(chunk_size=1000):
+        user = log.engineer.user if log.engineer_id else None
+        batch.append(ActivityEvent(
+            hospital_id=log.device.hospital_id,
+            kind='maintenance',
+            actor_id=log.engineer_id,
+            actor_name=(f'{user.first_name} {user.last_name}'.strip() or user.username) if user else 'System',
+            action='completed maintenance on',
+            item=log.device.make_model,
+            target_type='servicelog',
+            target_id=log.id,
+            created_at=datetime.datetime.combine(log.service_date, datetime.time.min, tzinfo=datetime.timezone.utc),
+        ))
+        if len(batch) >= 1000:
+            ActivityEvent.objects.bulk_create(batch)
+            batch = []
+    ActivityEvent.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0002_monthlychartcounter'),
+        ('device', '0002_device_nfc_uuid'),
+        ('employees', '0002_employee_unique_employee_per_hospital'),
+        ('hospitals', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('ticket_created', 'Ticket created'), ('ticket_status', 'Ticket status changed'), ('calibration', 'Calibration recorded'), ('incident', 'Incident reported'), ('maintenance', 'Maintenance completed'), ('po_received', 'Purchase order received'), ('inventory_adjusted', 'Inventory adjusted')], max_length=30)),
+                ('actor_name', models.CharField(default='System', max_length=150)),
+                ('action', models.CharField(max_length=100)),
+                ('item', models.CharField(max_length=255)),
+                ('target_type', models.CharField(blank=True, max_length=50)),
+                ('target_id', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='activity_events', to='employees.employee')),
+                ('hospital', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity_events', to='hospitals.hospital')),
+            ],
+            options={
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['hospital', '-created_at', '-id'], name='activity_hospital_recent_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_maintenance_events, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-17 15:05
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0003_activityevent'),
+        ('hospitals', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Alert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(choices=[('low_stock', 'Low stock'), ('expiring', 'Expiring stock'), ('calibration_due', 'Calibration due')], max_length=20)),
+                ('priority', models.CharField(choices=[('high', 'High'), ('medium', 'Medium'), ('low', 'Low')], default='medium', max_length=10)),
+                ('target_type', models.CharField(max_length=50)),
+                ('target_id', models.PositiveBigIntegerField()),
+                ('title', models.CharField(max_length=100)),
+                ('description', models.CharField(max_length=255)),
+                ('due_date', models.DateField(blank=True, null=True)),
+                ('is_open', models.BooleanField(default=True)),
+                ('opened_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('resolved_at', models.DateTimeField(blank=True, null=True)),
+                ('hospital', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='hospitals.hospital')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('is_open', True)), fields=['hospital', 'type', 'priority'], name='alert_open_hospital_type_idx'), models.Index(fields=['target_type', 'target_id'], name='alert_target_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('is_open', True)), fields=('type', 'target_type', 'target_id'), name='unique_open_alert_per_target')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 15:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0005_hospitalchangecounter'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='monthlychartcounter',
+            name='metric',
+            field=models.CharField(choices=[('inventory', 'Inventory items by last update'), ('maintenance', 'Completed service logs'), ('stock_in', 'Units received (stock movements in)'), ('stock_out', 'Units issued (stock movements out)')], max_length=20),
+        ),
+    ]
@@ -1,3 +1,151 @@
 from django.db import models
+from django.utils import timezone
+from hospitals.models import Hospital
 
-# Create your models here.
+
+class DailyHospitalMetrics(models.Model):
+    """One row per hospital per day, written by the rollup_metrics command."""
+    hospital = models.ForeignKey(Hospital, on_delete=models.CASCADE, related_name='daily_metrics')
+    date = models.DateField()
+    total_inventory_items = models.PositiveIntegerField(default=0)
+    low_stock_items = models.PositiveIntegerField(default=0)
+    devices_under_maintenance = models.PositiveIntegerField(default=0)
+    calibrations_due = models.PositiveIntegerField(default=0)
+    active_suppliers = models.PositiveIntegerField(default=0)
+    open_tickets = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['hospital', 'date'], name='unique_daily_metrics_per_hospital')
+        ]
+
+    def __str__(self):
+        return f"{self.hospital_id} - {self.date}"
+
+
+class MonthlyChartCounter(models.Model):
+    """
+    Per-hospital monthly totals behind the dashboard charts, kept current by
+    the signal handlers in dashboard.signals and rebuilt by
+    rebuild_chart_counters.
+    """
+    INVENTORY = 'inventory'
+    MAINTENANCE = 'maintenance'
+    STOCK_IN = 'stock_in'
+    STOCK_OUT = 'stock_out'
+    METRIC_CHOICES = [
+        (INVENTORY, 'Inventory items by last update'),
+        (MAINTENANCE, 'Completed service logs'),
+        (STOCK_IN, 'Units received (stock movements in)'),
+        (STOCK_OUT, 'Units issued (stock movements out)'),
+    ]
+
+    hospital = models.ForeignKey(Hospital, on_delete=models.CASCADE, related_name='chart_counters')
+    metric = models.CharField(max_length=20, choices=METRIC_CHOICES)
+    month = models.DateField()  # first day of the month
+    value = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['hospital', 'metric', 'month'], name='unique_chart_counter_per_month')
+        ]
+
+    def __str__(self):
+        return f"{self.hospital_id} - {self.metric} - {self.month:%Y-%m}: {self.value}"
+
+
+class ActivityEvent(models.Model):
+    """
+    Append-only log behind the dashboard's recent-activity feed. Actor and
+    subject text are copied in when the event is written so the feed is a
+    single index scan with no joins.
+    """
+    KIND_CHOICES = [
+        ('ticket_created', 'Ticket created'),
+        ('ticket_status', 'Ticket status changed'),
+        ('calibration', 'Calibration recorded'),
+        ('incident', 'Incident reported'),
+        ('maintenance', 'Maintenance completed'),
+        ('po_received', 'Purchase order received'),
+        ('inventory_adjusted', 'Inventory adjusted'),
+    ]
+
+    hospital = models.ForeignKey(Hospital, on_delete=models.CASCADE, related_name='activity_events')
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    actor = models.ForeignKey('employees.Employee', on_delete=models.SET_NULL, null=True, blank=True,
+                              related_name='activity_events')
+    actor_name = models.CharField(max_length=150, default='System')
+    action = models.CharField(max_length=100)
+    item = models.CharField(max_length=255)
+    target_type = models.CharField(max_length=50, blank=True)
+    target_id = models.PositiveBigIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['hospital', '-created_at', '-id'], name='activity_hospital_recent_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.actor_name} {self.action} {self.item}"
+
+
+class Alert(models.Model):
+    """
+    Materialized alert conditions, kept current by dashboard.alerts from
+    InventoryItem/Device/Calibration saves and the nightly sweep_alerts run,
+    so readers never re-evaluate the conditions over the live tables.
+    """
+    LOW_STOCK = 'low_stock'
+    EXPIRING = 'expiring'
+    CALIBRATION_DUE = 'calibration_due'
+    TYPE_CHOICES = [
+        (LOW_STOCK, 'Low stock'),
+        (EXPIRING, 'Expiring stock'),
+        (CALIBRATION_DUE, 'Calibration due'),
+    ]
+    PRIORITY_CHOICES = [('high', 'High'), ('medium', 'Medium'), ('low', 'Low')]
+
+    hospital = models.ForeignKey(Hospital, on_delete=models.CASCADE, related_name='alerts')
+    type = models.CharField(max_length=20, choices=TYPE_CHOICES)
+    priority = models.CharField(max_length=10, choices=PRIORITY_CHOICES, default='medium')
+    target_type = models.CharField(max_length=50)
+    target_id = models.PositiveBigIntegerField()
+    title = models.CharField(max_length=100)
+    description = models.CharField(max_length=255)
+    due_date = models.DateField(null=True, blank=True)
+    is_open = models.BooleanField(default=True)
+    opened_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+    resolved_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['type', 'target_type', 'target_id'], condition=models.Q(is_open=True),
+                                    name='unique_open_alert_per_target')
+        ]
+        indexes = [
+            models.Index(fields=['hospital', 'type', 'priority'], condition=models.Q(is_open=True),
+                         name='alert_open_hospital_type_idx'),
+            models.Index(fields=['target_type', 'target_id'], name='alert_target_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_type_display()}: {self.description}"
+
+
+class HospitalChangeCounter(models.Model):
+    """
+    Durable per-hospital version, bumped whenever dashboard data changes.
+    Backs dashboard cache generations and the dashboard's ETag/Last-Modified.
+    """
+    hospital = models.OneToOneField(Hospital, on_delete=models.CASCADE, primary_key=True,
+                                    related_name='change_counter')
+    version = models.PositiveBigIntegerField(default=0)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.hospital_id} v{self.version}"
@@ -0,0 +1,203 @@
+"""
+Fleet reliability: mean time between failures (MTBF) and mean time to repair
+(MTTR) per device, model and department.
+
+A failure is an IncidentReport. Its repair is the device's first completed
+ServiceLog on or after the incident date. A device is observed from its
+installation date (or its first recorded event) until ``today``, and its
+uptime is that span less the days spent in repair. Per group:
+
+    MTBF = uptime days / failures
+    MTTR = repair days / repaired failures
+
+The three tables are read as columns (values_list over a chunked iterator)
+into NumPy arrays and grouped with sort/searchsorted/bincount, so the work
+per event is a few array passes rather than Python over ORM objects. One
+extraction covers any number of hospitals, which is how the batch job warms
+every hospital at once.
+"""
+from itertools import islice
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+from device.models import Device, IncidentReport, ServiceLog
+from .cache import get_cache
+
+CHUNK_SIZE = 10000
+GROUPINGS = ('model', 'department', 'device')
+CACHE_KEY = 'reliability:{hospital_id}'
+CACHE_TIMEOUT = 6 * 60 * 60
+
+
+def _columns(queryset, fields, dtypes, chunk_size=CHUNK_SIZE):
+    """values_list(*fields) as one NumPy array per field, converted chunk_size rows at a time."""
+    rows = queryset.values_list(*fields).iterator(chunk_size=chunk_size)
+    parts = [[] for _ in fields]
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        for part, column, dtype in zip(parts, zip(*chunk), dtypes):
+            part.append(np.array(column, dtype=dtype))
+    return [np.concatenate(part) if part else np.array([], dtype=dtype) for part, dtype in zip(parts, dtypes)]
+
+
+def _days(dates):
+    """datetime64[D] -> int64 days since the epoch, with NaT kept as a mask."""
+    return dates.astype(np.int64), np.isnat(dates)
+
+
+def extract(hospital_ids=None, chunk_size=CHUNK_SIZE):
+    """Pull the device, incident and repair columns for the given hospitals (all if None)."""
+    devices = Device.objects.all()
+    incidents = IncidentReport.objects.all()
+    repairs = ServiceLog.objects.filter(status='completed')
+    if hospital_ids is not None:
+        devices = devices.filter(hospital_id__in=hospital_ids)
+        incidents = incidents.filter(device__hospital_id__in=hospital_ids)
+        repairs = repairs.filter(device__hospital_id__in=hospital_ids)
+
+    device_columns = _columns(
+        devices.annotate(
+            model_label=Coalesce('make_model', Value('')),
+            department_label=Coalesce('department', Value('')),
+        ).order_by('id'),
+        ('id', 'hospital_id', 'model_label', 'department_label', 'serial_number', 'date_of_installation'),
+        (np.int64, np.int64, str, str, str, 'datetime64[D]'),
+        chunk_size,
+    )
+    incident_columns = _columns(
+        incidents.annotate(day=TruncDate('incident_date')).order_by(),
+        ('device_id', 'day'), (np.int64, 'datetime64[D]'), chunk_size,
+    )
+    repair_columns = _columns(repairs.order_by(), ('device_id', 'service_date'), (np.int64, 'datetime64[D]'), chunk_size)
+    return device_columns, incident_columns, repair_columns
+
+
+def _stats(devices, failures, repaired, repair_days, uptime):
+    return {
+        'devices': int(devices),
+        'failures': int(failures),
+        'repairs': int(repaired),
+        'mtbf_days': round(float(uptime / failures), 2) if failures else None,
+        'mttr_days': round(float(repair_days / repaired), 2) if repaired else None,
+    }
+
+
+def _grouped(hospital_codes, labels, weights):
+    """
+    Sum each per-device array in ``weights`` by (hospital, label); returns
+    (group hospital codes, group labels, [sums]).
+    """
+    label_values, label_codes = np.unique(labels, return_inverse=True)
+    keys = hospital_codes * len(label_values) + label_codes
+    group_keys, groups = np.unique(keys, return_inverse=True)
+    sums = [np.bincount(groups, weights=weight, minlength=len(group_keys)) for weight in weights]
+    return group_keys // max(len(label_values), 1), label_values[group_keys % max(len(label_values), 1)], sums
+
+
+def compute(columns, today=None, groupings=GROUPINGS):
+    """{hospital_id: report} from the columns returned by extract()."""
+    today = today or timezone.localdate()
+    (ids, hospitals, models, departments, serials, installed), (i_device, i_day), (r_device, r_day) = columns
+    if not len(ids):
+        return {}
+    today_day = np.datetime64(today, 'D').astype(np.int64)
+
+    # Map events to device rows (ids are sorted); drop events of devices outside the frame
+    i_index = np.searchsorted(ids, i_device)
+    i_known = (i_index < len(ids)) & (ids[np.minimum(i_index, len(ids) - 1)] == i_device)
+    i_index, i_day = i_index[i_known], _days(i_day[i_known])[0]
+    r_index = np.searchsorted(ids, r_device)
+    r_known = (r_index < len(ids)) & (ids[np.minimum(r_index, len(ids) - 1)] == r_device)
+    r_index, r_day = r_index[r_known], _days(r_day[r_known])[0]
+
+    # Each incident's repair: the first completed service on or after its day, same device
+    base = min(i_day.min(initial=today_day), r_day.min(initial=today_day))
+    r_keys = (r_index << 32) | (r_day - base)
+    order = np.argsort(r_keys, kind='stable')
+    r_keys, r_sorted_day = r_keys[order], r_day[order]
+    i_keys = (i_index << 32) | (i_day - base)
+    matched = np.zeros(len(i_keys), dtype=bool)
+    repair_time = np.zeros(len(i_keys), dtype=np.int64)
+    if len(r_keys):
+        position = np.searchsorted(r_keys, i_keys)
+        found = position < len(r_keys)
+        position = np.minimum(position, len(r_keys) - 1)
+        matched = found & ((r_keys[position] >> 32) == i_index)
+        repair_time[matched] = r_sorted_day[position[matched]] - i_day[matched]
+
+    count = len(ids)
+    failures = np.bincount(i_index, minlength=count).astype(np.float64)
+    repaired = np.bincount(i_index[matched], minlength=count).astype(np.float64)
+    downtime = np.bincount(i_index, weights=repair_time, minlength=count)
+    first_event = np.full(count, today_day, dtype=np.int64)
+    np.minimum.at(first_event, i_index, i_day)
+    np.minimum.at(first_event, r_index, r_day)
+    install_day, no_install = _days(installed)
+    start = np.where(no_install, first_event, install_day)
+    uptime = np.clip(np.clip(today_day - start, 0, None) - downtime, 0, None)
+    ones = np.ones(count)
+
+    hospital_ids, hospital_codes = np.unique(hospitals, return_inverse=True)
+    reports = {
+        int(hospital_id): {'as_of': today.isoformat(), **{f'by_{name}': [] for name in groupings}}
+        for hospital_id in hospital_ids
+    }
+    weights = (ones, failures, repaired, downtime, uptime)
+    totals = [np.bincount(hospital_codes, weights=weight, minlength=len(hospital_ids)) for weight in weights]
+    for code, hospital_id in enumerate(hospital_ids):
+        reports[int(hospital_id)]['overall'] = _stats(*(total[code] for total in totals))
+
+    for name, field, labels in (('model', 'make_model', models), ('department', 'department', departments)):
+        if name not in groupings:
+            continue
+        group_hospitals, group_labels, sums = _grouped(hospital_codes, labels, weights)
+        for index, (code, label) in enumerate(zip(group_hospitals, group_labels)):
+            reports[int(hospital_ids[code])][f'by_{name}'].append(
+                {field: str(label) or None, **_stats(*(total[index] for total in sums))}
+            )
+    if 'device' in groupings:
+        for index in np.lexsort((ids, -failures)):
+            reports[int(hospitals[index])]['by_device'].append({
+                'device_id': int(ids[index]),
+                'make_model': str(models[index]) or None,
+                'serial_number': str(serials[index]),
+                'department': str(departments[index]) or None,
+                **_stats(1, failures[index], repaired[index], downtime[index], uptime[index]),
+            })
+    for report in reports.values():
+        for name in ('model', 'department'):
+            if name in groupings:
+                report[f'by_{name}'].sort(key=lambda row: -row['failures'])
+    return reports
+
+
+def _timeout():
+    return getattr(settings, 'RELIABILITY_CACHE_TIMEOUT', CACHE_TIMEOUT)
+
+
+def warm_reliability(hospital_ids=None, today=None, chunk_size=CHUNK_SIZE):
+    """Compute and cache the reports of every hospital (or hospital_ids) in one pass; returns them."""
+    reports = compute(extract(hospital_ids, chunk_size), today)
+    get_cache().set_many(
+        {CACHE_KEY.format(hospital_id=hospital_id): report for hospital_id, report in reports.items()},
+        timeout=_timeout(),
+    )
+    return reports
+
+
+def get_reliability(hospital_id):
+    """The hospital's cached report, computed on a miss (None if it has no devices)."""
+    key = CACHE_KEY.format(hospital_id=hospital_id)
+    report = get_cache().get(key)
+    if report is None:
+        report = warm_reliability([hospital_id]).get(hospital_id)
+    return report
+
+
+def invalidate_reliability(hospital_id):
+    transaction.on_commit(lambda: get_cache().delete(CACHE_KEY.format(hospital_id=hospital_id)))
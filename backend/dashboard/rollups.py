@@ -0,0 +1,81 @@
+from collections import defaultdict
+from datetime import timedelta
+from django.db.models import Count, Q
+from django.utils import timezone
+from hospitals.models import Hospital
+from inventory.models import InventoryItem
+from device.models import Device
+from suppliers.models import Supplier
+from tickets.models import Ticket
+from .models import DailyHospitalMetrics
+from .cache import invalidate_dashboard
+
+METRIC_FIELDS = [
+    'total_inventory_items', 'low_stock_items', 'devices_under_maintenance',
+    'calibrations_due', 'active_suppliers', 'open_tickets',
+]
+
+
+def _grouped(queryset, **aggregates):
+    """Run one GROUP BY hospital_id query and return {hospital_id: {name: value}}."""
+    return {
+        row.pop('hospital_id'): row
+        for row in queryset.values('hospital_id').annotate(**aggregates).order_by()
+    }
+
+
+def collect_hospital_metrics(day, hospital_ids=None):
+    """
+    Compute the metric-card counts for every hospital with one grouped query
+    per table. The live tables only hold current state, so the counts describe
+    the moment the rollup runs and are stored under ``day``.
+    """
+    def scoped(queryset):
+        return queryset.filter(hospital_id__in=hospital_ids) if hospital_ids is not None else queryset
+
+    metrics = defaultdict(lambda: dict.fromkeys(METRIC_FIELDS, 0))
+    sources = [
+        _grouped(scoped(InventoryItem.objects.all()),
+                 total_inventory_items=Count('id'),
+                 low_stock_items=Count('id', filter=Q(stock_level='Low'))),
+        _grouped(scoped(Device.objects.all()),
+                 devices_under_maintenance=Count('id', filter=Q(is_active='Under_Maintenance')),
+                 calibrations_due=Count('id', filter=Q(next_calibration__gte=day,
+                                                       next_calibration__lte=day + timedelta(days=30)))),
+        _grouped(scoped(Supplier.objects.all()), active_suppliers=Count('id', filter=Q(status='Active'))),
+        _grouped(scoped(Ticket.objects.all()), open_tickets=Count('id', filter=~Q(status='resolved'))),
+    ]
+    for source in sources:
+        for hospital_id, counts in source.items():
+            metrics[hospital_id].update(counts)
+    return metrics
+
+
+def rollup_daily_metrics(day=None, hospital_ids=None):
+    """
+    Write (or overwrite) today's DailyHospitalMetrics rows. Safe to rerun.
+    The counts come from the live tables, which only describe the present, so
+    any other ``day`` is refused rather than stored as made-up history.
+    """
+    today = timezone.localdate()
+    day = day or today
+    if day != today:
+        raise ValueError(f"Metrics can only be recorded for today ({today}), not {day}")
+    hospitals = Hospital.objects.all()
+    if hospital_ids is not None:
+        hospitals = hospitals.filter(id__in=hospital_ids)
+    hospital_ids = list(hospitals.values_list('id', flat=True))
+    metrics = collect_hospital_metrics(day, hospital_ids)
+    rows = [
+        DailyHospitalMetrics(hospital_id=hospital_id, date=day, **metrics[hospital_id])
+        for hospital_id in hospital_ids
+    ]
+    DailyHospitalMetrics.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['hospital', 'date'],
+        update_fields=METRIC_FIELDS + ['updated_at'],
+    )
+    for hospital_id in hospital_ids:
+        invalidate_dashboard(hospital_id)
+    return len(rows)
@@ -0,0 +1,211 @@
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from inventory.models import InventoryItem
+from device.models import Device, ServiceLog, Calibration, IncidentReport
+from suppliers.models import Supplier, PurchaseOrder
+from tickets.models import Ticket
+from .activity import record_activity
+from .alerts import refresh_inventory_alerts, refresh_device_alerts, resolve_target_alerts, INVENTORY, DEVICE
+from .cache import invalidate_dashboard
+from .reliability import invalidate_reliability
+from .counters import month_of, move
+from .models import MonthlyChartCounter
+
+
+def _device_hospital_id(device_id):
+    return Device.objects.filter(id=device_id).values_list('hospital_id', flat=True).first()
+
+
+@receiver([post_save, post_delete], sender=InventoryItem)
+@receiver([post_save, post_delete], sender=Device)
+@receiver([post_save, post_delete], sender=Supplier)
+@receiver([post_save, post_delete], sender=Ticket)
+def invalidate_hospital_dashboard(sender, instance, **kwargs):
+    invalidate_dashboard(instance.hospital_id)
+
+
+@receiver([post_save, post_delete], sender=ServiceLog)
+@receiver([post_save, post_delete], sender=Calibration)
+def invalidate_device_dashboard(sender, instance, **kwargs):
+    hospital_id = _device_hospital_id(instance.device_id)
+    if hospital_id is not None:
+        invalidate_dashboard(hospital_id)
+
+
+RELIABILITY_DEVICE_FIELDS = {'make_model', 'department', 'serial_number', 'date_of_installation'}
+
+
+@receiver([post_save, post_delete], sender=IncidentReport)
+@receiver([post_save, post_delete], sender=ServiceLog)
+def invalidate_device_reliability(sender, instance, **kwargs):
+    hospital_id = _device_hospital_id(instance.device_id)
+    if hospital_id is not None:
+        invalidate_reliability(hospital_id)
+
+
+@receiver(post_save, sender=Device)
+def invalidate_reliability_on_device_save(sender, instance, created=False, update_fields=None, **kwargs):
+    if created or update_fields is None or RELIABILITY_DEVICE_FIELDS & set(update_fields):
+        invalidate_reliability(instance.hospital_id)
+
+
+@receiver(post_delete, sender=Device)
+def invalidate_reliability_on_device_delete(sender, instance, **kwargs):
+    invalidate_reliability(instance.hospital_id)
+
+
+# --- Monthly chart counters ---
+# The month each row currently counts towards is remembered when it is loaded
+# (read from __dict__ so deferred fields never trigger a query), letting saves
+# move a single unit between months instead of regrouping the whole table.
+
+@receiver(post_init, sender=InventoryItem)
+def remember_inventory_month(sender, instance, **kwargs):
+    instance._chart_month = month_of(instance.__dict__.get('last_updated'))
+
+
+@receiver(post_save, sender=InventoryItem)
+def count_inventory_month(sender, instance, created, **kwargs):
+    new_month = month_of(instance.last_updated)
+    old_month = None if created else instance._chart_month
+    if created or old_month is not None:
+        move(instance.hospital_id, MonthlyChartCounter.INVENTORY, old_month, new_month)
+    instance._chart_month = new_month
+
+
+@receiver(post_delete, sender=InventoryItem)
+def uncount_inventory_month(sender, instance, **kwargs):
+    move(instance.hospital_id, MonthlyChartCounter.INVENTORY, instance._chart_month, None)
+
+
+def _maintenance_month(instance):
+    if instance.__dict__.get('status') != 'completed':
+        return None
+    return month_of(instance.__dict__.get('service_date'))
+
+
+@receiver(post_init, sender=ServiceLog)
+def remember_maintenance_month(sender, instance, **kwargs):
+    instance._chart_month = _maintenance_month(instance)
+
+
+@receiver(post_save, sender=ServiceLog)
+def count_maintenance_month(sender, instance, created, **kwargs):
+    old_month = None if created else instance._chart_month
+    new_month = _maintenance_month(instance)
+    if old_month != new_month:
+        move(_device_hospital_id(instance.device_id), MonthlyChartCounter.MAINTENANCE, old_month, new_month)
+    instance._chart_month = new_month
+
+
+@receiver(post_delete, sender=ServiceLog)
+def uncount_maintenance_month(sender, instance, **kwargs):
+    if instance._chart_month is not None:
+        hospital_id = _device_hospital_id(instance.device_id)
+        if hospital_id is not None:
+            move(hospital_id, MonthlyChartCounter.MAINTENANCE, instance._chart_month, None)
+
+
+# --- Activity feed ---
+# Status fields are remembered on load so only real transitions are logged.
+
+@receiver(post_init, sender=Ticket)
+@receiver(post_init, sender=ServiceLog)
+@receiver(post_init, sender=PurchaseOrder)
+def remember_activity_status(sender, instance, **kwargs):
+    instance._activity_status = instance.__dict__.get('status')
+
+
+@receiver(post_init, sender=InventoryItem)
+def remember_activity_quantity(sender, instance, **kwargs):
+    instance._activity_quantity = instance.__dict__.get('quantity')
+
+
+@receiver(post_save, sender=Ticket)
+def log_ticket_activity(sender, instance, created, **kwargs):
+    if created:
+        record_activity(instance.hospital_id, 'ticket_created', 'opened ticket',
+                        f"{instance.ticket_id}: {instance.title}", actor=instance.created_by, target=instance)
+    elif instance._activity_status not in (None, instance.status):
+        record_activity(instance.hospital_id, 'ticket_status', f"moved {instance.ticket_id} to",
+                        instance.get_status_display(), actor=instance.assigned_to, target=instance)
+    instance._activity_status = instance.status
+
+
+@receiver(post_save, sender=ServiceLog)
+def log_maintenance_activity(sender, instance, created, **kwargs):
+    previous = None if created else instance._activity_status
+    if instance.status == 'completed' and previous != 'completed':
+        device = instance.device
+        record_activity(device.hospital_id, 'maintenance', 'completed maintenance on',
+                        device.make_model, actor=instance.engineer, target=instance)
+    instance._activity_status = instance.status
+
+
+@receiver(post_save, sender=Calibration)
+def log_calibration_activity(sender, instance, created, **kwargs):
+    if created:
+        device = instance.device
+        record_activity(device.hospital_id, 'calibration', 'recorded a calibration on',
+                        device.make_model, actor=instance.engineer, target=instance)
+
+
+@receiver(post_save, sender=IncidentReport)
+def log_incident_activity(sender, instance, created, **kwargs):
+    if created:
+        device = instance.device
+        record_activity(device.hospital_id, 'incident', 'reported an incident on',
+                        device.make_model, actor=instance.reported_by, target=instance)
+        # Incidents feed no other dashboard section; the new event still has to show
+        invalidate_dashboard(device.hospital_id)
+
+
+@receiver(post_save, sender=PurchaseOrder)
+def log_purchase_order_activity(sender, instance, created, **kwargs):
+    if instance.status == 'RECEIVED' and instance._activity_status != 'RECEIVED':
+        record_activity(instance.hospital_id, 'po_received', 'received purchase order',
+                        instance.po_number, target=instance)
+        invalidate_dashboard(instance.hospital_id)
+    instance._activity_status = instance.status
+
+
+@receiver(post_save, sender=InventoryItem)
+def log_inventory_activity(sender, instance, created, **kwargs):
+    previous = instance._activity_quantity
+    if not created and previous is not None and previous != instance.quantity:
+        record_activity(instance.hospital_id, 'inventory_adjusted', f"adjusted stock ({previous} → {instance.quantity}) of",
+                        instance.name, target=instance)
+    instance._activity_quantity = instance.quantity
+
+
+# --- Alerts ---
+
+INVENTORY_ALERT_FIELDS = {'quantity', 'reorder_level', 'expiry_date', 'name', 'sku', 'batch'}
+DEVICE_ALERT_FIELDS = {'next_calibration', 'make_model', 'serial_number'}
+
+
+@receiver(post_save, sender=InventoryItem)
+def refresh_item_alerts(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or INVENTORY_ALERT_FIELDS & set(update_fields):
+        refresh_inventory_alerts([instance])
+
+
+@receiver(post_save, sender=Device)
+def refresh_device_alerts_on_save(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or DEVICE_ALERT_FIELDS & set(update_fields):
+        refresh_device_alerts([instance])
+
+
+@receiver(post_save, sender=Calibration)
+def refresh_device_alerts_on_calibration(sender, instance, **kwargs):
+    refresh_device_alerts([instance.device])
+
+
+@receiver(post_delete, sender=InventoryItem)
+def resolve_item_alerts(sender, instance, **kwargs):
+    resolve_target_alerts(INVENTORY, instance.pk)
+
+
+@receiver(post_delete, sender=Device)
+def resolve_device_alerts(sender, instance, **kwargs):
+    resolve_target_alerts(DEVICE, instance.pk)
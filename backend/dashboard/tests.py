@@ -1,3 +1,553 @@
-from django.test import TestCase
+import asyncio
+import json
+import tempfile
+import threading
+from io import StringIO
+from datetime import timedelta
+from unittest.mock import patch
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from hospitals.testing import create_engineer, create_hospital, create_user
+from inventory.models import InventoryItem, Category
+from device.models import Device, ServiceLog, Calibration, IncidentReport
+from suppliers.models import Supplier
+from tickets.models import Ticket
+from .alerts import sweep_alerts
+from .cache import bump_version, get_dashboard_snapshot
+from .events import DashboardBroadcaster, broadcaster
+from .counters import rebuild_chart_counters
+from .models import DailyHospitalMetrics, MonthlyChartCounter, Alert
+from .reliability import CACHE_KEY as RELIABILITY_KEY, warm_reliability
+from .views import DashboardStreamView
 
-# Create your tests here.
+
+# Every request made here is held to the QUERY_BUDGETS in settings
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), QR_WORKER='command', QUERY_PROFILING=True,
+                   QUERY_BUDGET_ACTION='raise')
+class DashboardStatsViewTests(TestCase):
+    # hospital exists, inventory/device/supplier aggregates, trend baseline,
+    # open alerts, upcoming calibrations, categories, chart counters, activity
+    EXPECTED_QUERIES = 10
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(first_name='Ada', last_name='Admin')
+        cls.hospital = create_hospital(cls.user)
+        cls.engineer = create_engineer(cls.user, cls.hospital)
+        category = Category.objects.create(hospital=cls.hospital, name='Consumables')
+        for i in range(6):
+            InventoryItem.objects.create(
+                hospital=cls.hospital, name=f'Item {i}', sku=f'SKU-{i}', category=category if i % 2 else None,
+                quantity=i, reorder_level=3,
+            )
+        today = timezone.now().date()
+        for i in range(4):
+            device = Device.objects.create(
+                hospital=cls.hospital, make_model=f'Model {i}', serial_number=f'SN-{i}', asset_number=f'A-{i}',
+                is_active='Under_Maintenance' if i % 2 else 'Operational',
+                next_calibration=today + timedelta(days=5 * i),
+            )
+            ServiceLog.objects.create(device=device, engineer=cls.engineer, status='completed')
+            Calibration.objects.create(device=device, calibration_date=timezone.now() + timedelta(days=i + 1))
+        Supplier.objects.create(hospital=cls.hospital, name='Acme', status='Active')
+        Supplier.objects.create(hospital=cls.hospital, name='Initech', status='Inactive')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('dashboard-stats', kwargs={'hospital_id': self.hospital.id})
+
+    def test_metric_cards(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        metrics = response.data['metrics']
+        self.assertEqual(metrics['total_inventory_items'], 6)
+        self.assertEqual(metrics['low_stock_alerts'], 4)
+        self.assertEqual(metrics['devices_under_maintenance'], 2)
+        self.assertEqual(metrics['active_suppliers'], 1)
+        self.assertEqual(response.data['inventory_categories'], [{'name': 'Consumables', 'percentage': 50.0}])
+        self.assertEqual(len(response.data['alerts']), 6)
+
+    def test_query_count(self):
+        # Warm up authentication/content-type caches so only dashboard SQL is counted
+        self.client.get(self.url)
+        cache.clear()
+        with self.assertNumQueries(self.EXPECTED_QUERIES):
+            self.client.get(self.url)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.client.get(self.url)
+        for i in range(10, 20):
+            InventoryItem.objects.create(hospital=self.hospital, name=f'Item {i}', sku=f'SKU-{i}', quantity=0)
+        cache.clear()
+        with self.assertNumQueries(self.EXPECTED_QUERIES):
+            self.client.get(self.url)
+
+    def test_cached_snapshot_skips_aggregation(self):
+        self.client.get(self.url)
+        # Only the hospital existence check remains
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data['metrics']['total_inventory_items'], 6)
+
+    def test_save_invalidates_snapshot(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            InventoryItem.objects.create(hospital=self.hospital, name='New', sku='SKU-NEW', quantity=10)
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['metrics']['total_inventory_items'], 7)
+
+    def test_related_save_invalidates_snapshot(self):
+        self.client.get(self.url)
+        device = Device.objects.filter(hospital=self.hospital).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            ServiceLog.objects.create(device=device, engineer=self.engineer, status='completed')
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.data['recent_activity']), 5)
+        self.assertEqual(sum(m['value'] for m in response.data['charts']['maintenance_overview']), 5)
+
+    def test_save_with_activity_bumps_version_once(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            Ticket.objects.create(hospital=self.hospital, title='Pump alarm', location='ICU', created_by=self.engineer)
+        self.assertEqual(len(callbacks), 1)
+
+    def test_concurrent_misses_rebuild_once(self):
+        started, release = threading.Event(), threading.Event()
+        builds, results = [], []
+
+        def build():
+            builds.append(1)
+            started.set()
+            release.wait(5)
+            return {'ok': True}
+
+        def load():
+            results.append(get_dashboard_snapshot(self.hospital.id, build=build))
+
+        leader = threading.Thread(target=load)
+        leader.start()
+        started.wait(5)
+        followers = [threading.Thread(target=load) for _ in range(5)]
+        for thread in followers:
+            thread.start()
+        release.set()
+        for thread in [leader, *followers]:
+            thread.join()
+        self.assertEqual(len(builds), 1)
+        self.assertEqual(results, [{'ok': True}] * 6)
+
+    def test_rollup_is_idempotent_and_feeds_trends(self):
+        today = timezone.localdate()
+        last_month = today.replace(day=1) - timedelta(days=1)
+        with self.assertRaises(CommandError):
+            call_command('rollup_metrics', date=last_month.isoformat(), stdout=StringIO())
+        call_command('rollup_metrics', stdout=StringIO())
+        InventoryItem.objects.filter(hospital=self.hospital, quantity=5).update(quantity=0)
+        call_command('rollup_metrics', date=today.isoformat(), stdout=StringIO())
+        row = DailyHospitalMetrics.objects.get(hospital=self.hospital, date=today)
+        self.assertEqual(row.low_stock_items, 5)
+        self.assertEqual(row.active_suppliers, 1)
+        self.assertFalse(DailyHospitalMetrics.objects.filter(date=last_month).exists())
+
+        # Last month's row, as the rollup would have recorded it then
+        row.pk, row.date, row.low_stock_items = None, last_month, 2
+        row.save()
+        cache.clear()
+        trends = self.client.get(self.url).data['metrics']['trends']
+        self.assertEqual(trends['low_stock_change'], 3)
+        self.assertEqual(trends['total_inventory_change'], 0)
+
+    @override_settings(TIME_ZONE='Asia/Kolkata')
+    def test_rollup_records_the_local_day(self):
+        # 20:00 UTC is already 01:30 the next morning in Kolkata
+        now = timezone.now().replace(hour=20, minute=0)
+        local_day = timezone.localdate(now)
+        with patch('django.utils.timezone.now', return_value=now):
+            call_command('rollup_metrics', stdout=StringIO())
+        self.assertEqual(local_day, now.date() + timedelta(days=1))
+        self.assertTrue(DailyHospitalMetrics.objects.filter(hospital=self.hospital, date=local_day).exists())
+
+    def test_chart_counters_follow_saves(self):
+        this_month = timezone.now().date().replace(day=1)
+        counters = MonthlyChartCounter.objects.filter(hospital=self.hospital, month=this_month)
+        self.assertEqual(counters.get(metric=MonthlyChartCounter.INVENTORY).value, 6)
+        self.assertEqual(counters.get(metric=MonthlyChartCounter.MAINTENANCE).value, 4)
+
+        log = ServiceLog.objects.filter(device__hospital=self.hospital).first()
+        log.status = 'scheduled'
+        log.save()
+        InventoryItem.objects.filter(hospital=self.hospital).first().delete()
+        self.assertEqual(counters.get(metric=MonthlyChartCounter.INVENTORY).value, 5)
+        self.assertEqual(counters.get(metric=MonthlyChartCounter.MAINTENANCE).value, 3)
+
+        charts = self.client.get(self.url).data['charts']
+        self.assertEqual(charts['inventory_overview'], [{'name': this_month.strftime('%b'), 'value': 5}])
+        self.assertEqual(charts['maintenance_overview'], [{'name': this_month.strftime('%b'), 'value': 3}])
+
+    def test_rebuild_chart_counters_matches_incremental(self):
+        before = set(MonthlyChartCounter.objects.values_list('hospital_id', 'metric', 'month', 'value'))
+        MonthlyChartCounter.objects.update(value=0)
+        rebuild_chart_counters()
+        after = set(MonthlyChartCounter.objects.values_list('hospital_id', 'metric', 'month', 'value'))
+        self.assertEqual(before, after)
+
+    def test_activity_feed_records_transitions(self):
+        ticket = Ticket.objects.create(hospital=self.hospital, title='Monitor flickers', location='ICU',
+                                       created_by=self.engineer)
+        ticket.status = 'resolved'
+        ticket.save()
+        ticket.save()  # no transition, no event
+        item = InventoryItem.objects.get(sku='SKU-1')
+        item.quantity = 9
+        item.save()
+
+        url = reverse('dashboard-activity', kwargs={'hospital_id': self.hospital.id})
+        page = self.client.get(url, {'limit': 3}).data
+        self.assertEqual([e['kind'] for e in page['results']], ['inventory_adjusted', 'ticket_status', 'ticket_created'])
+        self.assertEqual(page['results'][2]['user'], 'Ada Admin')
+        rest = self.client.get(page['next']).data['results']
+        self.assertEqual(len(rest), 3)
+        self.assertTrue({e['kind'] for e in rest} <= {'calibration', 'maintenance'})
+
+        cache.clear()
+        recent = self.client.get(self.url).data['recent_activity']
+        self.assertEqual(recent[0]['action'], 'adjusted stock (1 → 9) of')
+
+    def test_alerts_follow_saves_and_sweep(self):
+        item = InventoryItem.objects.get(sku='SKU-0')
+        open_alerts = Alert.objects.filter(hospital=self.hospital, is_open=True)
+        self.assertEqual(open_alerts.filter(type=Alert.LOW_STOCK).count(), 4)
+        self.assertEqual(open_alerts.filter(type=Alert.CALIBRATION_DUE).count(), 4)
+
+        item.quantity = 50
+        item.save()
+        self.assertFalse(open_alerts.filter(type=Alert.LOW_STOCK, target_id=item.id).exists())
+
+        # Time-based transitions are picked up by the sweep, not by saves
+        today = timezone.now().date()
+        InventoryItem.objects.filter(pk=item.pk).update(expiry_date=today + timedelta(days=10))
+        self.assertEqual(sweep_alerts(today=today), (1, 0, 0))
+        self.assertEqual(sweep_alerts(today=today + timedelta(days=11)), (0, 4, 0))
+        alert = open_alerts.get(type=Alert.EXPIRING)
+        self.assertEqual((alert.title, alert.priority), ('Stock expired', 'high'))
+
+        url = reverse('dashboard-alerts', kwargs={'hospital_id': self.hospital.id})
+        response = self.client.get(url, {'type': Alert.EXPIRING})
+        self.assertEqual([a['target_id'] for a in response.data['results']], [item.id])
+
+        item.delete()
+        self.assertFalse(open_alerts.filter(target_id=item.id, target_type='inventoryitem').exists())
+
+    def test_alert_ids_are_unique_per_alert(self):
+        # One item, two inventory alerts: low stock and expiring
+        InventoryItem.objects.create(
+            hospital=self.hospital, name='Saline', sku='SKU-SAL', quantity=1, reorder_level=5,
+            expiry_date=timezone.now().date() + timedelta(days=3),
+        )
+        alerts = self.client.get(self.url, {'sections': 'alerts'}).data['alerts']
+        titles = {a['title'] for a in alerts if 'Saline' in a['description']}
+        self.assertEqual(titles, {'Low stock alert', 'Stock expiring soon'})
+        ids = [a['id'] for a in alerts]
+        self.assertEqual(len(ids), len(set(ids)))
+
+    def test_sweep_invalidates_snapshot(self):
+        response = self.client.get(self.url, {'sections': 'alerts'})
+        etag = response['ETag']
+        self.assertNotIn('Stock expiring soon', [a['title'] for a in response.data['alerts']])
+
+        # A bulk update bypasses the save signals, so only the sweep sees it
+        InventoryItem.objects.filter(sku='SKU-5').update(expiry_date=timezone.now().date() + timedelta(days=10))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(sweep_alerts(), (1, 0, 0))
+        changed = self.client.get(self.url, {'sections': 'alerts'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertIn('Stock expiring soon', [a['title'] for a in changed.data['alerts']])
+
+    def test_sections_limit_payload(self):
+        cache.clear()
+        response = self.client.get(self.url, {'sections': 'metrics,alerts'})
+        self.assertEqual(set(response.data), {'metrics', 'alerts'})
+        self.assertEqual(self.client.get(self.url, {'sections': 'bogus'}).status_code, 400)
+
+    def test_conditional_get(self):
+        response = self.client.get(self.url, {'sections': 'metrics'})
+        etag = response['ETag']
+        with self.assertNumQueries(1):
+            cached = self.client.get(self.url, {'sections': 'metrics'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+        since = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(since.status_code, 304)
+        # A different section set is a different representation
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Supplier.objects.create(hospital=self.hospital, name='Globex', status='Active')
+        changed = self.client.get(self.url, {'sections': 'metrics'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+        self.assertEqual(changed.data['metrics']['active_suppliers'], 2)
+
+    def test_unknown_hospital(self):
+        response = self.client.get(reverse('dashboard-stats', kwargs={'hospital_id': 999}))
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(QUERY_PROFILING=True, QUERY_BUDGET_ACTION='raise')
+class GroupDashboardViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('group@example.com')
+        other = create_user('other@example.com')
+        cls.hospitals = [cls.make_hospital(i, cls.user) for i in range(4)]
+        cls.make_hospital(99, other)
+
+    @staticmethod
+    def make_hospital(index, admin):
+        hospital = create_hospital(admin, name=f'Hospital {index}')
+        Supplier.objects.create(hospital=hospital, name='Acme', status='Active')
+        return hospital
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('dashboard-group')
+
+    def test_lists_only_administered_hospitals(self):
+        response = self.client.get(self.url)
+        self.assertEqual([h['id'] for h in response.data['results']], [h.id for h in self.hospitals])
+        self.assertEqual(response.data['results'][0]['metrics']['active_suppliers'], 1)
+
+    def test_query_count_is_constant(self):
+        # hospital page, cache generations, inventory/device/supplier/ticket
+        # groups, baselines
+        with self.assertNumQueries(7):
+            self.client.get(self.url)
+        # Every hospital is now cached: only the hospital page is read
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+
+    def test_cursor_pagination(self):
+        first = self.client.get(self.url, {'limit': 3}).data
+        self.assertEqual(len(first['results']), 3)
+        second = self.client.get(first['next']).data
+        self.assertEqual([h['id'] for h in second['results']], [self.hospitals[3].id])
+        self.assertIsNone(second['next'])
+
+
+class DashboardBroadcasterTests(SimpleTestCase):
+    def setUp(self):
+        self.builds = []
+        self.payload = {
+            'metrics': {'low_stock_alerts': 1}, 'alerts': [], 'recent_activity': [],
+            'charts': {'inventory_overview': []},
+        }
+
+        self.version = 1
+
+        def build(hospital_id, sections=None, generation=None):
+            # Streams only ask for the sections they send
+            self.assertEqual(sections, ('metrics', 'alerts', 'recent_activity'))
+            self.builds.append(hospital_id)
+            return json.loads(json.dumps(self.payload))
+
+        self.broadcaster = DashboardBroadcaster(build=build, version=lambda hospital_id: self.version)
+        self.broadcaster.CHECK_INTERVAL = 0
+
+    async def test_subscribers_share_one_rebuild_and_receive_only_changes(self):
+        first, snapshot = await self.broadcaster.subscribe(1)
+        second, _ = await self.broadcaster.subscribe(1)
+        self.assertEqual(set(snapshot), {'metrics', 'alerts', 'recent_activity'})
+        self.assertEqual(self.builds, [1])
+
+        self.payload['metrics'] = {'low_stock_alerts': 2}
+        self.payload['charts'] = {'inventory_overview': [1]}
+        # Notifications arrive from request threads and are coalesced while the
+        # refresh is queued (the joins hold the loop so all three land first)
+        threads = [threading.Thread(target=self.broadcaster.notify, args=(1,)) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        changed = await asyncio.wait_for(first.get(), 1)
+        self.assertEqual(changed, {'metrics': {'low_stock_alerts': 2}})
+        self.assertEqual(await asyncio.wait_for(second.get(), 1), changed)
+        self.assertEqual(self.builds, [1, 1])
+
+    async def test_unchanged_payload_is_not_broadcast(self):
+        queue, _ = await self.broadcaster.subscribe(1)
+        self.broadcaster.notify(1)
+        await asyncio.sleep(0.05)
+        self.assertTrue(queue.empty())
+
+    async def test_unsubscribe_drops_empty_group(self):
+        queue, _ = await self.broadcaster.subscribe(1)
+        self.broadcaster.unsubscribe(1, queue)
+        self.assertEqual(self.broadcaster.subscriber_count(1), 0)
+        self.broadcaster.notify(1)
+        self.assertEqual(self.builds, [1])
+
+    async def test_check_picks_up_changes_saved_elsewhere(self):
+        queue, _ = await self.broadcaster.subscribe(1)
+        await self.broadcaster.check(1)
+        await asyncio.sleep(0.05)
+        self.assertEqual(self.builds, [1])
+
+        # Another process saved a change: no notify, only the stored version moved
+        self.payload['metrics'] = {'low_stock_alerts': 2}
+        self.version = 2
+        await self.broadcaster.check(1)
+        self.assertEqual(await asyncio.wait_for(queue.get(), 1), {'metrics': {'low_stock_alerts': 2}})
+        await self.broadcaster.check(1)
+        await asyncio.sleep(0.05)
+        self.assertEqual(self.builds, [1, 1])
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), QR_WORKER='command')
+class DashboardStreamViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        cls.hospital = create_hospital(cls.user)
+        InventoryItem.objects.create(hospital=cls.hospital, name='Gloves', sku='G-1', quantity=1, reorder_level=3)
+
+    def setUp(self):
+        cache.clear()
+        self.token = str(AccessToken.for_user(self.user))
+        self.url = reverse('dashboard-stream', kwargs={'hospital_id': self.hospital.id})
+
+    async def test_requires_authentication(self):
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get(self.url, {'token': 'not-a-token'})
+        self.assertEqual(response.status_code, 401)
+
+    async def test_unknown_hospital(self):
+        url = reverse('dashboard-stream', kwargs={'hospital_id': self.hospital.id + 100})
+        response = await self.async_client.get(url, {'token': self.token})
+        self.assertEqual(response.status_code, 404)
+
+    async def test_starts_with_snapshot(self):
+        response = await self.async_client.get(self.url, {'token': self.token})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        first = await anext(response.streaming_content)
+        self.assertTrue(first.startswith(b'event: snapshot'))
+        self.assertEqual(json.loads(first.split(b'data: ', 1)[1])['metrics']['low_stock_alerts'], 1)
+        await response.streaming_content.aclose()
+
+    async def test_keep_alive_picks_up_changes_from_other_processes(self):
+        @sync_to_async
+        def change_elsewhere():
+            # bulk_create sends no signals and bump_version alone doesn't notify,
+            # as if another worker had saved the item
+            InventoryItem.objects.bulk_create([
+                InventoryItem(hospital=self.hospital, name='Masks', sku='M-1', quantity=0, reorder_level=3),
+            ])
+            bump_version(self.hospital.id)
+
+        with patch.object(DashboardStreamView, 'KEEPALIVE_SECONDS', 0.01), \
+                patch.object(broadcaster, 'CHECK_INTERVAL', 0):
+            response = await self.async_client.get(self.url, {'token': self.token})
+            await anext(response.streaming_content)
+            await change_elsewhere()
+            for _ in range(50):
+                chunk = await anext(response.streaming_content)
+                if chunk.startswith(b'event: update'):
+                    break
+            await response.streaming_content.aclose()
+        self.assertTrue(chunk.startswith(b'event: update'))
+        self.assertEqual(json.loads(chunk.split(b'data: ', 1)[1])['metrics']['low_stock_alerts'], 2)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), QR_WORKER='command')
+class ReliabilityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        hospitals = [create_hospital(cls.user, name=name) for name in ('General', 'Other')]
+        cls.hospital = hospitals[0]
+        engineer = create_engineer(cls.user, cls.hospital)
+        cls.today = timezone.localdate()
+
+        def device(hospital, serial, model, department, installed_days_ago=None):
+            installed = cls.today - timedelta(days=installed_days_ago) if installed_days_ago is not None else None
+            return Device.objects.create(
+                hospital=hospital, make_model=model, serial_number=serial, asset_number=serial,
+                department=department, date_of_installation=installed,
+            )
+
+        def incident(device, days_ago):
+            report = IncidentReport.objects.create(device=device, incident_type='comp_failure', description='Failed')
+            IncidentReport.objects.filter(pk=report.pk).update(incident_date=timezone.now() - timedelta(days=days_ago))
+
+        def service(device, days_ago, status='completed'):
+            log = ServiceLog.objects.create(device=device, engineer=engineer, status=status)
+            ServiceLog.objects.filter(pk=log.pk).update(service_date=cls.today - timedelta(days=days_ago))
+
+        # Two failures, repaired after 2 days and the same day; 98 of 100 days up
+        cls.pump = device(cls.hospital, 'SN-1', 'Pump', 'ICU', installed_days_ago=100)
+        incident(cls.pump, 80)
+        service(cls.pump, 79, status='scheduled')
+        service(cls.pump, 78)
+        incident(cls.pump, 40)
+        service(cls.pump, 40)
+        # No install date: observed from its first service; the failure is still open
+        ward_pump = device(cls.hospital, 'SN-2', 'Pump', 'Ward', None)
+        service(ward_pump, 50)
+        incident(ward_pump, 30)
+        # No failures in 10 days
+        device(cls.hospital, 'SN-3', 'Monitor', 'ICU', installed_days_ago=10)
+        incident(device(hospitals[1], 'SN-4', 'Pump', 'ICU', installed_days_ago=5), 1)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('dashboard-reliability', kwargs={'hospital_id': self.hospital.id})
+
+    def test_metrics_by_group(self):
+        report = self.client.get(self.url).data
+        self.assertEqual(report['overall'], {'devices': 3, 'failures': 3, 'repairs': 2, 'mtbf_days': 52.67, 'mttr_days': 1.0})
+        self.assertEqual(report['by_model'], [
+            {'make_model': 'Pump', 'devices': 2, 'failures': 3, 'repairs': 2, 'mtbf_days': 49.33, 'mttr_days': 1.0},
+            {'make_model': 'Monitor', 'devices': 1, 'failures': 0, 'repairs': 0, 'mtbf_days': None, 'mttr_days': None},
+        ])
+        self.assertEqual(
+            {row['department']: row['mtbf_days'] for row in report['by_department']}, {'ICU': 54.0, 'Ward': 50.0},
+        )
+        self.assertEqual([row['serial_number'] for row in report['by_device']], ['SN-1', 'SN-2', 'SN-3'])
+        self.assertEqual(report['by_device'][0]['mtbf_days'], 49.0)
+
+        only = self.client.get(self.url, {'by': 'model'}).data
+        self.assertNotIn('by_device', only)
+        self.assertEqual(self.client.get(self.url, {'by': 'room'}).status_code, 400)
+
+    def test_unknown_hospital(self):
+        url = reverse('dashboard-reliability', kwargs={'hospital_id': self.hospital.id + 100})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.data, {"error": "Hospital not found"})
+
+    def test_cached_per_hospital_until_history_changes(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            IncidentReport.objects.create(device=self.pump, incident_type='comp_failure', description='Again')
+        self.assertIsNone(cache.get(RELIABILITY_KEY.format(hospital_id=self.hospital.id)))
+        self.assertEqual(self.client.get(self.url).data['overall']['failures'], 4)
+
+    def test_batch_job_warms_every_hospital(self):
+        out = StringIO()
+        call_command('compute_reliability', '--chunk-size', '2', stdout=out)
+        self.assertIn('Cached reliability for 2 hospitals (4 failures analysed)', out.getvalue())
+        self.assertEqual(cache.get(RELIABILITY_KEY.format(hospital_id=self.hospital.id))['overall']['failures'], 3)
+        self.assertEqual(warm_reliability([self.hospital.id])[self.hospital.id]['overall']['devices'], 3)
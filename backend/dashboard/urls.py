@@ -1,7 +1,17 @@
 from django.urls import path
-from .views import DashboardStatsView
+from .views import DashboardStatsView, DashboardStreamView, GroupDashboardView, ActivityFeedView, AlertListView, ReliabilityView
 
 urlpatterns = [
     # The main dashboard endpoint
     path('dashboard/hospitals/<int:hospital_id>/dashboard/', DashboardStatsView.as_view(), name='dashboard-stats'),
-]
\ No newline at end of file
+    # Metric cards across every hospital the user administers
+    path('dashboard/hospitals/', GroupDashboardView.as_view(), name='dashboard-group'),
+    # Full recent-activity history
+    path('dashboard/hospitals/<int:hospital_id>/activity/', ActivityFeedView.as_view(), name='dashboard-activity'),
+    # Open alerts (low stock, expiring, calibration due)
+    path('dashboard/hospitals/<int:hospital_id>/alerts/', AlertListView.as_view(), name='dashboard-alerts'),
+    # MTBF / MTTR by model, department and device
+    path('dashboard/hospitals/<int:hospital_id>/reliability/', ReliabilityView.as_view(), name='dashboard-reliability'),
+    # Live updates (server-sent events)
+    path('dashboard/hospitals/<int:hospital_id>/dashboard/stream/', DashboardStreamView.as_view(), name='dashboard-stream'),
+]
@@ -1,172 +1,222 @@
+import asyncio
+from datetime import datetime, time
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views import View
+from rest_framework import generics
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from hospitals.models import Hospital
-from inventory.models import InventoryItem, Category
-from device.models import Device, ServiceLog, Calibration
-from suppliers.models import Supplier
-from tickets.models import Ticket
-from django.db.models import Count, F, Q
-from django.utils import timezone
-from datetime import timedelta
-from django.db.models.functions import TruncMonth
+from .aggregates import DashboardAggregator
+from .cache import get_dashboard_snapshot
+from .activity import serialize_activity
+from .events import broadcaster, format_event
+from .group import group_metric_cards
+from .models import ActivityEvent, Alert
+from .reliability import GROUPINGS, get_reliability
 
 class DashboardStatsView(APIView):
+    """
+    Dashboard payload for a hospital. ``?sections=metrics,alerts`` limits the
+    response to those sections. Responses carry a strong ETag and
+    Last-Modified derived from the hospital's change counter, so a conditional
+    request for an unchanged dashboard gets a 304 without any aggregation.
+    """
     permission_classes = [IsAuthenticated]
 
     def get(self, request, hospital_id):
-        # Ensure the hospital exists
-        try:
-            hospital = Hospital.objects.get(id=hospital_id)
-        except Hospital.DoesNotExist:
+        sections = request.query_params.get('sections')
+        if sections:
+            sections = [name.strip() for name in sections.split(',') if name.strip()]
+            unknown = set(sections) - set(DashboardAggregator.SECTIONS)
+            if unknown:
+                return Response({"error": f"Unknown sections: {', '.join(sorted(unknown))}",
+                                 "sections": DashboardAggregator.SECTIONS}, status=400)
+            sections = tuple(name for name in DashboardAggregator.SECTIONS if name in sections)
+
+        # Ensure the hospital exists and read its change counter in one query
+        hospital = Hospital.objects.filter(id=hospital_id).values_list(
+            'created_at', 'change_counter__version', 'change_counter__changed_at'
+        ).first()
+        if hospital is None:
             return Response({"error": "Hospital not found"}, status=404)
+        created_at, version, changed_at = hospital
+        version, changed_at = version or 0, changed_at or created_at
+
+        # Date-relative sections (due dates, upcoming work) roll over at midnight
+        # even when nothing is saved, so the day is part of the validators
+        today = timezone.localdate()
+        midnight = timezone.make_aware(datetime.combine(today, time.min))
+        last_modified = max(changed_at, midnight)
+        etag = f'"{hospital_id}-{version}-{today.isoformat()}-{"+".join(sections) if sections else "all"}"'
+
+        not_modified = get_conditional_response(
+            request._request, etag=etag, last_modified=int(last_modified.timestamp())
+        )
+        if not_modified is not None:
+            return not_modified
+
+        payload = get_dashboard_snapshot(hospital_id, sections=sections, generation=version)
+        response = Response(payload)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+class HospitalCursorPagination(CursorPagination):
+    page_size = 25
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    ordering = 'id'
+
+
+class GroupDashboardView(generics.GenericAPIView):
+    """
+    Metric cards for every hospital the user administers (all hospitals for
+    staff), a cursor-paginated page at a time.
+    """
+    permission_classes = [IsAuthenticated]
+    pagination_class = HospitalCursorPagination
+
+    def get_queryset(self):
+        hospitals = Hospital.objects.all()
+        if not (self.request.user.is_staff or self.request.user.is_superuser):
+            hospitals = hospitals.filter(admin=self.request.user)
+        return hospitals.values('id', 'name', 'city', 'is_active')
+
+    def get(self, request):
+        page = self.paginate_queryset(self.get_queryset())
+        cards = group_metric_cards([hospital['id'] for hospital in page])
+        results = [{**hospital, "metrics": cards[hospital['id']]} for hospital in page]
+        return self.get_paginated_response(results)
+
+
+class ActivityCursorPagination(CursorPagination):
+    page_size = 20
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
+
+
+class ActivityFeedView(generics.GenericAPIView):
+    """Keyset-paginated activity feed for a hospital, newest first."""
+    permission_classes = [IsAuthenticated]
+    pagination_class = ActivityCursorPagination
+
+    def get_queryset(self):
+        return ActivityEvent.objects.filter(hospital_id=self.kwargs['hospital_id']) \
+            .values('id', 'kind', 'actor_name', 'action', 'item', 'created_at')
+
+    def get(self, request, hospital_id):
+        page = self.paginate_queryset(self.get_queryset())
+        return self.get_paginated_response(
+            [{**serialize_activity(event), "kind": event['kind']} for event in page]
+        )
 
-        # --- 1. Metric Cards Data ---
-        
-        # Calculate start of the "previous month" for trend comparison
-        today = timezone.now().date()
-        first_day_current_month = today.replace(day=1)
-        last_day_prev_month = first_day_current_month - timedelta(days=1)
-        first_day_prev_month = last_day_prev_month.replace(day=1)
-
-        total_inventory = InventoryItem.objects.filter(hospital=hospital).count()
-        devices_maint = Device.objects.filter(hospital=hospital, is_active='Under_Maintenance').count()
-        low_stock = InventoryItem.objects.filter(hospital=hospital, quantity__lte=F('reorder_level')).count()
-        active_suppliers = Supplier.objects.filter(hospital=hospital, status='Active').count()
-
-        # Bonus: Calculate % change (this is a simple way)
-        # We compare current count vs. count at the start of the month
-        # A more robust way involves data warehousing or daily snapshots
-        prev_low_stock = InventoryItem.objects.filter(
-            hospital=hospital, 
-            quantity__lte=F('reorder_level'),
-            last_updated__lt=first_day_current_month
-        ).count()
-
-        metrics = {
-            "total_inventory_items": total_inventory,
-            "devices_under_maintenance": devices_maint,
-            "low_stock_alerts": low_stock,
-            "active_suppliers": active_suppliers,
-            "trends": {
-                # Trend logic is simplified here. You can expand this.
-                "low_stock_change": low_stock - prev_low_stock 
-            }
-        }
-
-        # --- 2. Alerts & Notifications ---
-        alerts = []
-        
-        # Low Stock Alerts
-        low_stock_items = InventoryItem.objects.filter(
-            hospital=hospital, 
-            quantity__lte=F('reorder_level')
-        ).order_by('-last_updated')[:3]
-        for item in low_stock_items:
-            alerts.append({
-                "id": f"inv-{item.id}", "type": "inventory", "priority": "high",
-                "title": "Low stock alert",
-                "description": f"{item.name} is running low ({item.quantity} remaining)",
-                "time": item.last_updated.isoformat()
-            })
-
-        # Calibration Due Alerts
-        calibration_due = Device.objects.filter(
-            hospital=hospital,
-            next_calibration__lte=today + timedelta(days=30), # Due in next 30 days
-            next_calibration__gte=today
-        ).order_by('next_calibration')[:3]
-        for device in calibration_due:
-            alerts.append({
-                "id": f"dev-{device.id}", "type": "device", "priority": "medium",
-                "title": "Calibration due",
-                "description": f"{device.make_model} (SN: {device.serial_number}) requires calibration",
-                "time": device.next_calibration.isoformat()
-            })
-
-        # --- 3. Upcoming Maintenance ---
-        upcoming_maintenance = []
-        upcoming_cal = Calibration.objects.filter(
-            device__hospital=hospital, status='scheduled', calibration_date__gte=today
-        ).select_related('device').order_by('calibration_date')[:3]
-        
-        for cal in upcoming_cal:
-            upcoming_maintenance.append({
-                "id": f"cal-{cal.id}",
-                "device": cal.device.make_model,
-                "type": "Calibration",
-                "date": cal.calibration_date.isoformat(),
-                "status": "scheduled"
-            })
-        
-        # You can merge ServiceLog query here too
-        # ...
-
-        # --- 4. Inventory Categories ---
-        category_data = []
-        total_item_count = InventoryItem.objects.filter(hospital=hospital).count()
-        if total_item_count > 0:
-            categories = Category.objects.filter(hospital=hospital).annotate(
-                item_count=Count('items')
-            ).filter(item_count__gt=0).order_by('-item_count')
-            
-            for cat in categories:
-                category_data.append({
-                    "name": cat.name,
-                    "percentage": round((cat.item_count / total_item_count) * 100, 1)
-                })
-
-        # --- 5. Charts (Inventory & Maintenance) ---
-        # We group by month. This is a powerful Django query!
-        inventory_chart = InventoryItem.objects.filter(hospital=hospital) \
-            .annotate(month=TruncMonth('last_updated')) \
-            .values('month') \
-            .annotate(value=Count('id')) \
-            .order_by('month')
-            
-        maintenance_chart = ServiceLog.objects.filter(device__hospital=hospital, status='completed') \
-            .annotate(month=TruncMonth('service_date')) \
-            .values('month') \
-            .annotate(value=Count('id')) \
-            .order_by('month')
-
-        charts = {
-            "inventory_overview": [
-                {"name": item['month'].strftime('%b'), "value": item['value']} for item in inventory_chart
-            ],
-            "maintenance_overview": [
-                {"name": item['month'].strftime('%b'), "value": item['value']} for item in maintenance_chart
-            ]
-        }
-
-        # --- 6. Recent Activity ---
-        # Let's combine completed Service Logs and new Tickets
-        recent_activity = []
-        completed_logs = ServiceLog.objects.filter(
-            device__hospital=hospital, status='completed'
-        ).select_related('engineer__user', 'device').order_by('-service_date')[:5]
-
-        for log in completed_logs:
-            recent_activity.append({
-                "id": f"log-{log.id}",
-                "user": log.engineer.user.get_full_name() if log.engineer else "System",
-                "action": "completed maintenance on",
-                "item": log.device.make_model,
-                "time": log.service_date.isoformat()
-            })
-        
-        # Sort by time (if you combine multiple sources)
-        recent_activity.sort(key=lambda x: x['time'], reverse=True)
-
-
-        # --- Final JSON Response ---
-        payload = {
-            "metrics": metrics,
-            "alerts": sorted(alerts, key=lambda x: x['time'], reverse=True),
-            "upcoming_maintenance": upcoming_maintenance,
-            "inventory_categories": category_data,
-            "charts": charts,
-            "recent_activity": recent_activity,
-        }
-        
-        return Response(payload)
\ No newline at end of file
+
+class AlertPagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = 'limit'
+    max_page_size = 100
+
+
+class AlertListView(generics.GenericAPIView):
+    """Open alerts for a hospital, filterable by ?type= and ?priority=."""
+    permission_classes = [IsAuthenticated]
+    pagination_class = AlertPagination
+
+    def get_queryset(self):
+        alerts = Alert.objects.filter(hospital_id=self.kwargs['hospital_id'], is_open=True)
+        for field in ('type', 'priority'):
+            value = self.request.query_params.get(field)
+            if value:
+                alerts = alerts.filter(**{field: value})
+        return alerts.order_by('-opened_at', '-id').values(
+            'id', 'type', 'priority', 'title', 'description', 'target_type', 'target_id',
+            'due_date', 'opened_at', 'updated_at',
+        )
+
+    def get(self, request, hospital_id):
+        page = self.paginate_queryset(self.get_queryset())
+        return self.get_paginated_response(page)
+
+
+class ReliabilityView(APIView):
+    """
+    MTBF and MTTR for a hospital's fleet (see dashboard/reliability.py),
+    overall and ``?by=model,department,device`` (all three by default).
+    Served from the per-hospital cache that compute_reliability warms.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, hospital_id):
+        groupings = [name.strip() for name in request.query_params.get('by', '').split(',') if name.strip()]
+        unknown = set(groupings) - set(GROUPINGS)
+        if unknown:
+            return Response({"error": f"Unknown groupings: {', '.join(sorted(unknown))}",
+                             "groupings": GROUPINGS}, status=400)
+        report = get_reliability(hospital_id)
+        if report is None:
+            # No devices, or no such hospital; a cached report implies the hospital exists
+            if not Hospital.objects.filter(id=hospital_id).exists():
+                return Response({"error": "Hospital not found"}, status=404)
+            return Response({"overall": None})
+        hidden = {f'by_{name}' for name in GROUPINGS if groupings and name not in groupings}
+        return Response({key: value for key, value in report.items() if key not in hidden})
+
+
+class DashboardStreamView(View):
+    """
+    Server-sent events for a hospital dashboard. Sends a ``snapshot`` event
+    with the metrics, alerts and recent_activity sections, then an ``update``
+    event carrying only the sections that changed. Needs an ASGI server to
+    hold connections open without tying up a worker each.
+    """
+    KEEPALIVE_SECONDS = 15
+
+    def authenticate(self, request):
+        # EventSource cannot set headers, so also accept ?token=<access token>
+        token = request.GET.get('token')
+        if token and 'HTTP_AUTHORIZATION' not in request.META:
+            request.META['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+        try:
+            result = JWTAuthentication().authenticate(request)
+        except (InvalidToken, TokenError):
+            return None
+        return result[0] if result else None
+
+    async def get(self, request, hospital_id):
+        user = await sync_to_async(self.authenticate)(request)
+        if user is None:
+            return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+        if not await Hospital.objects.filter(id=hospital_id).aexists():
+            return JsonResponse({"error": "Hospital not found"}, status=404)
+
+        response = StreamingHttpResponse(self.stream(hospital_id), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # stop nginx from buffering the stream
+        return response
+
+    async def stream(self, hospital_id):
+        queue, snapshot = await broadcaster.subscribe(hospital_id)
+        try:
+            yield format_event('snapshot', snapshot)
+            while True:
+                try:
+                    changed = await asyncio.wait_for(queue.get(), timeout=self.KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    # Changes saved by other processes don't signal this one
+                    await broadcaster.check(hospital_id)
+                    yield ': keep-alive\n\n'
+                    continue
+                yield format_event('update', changed)
+        finally:
+            broadcaster.unsubscribe(hospital_id, queue)
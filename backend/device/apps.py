@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class DeviceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'device'
+
+    def ready(self):
+        from . import nfc  # noqa: F401
+        from .scheduler import start_runner
+        start_runner()
@@ -0,0 +1,227 @@
+"""
+Bulk device import: rows are read from a CSV, JSON array or NDJSON stream
+without buffering the upload, validated a chunk at a time with set-based
+uniqueness checks, and written with bulk_create/bulk_update in one
+transaction per chunk. Rows are keyed by serial_number: a known serial in
+this hospital updates the device, an unknown one creates it. Bulk writes skip
+the Device save signals, so each chunk refreshes the written devices' alerts
+and invalidates the hospital's dashboard and reliability caches itself. QR
+codes for everything written are queued once at the end.
+"""
+import codecs
+import csv
+import json
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from rest_framework import serializers
+from dashboard.alerts import refresh_device_alerts
+from dashboard.cache import invalidate_dashboard
+from dashboard.reliability import invalidate_reliability
+from qrcodes.worker import DEVICE, enqueue
+from .models import Device
+from .nfc import tag_cache
+
+CHUNK_SIZE = 500
+MAX_ROWS = 10000
+FORMATS = ('csv', 'json', 'ndjson')
+
+
+class MalformedUpload(ValueError):
+    pass
+
+
+class DeviceImportSerializer(serializers.ModelSerializer):
+    """Validates one import row; uniqueness is checked per chunk by DeviceImport."""
+
+    class Meta:
+        model = Device
+        fields = [
+            'name', 'make_model', 'manufacture', 'serial_number', 'date_of_installation', 'warranty_until',
+            'asset_number', 'asset_details', 'nfc_uuid', 'is_active', 'department', 'Room',
+        ]
+        extra_kwargs = {'serial_number': {'validators': []}, 'nfc_uuid': {'validators': []}}
+
+    def validate_nfc_uuid(self, value):
+        return value or None
+
+
+def _csv_rows(text):
+    for row in csv.DictReader(text):
+        yield {key.strip(): (value.strip() or None) if isinstance(value, str) else value
+               for key, value in row.items() if key is not None}
+
+
+def _ndjson_rows(text):
+    for number, line in enumerate(text, 1):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as exc:
+                raise MalformedUpload(f'Line {number}: {exc.msg}') from exc
+
+
+def _json_rows(text, read_size=64 * 1024):
+    """Yield the elements of a top-level JSON array, decoding one element at a time."""
+    decoder = json.JSONDecoder()
+    buffer, started, exhausted = '', False, False
+    while True:
+        buffer = buffer.lstrip()
+        if not started and buffer:
+            if buffer[0] != '[':
+                raise MalformedUpload('Expected a JSON array of rows')
+            buffer, started = buffer[1:], True
+            continue
+        if started and buffer.startswith(','):
+            buffer = buffer[1:]
+            continue
+        if started and buffer.startswith(']'):
+            if buffer[1:].strip() or text.read(1).strip():
+                raise MalformedUpload('Unexpected data after the JSON array')
+            return
+        if started and buffer:
+            try:
+                element, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError as exc:
+                if exhausted:
+                    raise MalformedUpload(f'Invalid JSON: {exc.msg}') from exc
+            else:
+                buffer = buffer[end:]
+                yield element
+                continue
+        if exhausted:
+            raise MalformedUpload('Unexpected end of JSON array')
+        chunk = text.read(read_size)
+        exhausted = not chunk
+        buffer += chunk
+
+
+def read_rows(stream, fmt):
+    """Decode a binary stream of rows (csv, json or ndjson) lazily."""
+    text = codecs.getreader('utf-8-sig')(stream)
+    reader = {'csv': _csv_rows, 'json': _json_rows, 'ndjson': _ndjson_rows}[fmt]
+    try:
+        yield from reader(text)
+    except (UnicodeDecodeError, csv.Error) as exc:
+        raise MalformedUpload(str(exc)) from exc
+
+
+class DeviceImport:
+    def __init__(self, hospital):
+        self.hospital = hospital
+        self.created = 0
+        self.updated = 0
+        self.errors = []
+        self.qr_targets = []
+        self.seen_serials = set()
+        self.seen_tags = set()
+
+    def run(self, rows):
+        """Import rows (an iterable of dicts); returns the summary the view serves."""
+        error = None
+        chunk = []
+        try:
+            for number, row in enumerate(rows, 1):
+                if number > MAX_ROWS:
+                    error = f'At most {MAX_ROWS} rows per import; the rest were not read'
+                    break
+                chunk.append((number, row))
+                if len(chunk) == CHUNK_SIZE:
+                    self.write_chunk(chunk)
+                    chunk = []
+        except MalformedUpload as exc:
+            error = str(exc)
+        if chunk:
+            self.write_chunk(chunk)
+        queued = 0
+        if self.qr_targets and getattr(settings, 'QR_STORE_IMAGES', False):
+            queued = enqueue(DEVICE, self.qr_targets, mark_pending=True)
+        summary = {
+            'created': self.created,
+            'updated': self.updated,
+            'failed': len(self.errors),
+            'errors': self.errors,
+            'qr_queued': queued,
+        }
+        if error:
+            summary['error'] = error
+        return summary
+
+    def fail(self, number, row, errors):
+        serial = row.get('serial_number') if isinstance(row, dict) else None
+        self.errors.append({'row': number, 'serial_number': serial, 'errors': errors})
+
+    def write_chunk(self, chunk):
+        rows = [(number, row) for number, row in chunk if isinstance(row, dict)]
+        for number, row in chunk:
+            if not isinstance(row, dict):
+                self.fail(number, row, {'non_field_errors': ['Each row must be an object']})
+
+        serials = {row.get('serial_number') for _, row in rows if row.get('serial_number')}
+        tags = {row.get('nfc_uuid') for _, row in rows if row.get('nfc_uuid')}
+        existing = {device.serial_number: device for device in Device.objects.filter(serial_number__in=serials)}
+        tag_owners = dict(Device.objects.filter(nfc_uuid__in=tags).values_list('nfc_uuid', 'id'))
+
+        new, changed, written, update_fields = [], [], [], set()
+        for number, row in rows:
+            device = existing.get(row.get('serial_number'))
+            if device is not None and device.hospital_id != self.hospital.id:
+                self.fail(number, row, {'serial_number': ['This serial number belongs to another hospital.']})
+                continue
+            serializer = DeviceImportSerializer(device, data=row, partial=device is not None)
+            if not serializer.is_valid():
+                self.fail(number, row, serializer.errors)
+                continue
+            data = dict(serializer.validated_data)
+            serial = data.get('serial_number', row.get('serial_number'))
+            if serial in self.seen_serials:
+                self.fail(number, row, {'serial_number': ['Duplicate serial number in this upload.']})
+                continue
+            tag = data.get('nfc_uuid')
+            owner = tag_owners.get(tag)
+            if tag and (tag in self.seen_tags or (owner is not None and (device is None or owner != device.id))):
+                self.fail(number, row, {'nfc_uuid': ['This NFC tag is already assigned.']})
+                continue
+            self.seen_serials.add(serial)
+            if tag:
+                self.seen_tags.add(tag)
+
+            if device is None:
+                # Not stored images are served on demand, as the QR pre_save receiver would mark them
+                qr_status = 'pending' if getattr(settings, 'QR_STORE_IMAGES', False) else 'ready'
+                new.append(Device(hospital=self.hospital, qr_status=qr_status, **data))
+            else:
+                # Identity fields are fixed after creation, as in DeviceSerializer.update
+                data.pop('serial_number', None)
+                data.pop('asset_number', None)
+                old_tag = device.nfc_uuid
+                for field, value in data.items():
+                    setattr(device, field, value)
+                update_fields.update(data)
+                changed.append((device, old_tag))
+            written.append((number, row))
+
+        try:
+            with transaction.atomic():
+                created = Device.objects.bulk_create(new)
+                if changed and update_fields:
+                    Device.objects.bulk_update([device for device, _ in changed], sorted(update_fields))
+                # Once per chunk, what the Device post_save receivers do per row
+                devices = created + [device for device, _ in changed]
+                if devices:
+                    refresh_device_alerts(devices)
+                    invalidate_dashboard(self.hospital.id)
+                    invalidate_reliability(self.hospital.id)
+        except IntegrityError as exc:
+            # A concurrent write took a serial or tag since the chunk was checked
+            for number, row in written:
+                self.fail(number, row, {'non_field_errors': [f'Not saved: {exc}']})
+            return
+
+        self.created += len(created)
+        self.updated += len(changed)
+        self.qr_targets += [device.pk for device in created]
+        for device, old_tag in changed:
+            # bulk_update skips the post_save receivers that keep these current
+            tag_cache.invalidate(device.pk, (self.hospital.id, old_tag) if old_tag else None)
+            if device.nfc_uuid != old_tag:
+                self.qr_targets.append(device.pk)
@@ -0,0 +1,32 @@
+from datetime import timedelta
+from django.utils import timezone
+from django_filters import rest_framework as filters
+from rest_framework.exceptions import ValidationError
+from .models import Device
+
+MAX_DUE_WITHIN_DAYS = 36500  # ?calibration_due_within= beyond this would overflow the date
+
+
+class DeviceFilter(filters.FilterSet):
+    """
+    Registry filters, each served by one of Device's (hospital, ...) indexes.
+    Calibration windows read the denormalized Device.next_calibration column:
+    ?calibration_due_within=30 is "due in the next 30 days (or overdue)".
+    """
+    calibration_due_after = filters.DateFilter(field_name='next_calibration', lookup_expr='gte')
+    calibration_due_before = filters.DateFilter(field_name='next_calibration', lookup_expr='lte')
+    calibration_due_within = filters.NumberFilter(method='filter_due_within')
+
+    class Meta:
+        model = Device
+        fields = ['department', 'is_active', 'Room']
+
+    def filter_due_within(self, queryset, name, value):
+        try:
+            days = int(value)
+            if not 0 <= days <= MAX_DUE_WITHIN_DAYS:
+                raise ValueError
+        except (ValueError, OverflowError):
+            raise ValidationError({name: f"Expected a number of days from 0 to {MAX_DUE_WITHIN_DAYS}."})
+        cutoff = timezone.now().date() + timedelta(days=days)
+        return queryset.filter(next_calibration__lte=cutoff)
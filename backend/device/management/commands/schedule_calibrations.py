@@ -0,0 +1,29 @@
+import time
+from django.core.management.base import BaseCommand
+from device.scheduler import INTERVAL, schedule_due_calibrations
+
+
+class Command(BaseCommand):
+    help = 'Book calibrations (and optionally tickets) for devices coming due, balanced across engineers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--horizon', type=int, help='Days ahead to schedule (default PM_HORIZON_DAYS)')
+        parser.add_argument('--tickets', action='store_true', default=None,
+                            help='Also open a calibration ticket per booking (default PM_CREATE_TICKETS)')
+        parser.add_argument('--hospital', type=int, action='append', dest='hospitals',
+                            help='Only this hospital id; repeatable')
+        parser.add_argument('--loop', action='store_true', help='Keep running, one pass every --interval seconds')
+        parser.add_argument('--interval', type=float, default=INTERVAL, help='Seconds between passes with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            totals = schedule_due_calibrations(
+                horizon=options['horizon'], tickets=options['tickets'], hospital_ids=options['hospitals'],
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f"Scheduled {totals['calibrations']} calibrations and {totals['tickets']} tickets "
+                f"across {totals['hospitals']} hospitals"
+            ))
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
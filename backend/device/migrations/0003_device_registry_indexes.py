@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-17 15:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('device', '0002_device_nfc_uuid'),
+        ('hospitals', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='device',
+            index=models.Index(fields=['hospital', 'department'], name='device_hospital_dept_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='device',
+            index=models.Index(fields=['hospital', 'is_active'], name='device_hospital_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='device',
+            index=models.Index(fields=['hospital', 'Room'], name='device_hospital_room_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='device',
+            index=models.Index(fields=['hospital', 'next_calibration', 'id'], name='device_hospital_calib_idx'),
+        ),
+    ]
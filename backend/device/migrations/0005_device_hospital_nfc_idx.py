@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 15:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('device', '0004_device_qr_status'),
+        ('hospitals', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='device',
+            index=models.Index(fields=['hospital', 'nfc_uuid'], name='device_hospital_nfc_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-17 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('device', '0005_device_hospital_nfc_idx'),
+        ('employees', '0002_employee_unique_employee_per_hospital'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='calibration',
+            index=models.Index(fields=['device', 'calibration_date', 'id'], name='calibration_device_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='documentation',
+            index=models.Index(fields=['device', 'last_updated', 'id'], name='documentation_device_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incidentreport',
+            index=models.Index(fields=['device', 'incident_date', 'id'], name='incident_device_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicelog',
+            index=models.Index(fields=['device', 'service_date', 'id'], name='servicelog_device_date_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-17 15:26
+
+from django.db import migrations
+from django.db.models import Exists, OuterRef, Subquery
+from django.utils import timezone
+
+
+def copy_latest_next_calibration(apps, schema_editor):
+    # The old receiver only copied the date when a calibration was created.
+    # Bookings (scheduled, dated in the future) are skipped, as in
+    # device.models.without_bookings.
+    Device = apps.get_model('device', 'Device')
+    Calibration = apps.get_model('device', 'Calibration')
+    calibrations = Calibration.objects.filter(device=OuterRef('pk'), next_calibration__isnull=False) \
+        .exclude(status='scheduled', calibration_date__gt=timezone.now())
+    Device.objects.filter(Exists(calibrations)).update(
+        next_calibration=Subquery(calibrations.order_by('-calibration_date', '-id').values('next_calibration')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('device', '0006_device_history_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_latest_next_calibration, migrations.RunPython.noop),
+    ]
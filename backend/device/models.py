@@ -1,11 +1,16 @@
 from django.db import models
 from hospitals.models import Hospital
 from employees.models import Employee
-from django.db.models.signals import post_save
+from django.db.models import Exists, OuterRef, Subquery
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
+from django.utils import timezone
 import qrcode
 from django.core.files import File
 from io import BytesIO
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 # Create your models here.
@@ -25,26 +30,43 @@ class Device(models.Model):
     nfc_uuid = models.CharField(max_length=64, unique=True, null=True, blank=True)
     next_calibration = models.DateField(null=True, blank=True)
     qr_code = models.ImageField(upload_to='device_qr_codes/%Y/%m/%d/', null=True, blank=True)
+    # Rendered by the qrcodes worker; qr_hash is the sha256 of the payload in qr_code
+    qr_status = models.CharField(max_length=10, choices=[('pending','Pending'),('ready','Ready'),('failed','Failed')], default='pending')
+    qr_hash = models.CharField(max_length=64, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Registry filters and the (next_calibration, id) keyset, all per hospital
+            models.Index(fields=['hospital', 'department'], name='device_hospital_dept_idx'),
+            models.Index(fields=['hospital', 'is_active'], name='device_hospital_status_idx'),
+            models.Index(fields=['hospital', 'Room'], name='device_hospital_room_idx'),
+            models.Index(fields=['hospital', 'next_calibration', 'id'], name='device_hospital_calib_idx'),
+            # NFC tag resolution
+            models.Index(fields=['hospital', 'nfc_uuid'], name='device_hospital_nfc_idx'),
+        ]
     
     def __str__(self):
         return f"{self.make_model} ({self.serial_number}) - {self.hospital.name}"
     
-    def generate_qr_code(self):
-        """Generate and save a QR code for the device."""
+    def qr_payload(self):
+        """The text encoded in the device's QR code."""
         qr_data = {
             "hospital_id": self.hospital_id,
             "device_id": self.id,
             "asset_number": self.asset_number,
             "nfc_id": self.nfc_uuid
         }
-        qr_url = f"https://meditrackpro.com/devices/{self.hospital_id}/{self.id}"  # Example URL for mobile app
+        return str(qr_data)
+
+    def generate_qr_code(self):
+        """Render the QR code into qr_code (the caller saves the instance)."""
         qr = qrcode.QRCode(
             version=1,
             error_correction=qrcode.constants.ERROR_CORRECT_L,
             box_size=10,
             border=4,
         )
-        qr.add_data(qr_data)  # Encode the URL (can change to JSON if needed)
+        qr.add_data(self.qr_payload())
         qr.make(fit=True)
         
         # Create image
@@ -68,6 +90,9 @@ class ServiceLog(models.Model):
     def __str__(self):
         return f'{self.device.make_model} - {self.engineer.user.name}'
 
+    class Meta:
+        indexes = [models.Index(fields=['device', 'service_date', 'id'], name='servicelog_device_date_idx')]
+
 class Specification(models.Model):
     device = models.ForeignKey(Device, on_delete=models.CASCADE, related_name='specification')
     power_supply = models.CharField(max_length=50, null=True, blank=True)
@@ -84,6 +109,9 @@ class Documentation(models.Model):
     types = models.CharField(max_length=50, null=True, blank=True)
     last_updated = models.DateField(auto_now_add=True)
     storage_location = models.CharField(max_length=255, blank=True, null=True) 
+
+    class Meta:
+        indexes = [models.Index(fields=['device', 'last_updated', 'id'], name='documentation_device_date_idx')]
     
 class Calibration(models.Model):
     device = models.ForeignKey(Device, on_delete=models.CASCADE, related_name='calibrations')
@@ -96,6 +124,9 @@ class Calibration(models.Model):
     document = models.FileField(upload_to='service_logs/%Y/%m/%d/', null=True, blank=True)
     def __str__(self):
         return f"Calibration on {self.device} - {self.calibration_date}"
+
+    class Meta:
+        indexes = [models.Index(fields=['device', 'calibration_date', 'id'], name='calibration_device_date_idx')]
     
     
 class IncidentReport(models.Model):
@@ -120,17 +151,35 @@ class IncidentReport(models.Model):
 
     def __str__(self):
         return f"{self.incident_type} on {self.device} - {self.incident_date}"
+
+    class Meta:
+        indexes = [models.Index(fields=['device', 'incident_date', 'id'], name='incident_device_date_idx')]
     
-@receiver(post_save, sender=Calibration)
-def update_device_next_calibration(sender, instance, created, **kwargs):
-    if created and instance.next_calibration:
-        device = instance.device
-        device.next_calibration = instance.next_calibration
-        device.save(update_fields=['next_calibration'])
+def without_bookings(calibrations):
+    """``calibrations`` minus bookings (scheduled and dated in the future), which don't move due dates."""
+    return calibrations.exclude(status='scheduled', calibration_date__gt=timezone.now())
+
 
-@receiver(post_save, sender=Device)
-def create_or_update_qr_code(sender, instance, created, **kwargs):
-    """Generate QR code when device is created or updated."""
-    if created or not instance.qr_code:  # Generate on creation or if qr_code is empty
-        instance.generate_qr_code()
-        instance.save(update_fields=['qr_code'])
\ No newline at end of file
+@receiver(post_save, sender=Calibration)
+@receiver(post_delete, sender=Calibration)
+def update_device_next_calibration(sender, instance, **kwargs):
+    """
+    Keep Device.next_calibration equal to the next_calibration of the latest
+    calibration that sets one, on every save and delete. Bookings are left
+    out. A device without such a calibration keeps the date it was given
+    directly.
+    """
+    dated = without_bookings(Calibration.objects.filter(device=OuterRef('pk'), next_calibration__isnull=False))
+    device = Device.objects.filter(pk=instance.device_id).annotate(
+        is_dated=Exists(dated),
+        latest=Subquery(dated.order_by('-calibration_date', '-id').values('next_calibration')[:1]),
+    ).first()
+    if device is None or not device.is_dated or device.latest == device.next_calibration:
+        return
+    logger.debug("device next_calibration moved device_id=%s from=%s to=%s",
+                 device.id, device.next_calibration, device.latest)
+    device.next_calibration = device.latest
+    device.save(update_fields=['next_calibration'])
+    if Calibration.device.is_cached(instance):
+        # Later receivers read the device through the calibration
+        instance.device.next_calibration = device.latest
@@ -0,0 +1,84 @@
+import threading
+import time
+from collections import OrderedDict
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import Device
+
+CACHE_SIZE = 10000
+# Saves in other processes can't reach this cache, and queryset updates skip
+# signals, so entries also expire on their own
+CACHE_TTL = 300
+
+
+class TagCache:
+    """Thread-safe LRU of (hospital_id, nfc_uuid) -> device id with per-entry expiry."""
+
+    def __init__(self, maxsize=CACHE_SIZE, ttl=CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._keys_by_device = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            device_id, expires = entry
+            if expires < time.monotonic():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return device_id
+
+    def set(self, key, device_id):
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = (device_id, time.monotonic() + self.ttl)
+            self._keys_by_device[device_id] = key
+            while len(self._entries) > self.maxsize:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self, device_id, key=None):
+        with self._lock:
+            if device_id in self._keys_by_device:
+                self._drop(self._keys_by_device[device_id])
+            if key is not None:
+                self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_device.clear()
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None and self._keys_by_device.get(entry[0]) == key:
+            del self._keys_by_device[entry[0]]
+
+
+tag_cache = TagCache()
+
+
+def resolve_tags(hospital_id, tags):
+    """Map each scanned tag to its device id (None if unknown): cache first, then one query for the rest."""
+    resolved, missing = {}, []
+    for tag in tags:
+        device_id = tag_cache.get((hospital_id, tag))
+        if device_id is None:
+            missing.append(tag)
+        resolved[tag] = device_id
+    if missing:
+        rows = Device.objects.filter(hospital_id=hospital_id, nfc_uuid__in=missing).values_list('nfc_uuid', 'id')
+        for tag, device_id in rows:
+            tag_cache.set((hospital_id, tag), device_id)
+            resolved[tag] = device_id
+    return resolved
+
+
+@receiver(post_save, sender=Device)
+@receiver(post_delete, sender=Device)
+def invalidate_tag(sender, instance, **kwargs):
+    tag_cache.invalidate(instance.pk, (instance.hospital_id, instance.nfc_uuid) if instance.nfc_uuid else None)
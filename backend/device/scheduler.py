@@ -0,0 +1,179 @@
+"""
+Preventive maintenance scheduling.
+
+For each hospital, devices due for calibration within the horizon are found
+with a range scan of the (hospital, next_calibration, id) index. A device that
+has no calibration dated on or after its due date gets a scheduled
+Calibration and, optionally, a calibration Ticket. Those rows are what make a
+rerun a no-op. Work goes to the hospital's active engineers, least loaded
+first, where load is their open scheduled calibrations plus open tickets.
+Each hospital is scheduled in one transaction that holds the hospital row
+locked, so overlapping runs don't double-book. The rows are bulk created, so
+their activity events and the dashboard invalidation are written here rather
+than by the save receivers.
+"""
+import heapq
+import logging
+import threading
+from datetime import datetime, time, timedelta
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count, Exists, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from dashboard.activity import activity_event
+from dashboard.cache import invalidate_dashboard
+from dashboard.models import ActivityEvent
+from employees.models import Employee
+from hospitals.models import Hospital
+from tickets.models import Ticket
+from .models import Device, Calibration
+
+logger = logging.getLogger(__name__)
+
+HORIZON_DAYS = 14
+INTERVAL = 3600  # seconds between passes of the in-process runner
+OPEN_TICKET_STATUSES = ('open', 'in_progress', 'pending')
+
+
+def _count(queryset, field):
+    counted = queryset.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(n=Count('pk')).values('n')
+    return Coalesce(Subquery(counted, output_field=IntegerField()), Value(0))
+
+
+def engineer_loads(hospital_id, today):
+    """[(open work, employee id)] for the hospital's active engineers."""
+    upcoming = Calibration.objects.filter(status='scheduled', calibration_date__date__gte=today)
+    engineers = Employee.objects.filter(hospital_id=hospital_id, role='engineer', status='active').annotate(
+        calibrations=_count(upcoming, 'engineer'),
+        tickets=_count(Ticket.objects.filter(status__in=OPEN_TICKET_STATUSES), 'assigned_to'),
+    )
+    return [(row['calibrations'] + row['tickets'], row['id'])
+            for row in engineers.values('id', 'calibrations', 'tickets')]
+
+
+def due_devices(hospital_id, cutoff):
+    """Devices of one hospital due by cutoff and not yet covered by a calibration, soonest first."""
+    covered = Calibration.objects.filter(device=OuterRef('pk'), calibration_date__date__gte=OuterRef('next_calibration'))
+    return (
+        Device.objects.filter(hospital_id=hospital_id, next_calibration__lte=cutoff)
+        .exclude(Exists(covered))
+        .only('id', 'hospital_id', 'make_model', 'serial_number', 'department', 'Room', 'next_calibration')
+        .order_by('next_calibration', 'id')
+    )
+
+
+def schedule_hospital(hospital_id, today, cutoff, tickets=False):
+    """Schedule one hospital's due devices; returns (calibrations, tickets) created."""
+    with transaction.atomic():
+        list(Hospital.objects.select_for_update().filter(pk=hospital_id).values_list('pk'))
+        devices = list(due_devices(hospital_id, cutoff))
+        if not devices:
+            return 0, 0
+        loads = engineer_loads(hospital_id, today)
+        heapq.heapify(loads)
+
+        calibrations, work_orders = [], []
+        next_number = Ticket.next_number(hospital_id) if tickets else None
+        for device in devices:
+            engineer_id = None
+            if loads:
+                load, engineer_id = heapq.heappop(loads)
+                heapq.heappush(loads, (load + 1, engineer_id))
+            day = max(device.next_calibration, today)
+            calibrations.append(Calibration(
+                device=device,
+                engineer_id=engineer_id,
+                calibration_date=timezone.make_aware(datetime.combine(day, time.min)),
+                # A booking sets no due date; the calibration recorded when it is done moves it on
+                next_calibration=None,
+                status='scheduled',
+                notes='Scheduled preventive maintenance',
+            ))
+            if tickets:
+                work_orders.append(Ticket(
+                    hospital_id=hospital_id,
+                    ticket_id=f"TIC-{next_number:04d}",
+                    title=f"Calibration due {device.next_calibration}: {device.make_model} ({device.serial_number})"[:200],
+                    device=device,
+                    category='calibration',
+                    priority='high' if device.next_calibration < today else 'medium',
+                    location=(device.Room or device.department or '')[:100],
+                    assigned_to_id=engineer_id,
+                    description='Opened by the preventive maintenance scheduler.',
+                ))
+                next_number += 1
+        # bulk_create skips update_device_next_calibration, which has nothing to move here
+        Calibration.objects.bulk_create(calibrations)
+        Ticket.objects.bulk_create(work_orders)
+        # ... and the dashboard receivers, which do: the activity feed and the cache
+        engineers = Employee.objects.select_related('user').in_bulk(
+            {calibration.engineer_id for calibration in calibrations} - {None})
+        events = [
+            activity_event(hospital_id, 'calibration', 'recorded a calibration on', calibration.device.make_model,
+                           actor=engineers.get(calibration.engineer_id), target=calibration)
+            for calibration in calibrations
+        ] + [
+            activity_event(hospital_id, 'ticket_created', 'opened ticket', f"{ticket.ticket_id}: {ticket.title}",
+                           target=ticket)
+            for ticket in work_orders
+        ]
+        ActivityEvent.objects.bulk_create(events)
+        invalidate_dashboard(hospital_id)
+    return len(calibrations), len(work_orders)
+
+
+def schedule_due_calibrations(today=None, horizon=None, tickets=None, hospital_ids=None):
+    """Schedule every hospital (or those in hospital_ids); returns totals for reporting."""
+    today = today or timezone.localdate()
+    horizon = getattr(settings, 'PM_HORIZON_DAYS', HORIZON_DAYS) if horizon is None else horizon
+    tickets = getattr(settings, 'PM_CREATE_TICKETS', False) if tickets is None else tickets
+    cutoff = today + timedelta(days=horizon)
+
+    hospitals = Hospital.objects.order_by('id').values_list('id', flat=True)
+    if hospital_ids is not None:
+        hospitals = hospitals.filter(id__in=hospital_ids)
+    totals = {'hospitals': 0, 'calibrations': 0, 'tickets': 0}
+    for hospital_id in hospitals:
+        calibrations, work_orders = schedule_hospital(hospital_id, today, cutoff, tickets=tickets)
+        if calibrations:
+            totals['hospitals'] += 1
+            totals['calibrations'] += calibrations
+            totals['tickets'] += work_orders
+            logger.info("Scheduled %d calibrations and %d tickets for hospital %s",
+                        calibrations, work_orders, hospital_id)
+    return totals
+
+
+class SchedulerThread(threading.Thread):
+    """In-process runner: one scheduling pass every PM_SCHEDULER_INTERVAL seconds."""
+
+    def __init__(self, interval):
+        super().__init__(name='pm-scheduler', daemon=True)
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                schedule_due_calibrations()
+            except Exception:
+                logger.exception("Preventive maintenance pass failed")
+            finally:
+                close_old_connections()
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def start_runner():
+    """Start the in-process runner once per process when PM_SCHEDULER is 'thread'."""
+    global _runner
+    if getattr(settings, 'PM_SCHEDULER', None) != 'thread':
+        return None
+    with _runner_lock:
+        if _runner is None or not _runner.is_alive():
+            _runner = SchedulerThread(getattr(settings, 'PM_SCHEDULER_INTERVAL', INTERVAL))
+            _runner.start()
+    return _runner
@@ -1,8 +1,12 @@
+import logging
 from rest_framework import serializers
-from .models import Device, ServiceLog, Specification, Documentation, Calibration, IncidentReport
+from .models import Device, ServiceLog, Specification, Documentation, Calibration, IncidentReport, without_bookings
 from employees.serializers import EmployeeSerializer
 from employees.models import Employee
 from django.utils import timezone
+from qrcodes.views import qr_url
+
+logger = logging.getLogger(__name__)
 
 class ServiceLogSerializer(serializers.ModelSerializer):
     engineer = EmployeeSerializer(read_only=True)
@@ -48,25 +52,51 @@ class IncidentReportSerializer(serializers.ModelSerializer):
         model = IncidentReport
         fields = ['id', 'incident_type', 'incident_date', 'description', 'reported_by', 'reported_by_id', 'related_employee', 'related_employee_id']
 
-        
+
+def requested_names(request, param):
+    """Comma-separated query parameter as a set of names, e.g. ?expand=calibrations,service_logs"""
+    if request is None:
+        return set()
+    value = request.query_params.get(param, '')
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+class ExpandableFieldsMixin:
+    """
+    Lets list endpoints trim and grow their payload per request: ``?fields=``
+    keeps only the named fields and ``?expand=`` adds the nested relations
+    listed in ``expandable_fields``. Views should prefetch exactly what is
+    expanded.
+    """
+    expandable_fields = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        expanded = requested_names(request, 'expand') & set(self.expandable_fields)
+        for name in expanded:
+            fields[name] = self.expandable_fields[name](many=True, read_only=True)
+        only = requested_names(request, 'fields')
+        if only:
+            fields = {name: field for name, field in fields.items() if name in only or name in expanded}
+        return fields
+
+
 class DeviceSerializer(serializers.ModelSerializer):
     service_logs = ServiceLogSerializer(many=True, read_only=True)
     specification = SpecificationSerializer(many=True, read_only=True)
     documentation = DocumentationSerializer(many=True, read_only=True)
     calibrations = CalibrationSerializer(many=True, read_only=True)
     incident_reports = IncidentReportSerializer(many=True, read_only=True)
-    next_calibration = serializers.SerializerMethodField()  # Use method field instead of DateField
+    # Denormalized from the latest calibration by update_device_next_calibration
+    next_calibration = serializers.DateField(required=False, allow_null=True)
     qr_code = serializers.ImageField(read_only=True, allow_null=True)
+    qr_url = serializers.SerializerMethodField()
     nfc_uuid = serializers.CharField(required=False, allow_blank=True, allow_null=True)
-    
-    def get_next_calibration(self, obj):
-        latest_calibration = obj.calibrations.order_by('-calibration_date').first()
-        print(f"get_next_calibration for device {obj.id}:")
-        print(f"  Latest calibration: {latest_calibration}")
-        if latest_calibration:
-            print(f"  Calibration ID: {latest_calibration.id}, next_calibration: {latest_calibration.next_calibration}")
-        return latest_calibration.next_calibration if latest_calibration else None
 
+    def get_qr_url(self, obj):
+        return qr_url(obj, self.context.get('request'))
+    
     def validate_nfc_uuid(self, value):
         if value:
             # Check if NFC UUID is unique for this hospital
@@ -82,28 +112,24 @@ class DeviceSerializer(serializers.ModelSerializer):
         validated_data.pop('asset_number', None)
         validated_data.pop('serial_number', None)
 
-        print(f"Updating device {instance.id}, next_calibration from PATCH: {next_calibration}")
-
         # Update the Device instance with remaining fields
         instance = super().update(instance, validated_data)
 
-        # Handle next_calibration
+        # The date lives on the latest calibration; its post_save receiver copies it to the device
         if next_calibration is not None:
-            latest_calibration = instance.calibrations.order_by('-calibration_date').first()
+            latest_calibration = without_bookings(instance.calibrations.all()).order_by('-calibration_date', '-id').first()
             if latest_calibration:
-                print(f"Updating calibration {latest_calibration.id} with next_calibration: {next_calibration}")
                 latest_calibration.next_calibration = next_calibration
-                latest_calibration.save()
+                latest_calibration.save(update_fields=['next_calibration'])
             else:
-                print(f"Creating new calibration for device {instance.id} with next_calibration: {next_calibration}")
-                new_calibration = Calibration.objects.create(
+                latest_calibration = Calibration.objects.create(
                     device=instance,
-                    calibration_date=timezone.now().date(),
+                    calibration_date=timezone.now(),
                     next_calibration=next_calibration
                 )
-                print(f"Created calibration: {new_calibration.id}")
-
-        print(f"Calibrations after update: {list(instance.calibrations.all())}")
+            instance.next_calibration = next_calibration
+            logger.debug("device next_calibration set device_id=%s calibration_id=%s next_calibration=%s",
+                         instance.id, latest_calibration.id, next_calibration)
         return instance
 
     class Meta:
@@ -113,6 +139,33 @@ class DeviceSerializer(serializers.ModelSerializer):
             'date_of_installation', 'warranty_until', 'asset_number', 'asset_details',
             'nfc_uuid', 'is_active', 'department', 'Room', 'next_calibration', 'service_logs',
             'specification', 'documentation', 'calibrations', 'incident_reports',
-            'qr_code'
+            'qr_code', 'qr_url', 'qr_status'
         ]
-        read_only_fields = ['hospital', 'id', 'qr_code']
\ No newline at end of file
+        read_only_fields = ['hospital', 'id', 'qr_code', 'qr_status']
+
+
+class DeviceListSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
+    """Compact device row for list views; nested relations only on ?expand=."""
+    next_calibration = serializers.DateField(read_only=True)
+    qr_code = serializers.ImageField(read_only=True, allow_null=True)
+    qr_url = serializers.SerializerMethodField()
+
+    expandable_fields = {
+        'service_logs': ServiceLogSerializer,
+        'specification': SpecificationSerializer,
+        'documentation': DocumentationSerializer,
+        'calibrations': CalibrationSerializer,
+        'incident_reports': IncidentReportSerializer,
+    }
+
+    class Meta:
+        model = Device
+        fields = [
+            'id', 'hospital', 'name', 'make_model', 'manufacture', 'serial_number', 'asset_number',
+            'asset_details', 'nfc_uuid', 'is_active', 'department', 'Room', 'next_calibration', 'qr_code',
+            'qr_url', 'qr_status'
+        ]
+        read_only_fields = fields
+
+    def get_qr_url(self, obj):
+        return qr_url(obj, self.context.get('request'))
@@ -1,3 +1,474 @@
-from django.test import TestCase
+import base64
+import json
+import tempfile
+from importlib import import_module
+from io import StringIO
+from datetime import timedelta
+from unittest.mock import patch
+from django.apps import apps
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from hospitals.testing import create_engineer, create_hospital, create_user
+from employees.models import Employee
+from .models import Device, ServiceLog, Calibration, Documentation, IncidentReport
+from .nfc import tag_cache
+from qrcodes.models import QRJob
+from dashboard.alerts import DEVICE
+from dashboard.models import ActivityEvent, Alert
+from tickets.models import Ticket
+from .scheduler import schedule_due_calibrations
 
-# Create your tests here.
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class DeviceListViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(first_name='Ada', last_name='Admin')
+        cls.hospital = create_hospital(cls.user)
+        cls.engineer = create_engineer(cls.user, cls.hospital)
+        today = timezone.now().date()
+        for i in range(5):
+            device = Device.objects.create(
+                hospital=cls.hospital, make_model=f'Model {i}', serial_number=f'SN-{i}', asset_number=f'A-{i}',
+            )
+            ServiceLog.objects.create(device=device, engineer=cls.engineer)
+            Calibration.objects.create(
+                device=device, engineer=cls.engineer, calibration_date=timezone.now() - timedelta(days=30),
+                next_calibration=today,
+            )
+            Calibration.objects.create(
+                device=device, engineer=cls.engineer, calibration_date=timezone.now(),
+                next_calibration=today + timedelta(days=i + 1),
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('device-list', kwargs={'hospital_id': self.hospital.id})
+
+    def test_compact_rows(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        row = next(row for row in response.data['results'] if row['serial_number'] == 'SN-2')
+        self.assertNotIn('calibrations', row)
+        self.assertEqual(row['next_calibration'], (timezone.now().date() + timedelta(days=3)).isoformat())
+
+    def test_expand_prefetches_relations(self):
+        # devices + service logs + calibrations, each with engineer and user joined
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, {'expand': 'service_logs,calibrations'})
+        row = response.data['results'][0]
+        self.assertEqual(len(row['calibrations']), 2)
+        self.assertEqual(row['service_logs'][0]['engineer']['name'], 'Ada Admin')
+
+    def test_fields(self):
+        response = self.client.get(self.url, {'fields': 'id,serial_number', 'expand': 'calibrations'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'serial_number', 'calibrations'})
+
+    def walk(self, params):
+        seen, response = [], self.client.get(self.url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            seen += [row['serial_number'] for row in response.data['results']]
+            if not response.data['next']:
+                return seen
+            response = self.client.get(response.data['next'])
+
+    def test_keyset_pages(self):
+        self.assertEqual(self.walk({'limit': 2}), [f'SN-{i}' for i in range(5)])
+
+    def test_calibration_keyset_puts_undated_last(self):
+        Device.objects.filter(serial_number='SN-4').update(next_calibration=None)
+        Device.objects.filter(serial_number='SN-0').update(next_calibration=timezone.now().date() + timedelta(days=9))
+        self.assertEqual(
+            self.walk({'limit': 2, 'ordering': 'next_calibration'}),
+            ['SN-1', 'SN-2', 'SN-3', 'SN-0', 'SN-4'],
+        )
+
+    def test_filters(self):
+        Device.objects.filter(serial_number='SN-1').update(department='Radiology', is_active='Under_Maintenance')
+        response = self.client.get(self.url, {'department': 'Radiology', 'is_active': 'Under_Maintenance'})
+        self.assertEqual([row['serial_number'] for row in response.data['results']], ['SN-1'])
+        response = self.client.get(self.url, {'calibration_due_within': 2})
+        self.assertEqual([row['serial_number'] for row in response.data['results']], ['SN-0', 'SN-1'])
+
+    def test_invalid_limit(self):
+        for value in ('bogus', '0', '-5', ''):
+            response = self.client.get(self.url, {'limit': value})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('limit', response.data)
+
+    def test_calibration_due_within_out_of_range(self):
+        for value in ('99999999', '-99999999', '1e30', '-1'):
+            response = self.client.get(self.url, {'calibration_due_within': value})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('calibration_due_within', response.data)
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get(self.url, {'cursor': 'bogus'}).status_code, 404)
+        for due in ('not-a-date', 20250101, ['2025-01-01']):
+            cursor = base64.urlsafe_b64encode(json.dumps({'id': 1, 'due': due}).encode('ascii')).decode('ascii')
+            response = self.client.get(self.url, {'ordering': 'next_calibration', 'cursor': cursor})
+            self.assertEqual(response.status_code, 404)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class DeviceNextCalibrationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(is_staff=True)
+        cls.hospital = create_hospital(cls.user)
+        cls.today = timezone.localdate()
+
+    def due(self, device):
+        device.refresh_from_db(fields=['next_calibration'])
+        return device.next_calibration
+
+    def test_follows_latest_dated_calibration(self):
+        device = Device.objects.create(
+            hospital=self.hospital, make_model='Pump', serial_number='SN-1', asset_number='A-1',
+            next_calibration=self.today,
+        )
+        old = Calibration.objects.create(
+            device=device, calibration_date=timezone.now() - timedelta(days=30), next_calibration=self.today + timedelta(days=1),
+        )
+        latest = Calibration.objects.create(
+            device=device, calibration_date=timezone.now(), next_calibration=self.today + timedelta(days=2),
+        )
+        # Backdated entries don't win over the latest calibration
+        Calibration.objects.create(
+            device=device, calibration_date=timezone.now() - timedelta(days=60), next_calibration=self.today,
+        )
+        self.assertEqual(self.due(device), self.today + timedelta(days=2))
+
+        latest.next_calibration = self.today + timedelta(days=3)
+        latest.save()
+        self.assertEqual(self.due(device), self.today + timedelta(days=3))
+        Calibration.objects.create(device=device, calibration_date=timezone.now() + timedelta(days=1))
+        self.assertEqual(self.due(device), self.today + timedelta(days=3))
+        latest.delete()
+        self.assertEqual(self.due(device), old.next_calibration)
+
+    def test_bookings_do_not_hold_back_the_due_date(self):
+        device = Device.objects.create(
+            hospital=self.hospital, make_model='Pump', serial_number='SN-1', asset_number='A-1',
+            next_calibration=self.today + timedelta(days=3),
+        )
+        due_alerts = Alert.objects.filter(target_type=DEVICE, target_id=device.id, type=Alert.CALIBRATION_DUE, is_open=True)
+        self.assertTrue(due_alerts.exists())
+        booking = Calibration.objects.create(
+            device=device, calibration_date=timezone.now() + timedelta(days=3), status='scheduled',
+            next_calibration=device.next_calibration,
+        )
+        done = Calibration.objects.create(
+            device=device, calibration_date=timezone.now(), status='completed',
+            next_calibration=self.today + timedelta(days=365),
+        )
+        self.assertEqual(self.due(device), self.today + timedelta(days=365))
+        self.assertFalse(due_alerts.exists())
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = reverse('device-detail', kwargs={'hospital_id': self.hospital.id, 'pk': device.id})
+        client.patch(url, {'next_calibration': (self.today + timedelta(days=180)).isoformat()}, format='json')
+        done.refresh_from_db()
+        booking.refresh_from_db()
+        self.assertEqual(done.next_calibration, self.today + timedelta(days=180))
+        self.assertEqual(booking.next_calibration, self.today + timedelta(days=3))
+        self.assertEqual(self.due(device), self.today + timedelta(days=180))
+
+    def test_backfill_skips_bookings(self):
+        backfill = import_module('device.migrations.0007_backfill_next_calibration').copy_latest_next_calibration
+        device = Device.objects.create(hospital=self.hospital, make_model='Pump', serial_number='SN-1', asset_number='A-1')
+        Calibration.objects.create(device=device, calibration_date=timezone.now(), status='completed',
+                                   next_calibration=self.today + timedelta(days=365))
+        Calibration.objects.create(device=device, calibration_date=timezone.now() + timedelta(days=3),
+                                   status='scheduled', next_calibration=self.today + timedelta(days=3))
+        Device.objects.filter(pk=device.pk).update(next_calibration=self.today)
+        backfill(apps, None)
+        self.assertEqual(self.due(device), self.today + timedelta(days=365))
+
+    def test_patch_moves_date_without_printing(self):
+        device = Device.objects.create(hospital=self.hospital, make_model='Pump', serial_number='SN-1', asset_number='A-1')
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = reverse('device-detail', kwargs={'hospital_id': self.hospital.id, 'pk': device.id})
+        due = self.today + timedelta(days=7)
+        with patch('builtins.print') as printed:
+            response = client.patch(url, {'next_calibration': due.isoformat()}, format='json')
+            self.assertEqual(response.data['next_calibration'], due.isoformat())
+            self.assertEqual(client.get(url).data['next_calibration'], due.isoformat())
+        printed.assert_not_called()
+        self.assertEqual(self.due(device), due)
+        self.assertEqual(device.calibrations.get().next_calibration, due)
+
+
+class DeviceTagResolutionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        cls.hospital = create_hospital(cls.user)
+        cls.devices = [
+            Device.objects.create(
+                hospital=cls.hospital, make_model='Pump', serial_number=f'SN-{i}', asset_number=f'A-{i}', nfc_uuid=f'tag-{i}',
+            )
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        tag_cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def url(self, tag):
+        return reverse('device-by-nfc', kwargs={'hospital_id': self.hospital.id, 'nfc_uuid': tag})
+
+    def test_resolves_from_cache_after_first_tap(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url('tag-1'))
+        self.assertEqual(response.data, {'id': self.devices[1].id, 'nfc_uuid': 'tag-1'})
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url('tag-1')).data['id'], self.devices[1].id)
+        self.assertEqual(self.client.get(self.url('missing')).status_code, 404)
+
+    def test_save_invalidates_moved_tag(self):
+        self.client.get(self.url('tag-0'))
+        first, second = self.devices[0], self.devices[2]
+        first.nfc_uuid = None
+        first.save()
+        second.nfc_uuid = 'tag-0'
+        second.save()
+        self.assertEqual(self.client.get(self.url('tag-0')).data['id'], second.id)
+
+    def test_batch(self):
+        self.client.get(self.url('tag-0'))
+        url = reverse('device-nfc-resolve', kwargs={'hospital_id': self.hospital.id})
+        # One query for the tags the cache doesn't know
+        with self.assertNumQueries(1):
+            response = self.client.post(url, {'tags': ['tag-0', 'tag-2', 'nope', 'tag-2']}, format='json')
+        self.assertEqual(response.data['devices'], {'tag-0': self.devices[0].id, 'tag-2': self.devices[2].id})
+        self.assertEqual(response.data['unknown'], ['nope'])
+        self.assertEqual(self.client.post(url, {'tags': 'tag-0'}, format='json').status_code, 400)
+
+
+class DeviceTimelineTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(first_name='Ada', last_name='Admin')
+        cls.hospital = create_hospital(cls.user)
+        cls.engineer = create_engineer(cls.user, cls.hospital)
+        cls.device = Device.objects.create(hospital=cls.hospital, make_model='Pump', serial_number='SN-1', asset_number='A-1')
+        other = Device.objects.create(hospital=cls.hospital, make_model='Pump', serial_number='SN-2', asset_number='A-2')
+        ServiceLog.objects.create(device=other, engineer=cls.engineer)
+
+        now = timezone.now().replace(hour=12, minute=0, second=0, microsecond=0)
+        for days in (1, 3, 3):
+            log = ServiceLog.objects.create(device=cls.device, engineer=cls.engineer, service_type='Repair')
+            ServiceLog.objects.filter(pk=log.pk).update(service_date=(now - timedelta(days=days)).date())
+            doc = Documentation.objects.create(device=cls.device, document='Manual')
+            Documentation.objects.filter(pk=doc.pk).update(last_updated=(now - timedelta(days=days)).date())
+        for days in (0, 2, 3):
+            Calibration.objects.create(device=cls.device, engineer=cls.engineer, calibration_date=now - timedelta(days=days))
+            incident = IncidentReport.objects.create(
+                device=cls.device, incident_type='user_fault', description='Dropped', reported_by=cls.engineer,
+            )
+            IncidentReport.objects.filter(pk=incident.pk).update(incident_date=now - timedelta(days=days))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('device-timeline', kwargs={'hospital_id': self.hospital.id, 'device_id': self.device.id})
+
+    def walk(self, params):
+        seen, response = [], self.client.get(self.url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            seen += [(row['type'], row['id'], row['date']) for row in response.data['results']]
+            if not response.data['next']:
+                return seen
+            response = self.client.get(response.data['next'])
+
+    def test_single_page_is_merged_newest_first(self):
+        # device lookup + one query per source
+        with self.assertNumQueries(5):
+            response = self.client.get(self.url)
+        events = response.data['results']
+        self.assertEqual(len(events), 12)
+        self.assertIsNone(response.data['next'])
+        dates = [event['date'] for event in events]
+        self.assertEqual(dates, sorted(dates, reverse=True))
+        self.assertEqual(events[0]['type'], 'incident')
+        self.assertEqual(events[0]['engineer'], 'Ada Admin')
+
+    def test_pages_cover_every_event_once(self):
+        everything = self.walk({})
+        for limit in (1, 2, 5):
+            self.assertEqual(self.walk({'limit': limit}), everything)
+
+    def test_types_filter(self):
+        kinds = {kind for kind, _, _ in self.walk({'types': 'service_log,documentation', 'limit': 2})}
+        self.assertEqual(kinds, {'service_log', 'documentation'})
+        self.assertEqual(self.client.get(self.url, {'types': 'bogus'}).status_code, 400)
+
+    def test_invalid_cursor_and_other_hospital(self):
+        self.assertEqual(self.client.get(self.url, {'cursor': 'bogus'}).status_code, 404)
+        url = reverse('device-timeline', kwargs={'hospital_id': self.hospital.id + 1, 'device_id': self.device.id})
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), QR_WORKER='command')
+class DeviceImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(is_staff=True)
+        cls.hospital = create_hospital(cls.user)
+        other = create_hospital(cls.user, name='Other', address='2 Main St')
+        cls.existing = Device.objects.create(
+            hospital=cls.hospital, make_model='Pump', serial_number='SN-OLD', asset_number='A-OLD', nfc_uuid='tag-old',
+        )
+        Device.objects.create(hospital=other, make_model='Pump', serial_number='SN-ELSEWHERE', asset_number='A-X')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('device-import', kwargs={'hospital_id': self.hospital.id})
+
+    def test_csv_creates_and_updates(self):
+        body = (
+            'serial_number,make_model,asset_number,department,nfc_uuid\n'
+            'SN-1,Monitor,A-1,ICU,tag-1\n'
+            'SN-OLD,Pump v2,A-CHANGED,Ward 3,\n'
+            'SN-2,,A-2,ICU,\n'
+            'SN-1,Monitor,A-1,ICU,\n'
+            'SN-3,Monitor,A-3,ICU,tag-old\n'
+            'SN-ELSEWHERE,Pump,A-X,,\n'
+        )
+        response = self.client.post(self.url, body.encode(), content_type='text/csv')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['updated'], response.data['failed']), (1, 1, 4))
+        self.assertEqual(
+            {error['row']: set(error['errors']) for error in response.data['errors']},
+            {3: {'make_model'}, 4: {'serial_number'}, 5: {'nfc_uuid'}, 6: {'serial_number'}},
+        )
+        created = Device.objects.get(serial_number='SN-1')
+        self.assertEqual((created.department, created.nfc_uuid, created.qr_status), ('ICU', 'tag-1', 'ready'))
+        self.existing.refresh_from_db()
+        self.assertEqual((self.existing.make_model, self.existing.asset_number), ('Pump v2', 'A-OLD'))
+        self.assertEqual(self.existing.department, 'Ward 3')
+
+    def test_json_array_is_written_in_chunks(self):
+        rows = [{'serial_number': f'SN-{i}', 'make_model': 'Monitor', 'asset_number': f'A-{i}'} for i in range(7)]
+        with self.settings(QR_STORE_IMAGES=True), patch('device.bulk.CHUNK_SIZE', 3):
+            response = self.client.post(self.url, json.dumps(rows).encode(), content_type='application/json')
+        self.assertEqual(response.data['created'], 7)
+        self.assertEqual(response.data['qr_queued'], 7)
+        self.assertEqual(QRJob.objects.count(), 7)
+        self.assertFalse(Device.objects.filter(serial_number__in=[row['serial_number'] for row in rows], qr_status='ready').exists())
+
+    def test_import_refreshes_dashboard(self):
+        cache.clear()
+        stats_url = reverse('dashboard-stats', kwargs={'hospital_id': self.hospital.id})
+        before = self.client.get(stats_url)
+        self.assertEqual(before.data['metrics']['devices_under_maintenance'], 0)
+        rows = [{'serial_number': f'SN-{i}', 'make_model': 'Monitor', 'asset_number': f'A-{i}',
+                 'is_active': 'Under_Maintenance'} for i in range(2)]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(self.url, json.dumps(rows).encode(), content_type='application/json')
+        after = self.client.get(stats_url)
+        self.assertEqual(after.data['metrics']['devices_under_maintenance'], 2)
+        self.assertNotEqual(after['ETag'], before['ETag'])
+
+    def test_ndjson_and_multipart(self):
+        body = b'{"serial_number": "SN-9", "make_model": "Monitor", "asset_number": "A-9"}\n\n[1]\n'
+        response = self.client.post(self.url, body, content_type='application/x-ndjson')
+        self.assertEqual((response.data['created'], response.data['failed']), (1, 1))
+        upload = SimpleUploadedFile('devices.csv', b'serial_number,make_model,asset_number\nSN-10,Monitor,A-10\n')
+        response = self.client.post(self.url, {'file': upload}, format='multipart')
+        self.assertEqual(response.data['created'], 1)
+
+    def test_malformed_stream_keeps_earlier_rows(self):
+        body = b'[{"serial_number": "SN-1", "make_model": "Monitor", "asset_number": "A-1"}, {"serial_'
+        response = self.client.post(self.url, body, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['created'], 1)
+        self.assertIn('error', response.data)
+        self.assertEqual(self.client.post(self.url, b'x', content_type='text/plain').status_code, 400)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class CalibrationSchedulerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        admin = create_user()
+        cls.hospital = create_hospital(admin)
+        cls.busy, cls.free = [
+            create_engineer(create_user(f'eng{i}@example.com'), cls.hospital, employee_id=f'E{i}') for i in range(2)
+        ]
+        Employee.objects.create(
+            user=create_user('nurse@example.com'),
+            hospital=cls.hospital, role='nurse', employee_id='N1',
+        )
+        Ticket.objects.create(hospital=cls.hospital, title='Broken', location='ICU', assigned_to=cls.busy)
+
+        cls.today = timezone.localdate()
+        def device(serial, due):
+            return Device.objects.create(
+                hospital=cls.hospital, make_model='Pump', serial_number=serial, asset_number=serial,
+                Room='ICU-1', next_calibration=due,
+            )
+        cls.overdue = device('SN-OVERDUE', cls.today - timedelta(days=2))
+        cls.soon = device('SN-SOON', cls.today + timedelta(days=3))
+        device('SN-LATER', cls.today + timedelta(days=60))
+        device('SN-UNDATED', None)
+        covered = device('SN-COVERED', cls.today + timedelta(days=5))
+        Calibration.objects.create(device=covered, calibration_date=timezone.now() + timedelta(days=6))
+
+    def test_books_due_devices_across_engineers(self):
+        totals = schedule_due_calibrations(today=self.today, horizon=14, tickets=True)
+        self.assertEqual(totals, {'hospitals': 1, 'calibrations': 2, 'tickets': 2})
+
+        booked = Calibration.objects.filter(notes='Scheduled preventive maintenance').order_by('calibration_date')
+        self.assertEqual([c.device_id for c in booked], [self.overdue.id, self.soon.id])
+        # The idle engineer takes the most urgent job, then the two are level
+        self.assertEqual([c.engineer_id for c in booked], [self.free.id, self.busy.id])
+        self.assertEqual(timezone.localtime(booked[0].calibration_date).date(), self.today)
+        self.assertEqual({c.next_calibration for c in booked}, {None})
+
+        tickets = Ticket.objects.filter(category='calibration').order_by('ticket_id')
+        self.assertEqual([t.ticket_id for t in tickets], ['TIC-1002', 'TIC-1003'])
+        # Tickets raised by hand continue the same numbering
+        raised = Ticket.objects.create(hospital=self.hospital, title='Noisy fan', location='ICU')
+        self.assertEqual(raised.ticket_id, 'TIC-1004')
+        self.assertEqual(tickets[0].priority, 'high')
+        self.assertEqual(tickets[0].location, 'ICU-1')
+
+    def test_bookings_reach_the_dashboard(self):
+        client = APIClient()
+        client.force_authenticate(self.hospital.admin)
+        url = reverse('dashboard-stats', kwargs={'hospital_id': self.hospital.id})
+        cache.clear()
+        before = client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            schedule_due_calibrations(today=self.today, horizon=14, tickets=True)
+        after = client.get(url)
+        self.assertNotEqual(after['ETag'], before['ETag'])
+        activity = ActivityEvent.objects.filter(hospital=self.hospital)
+        self.assertEqual(activity.filter(kind='ticket_created', item__contains='Calibration due').count(), 2)
+        self.assertEqual(activity.filter(kind='calibration', actor__in=[self.busy, self.free]).count(), 2)
+        self.assertEqual(after.data['recent_activity'][0]['action'], 'opened ticket')
+
+    def test_rerun_is_a_no_op(self):
+        schedule_due_calibrations(today=self.today, horizon=14)
+        self.assertEqual(schedule_due_calibrations(today=self.today, horizon=14)['calibrations'], 0)
+        self.assertFalse(Ticket.objects.filter(category='calibration').exists())
+
+    def test_command(self):
+        out = StringIO()
+        call_command('schedule_calibrations', '--horizon', '90', '--hospital', str(self.hospital.id), stdout=out)
+        self.assertIn('Scheduled 3 calibrations', out.getvalue())
@@ -0,0 +1,143 @@
+"""
+Per-device history as one stream, newest first.
+
+Each source is read newest-first through its (device, date, id) index, at
+most one page past the cursor, and the sources are merged lazily. Events are
+ordered by (timestamp, rank, id) descending, where rank breaks ties between
+sources that share a timestamp. Date-only sources count as midnight. The
+cursor is the last event's key, so deep pages cost the same as the first.
+"""
+import base64
+import heapq
+import json
+from datetime import datetime, time
+from itertools import islice
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+from .models import ServiceLog, Calibration, IncidentReport, Documentation
+
+
+def _as_datetime(value):
+    if isinstance(value, datetime):
+        return value if timezone.is_aware(value) else timezone.make_aware(value)
+    return timezone.make_aware(datetime.combine(value, time.min))
+
+
+def _engineer(row, prefix):
+    first, last = row[f'{prefix}__user__first_name'], row[f'{prefix}__user__last_name']
+    return f"{first or ''} {last or ''}".strip() or None
+
+
+class Source:
+    def __init__(self, kind, rank, model, date_field, fields, describe):
+        self.kind = kind
+        self.rank = rank
+        self.model = model
+        self.date_field = date_field
+        self.fields = fields
+        self.describe = describe
+        self.date_only = not isinstance(model._meta.get_field(date_field), models.DateTimeField)
+
+    def before(self, cursor):
+        """Rows strictly after the cursor in stream order (i.e. older)."""
+        moment, rank, last_id = cursor
+        if rank > self.rank:
+            tie = Q()
+        elif rank == self.rank:
+            tie = Q(id__lt=last_id)
+        else:
+            tie = None  # every row at the cursor's timestamp was already streamed
+
+        if self.date_only:
+            local = timezone.localtime(moment)
+            day = local.date()
+            if local != _as_datetime(day):
+                # The cursor is later on this date than our midnight timestamps
+                return Q(**{f'{self.date_field}__lte': day})
+            older = Q(**{f'{self.date_field}__lt': day})
+            at = Q(**{self.date_field: day})
+        else:
+            older = Q(**{f'{self.date_field}__lt': moment})
+            at = Q(**{self.date_field: moment})
+        return older | (at & tie) if tie is not None else older
+
+    def events(self, device_id, cursor, limit):
+        rows = self.model.objects.filter(device_id=device_id)
+        if cursor is not None:
+            rows = rows.filter(self.before(cursor))
+        rows = rows.order_by(f'-{self.date_field}', '-id').values('id', self.date_field, *self.fields)[:limit]
+        for row in rows:
+            moment = _as_datetime(row[self.date_field])
+            yield (moment, self.rank, row['id']), {
+                'type': self.kind,
+                'id': row['id'],
+                'date': moment,
+                **self.describe(row),
+            }
+
+
+SOURCES = {
+    'documentation': Source(
+        'documentation', 0, Documentation, 'last_updated', ('document', 'types', 'storage_location'),
+        lambda row: {
+            'title': row['document'] or 'Document',
+            'details': {'types': row['types'], 'storage_location': row['storage_location']},
+        },
+    ),
+    'service_log': Source(
+        'service_log', 1, ServiceLog, 'service_date',
+        ('service_type', 'status', 'service_details', 'engineer__user__first_name', 'engineer__user__last_name'),
+        lambda row: {
+            'title': row['service_type'] or 'Service',
+            'status': row['status'],
+            'engineer': _engineer(row, 'engineer'),
+            'details': {'service_details': row['service_details']},
+        },
+    ),
+    'calibration': Source(
+        'calibration', 2, Calibration, 'calibration_date',
+        ('status', 'result', 'notes', 'next_calibration', 'engineer__user__first_name', 'engineer__user__last_name'),
+        lambda row: {
+            'title': 'Calibration',
+            'status': row['status'],
+            'engineer': _engineer(row, 'engineer'),
+            'details': {'result': row['result'], 'notes': row['notes'], 'next_calibration': row['next_calibration']},
+        },
+    ),
+    'incident': Source(
+        'incident', 3, IncidentReport, 'incident_date',
+        ('incident_type', 'description', 'reported_by__user__first_name', 'reported_by__user__last_name'),
+        lambda row: {
+            'title': dict(IncidentReport.INCIDENT_TYPES).get(row['incident_type'], row['incident_type']),
+            'engineer': _engineer(row, 'reported_by'),
+            'details': {'description': row['description']},
+        },
+    ),
+}
+
+
+def device_timeline(device_id, limit, cursor=None, kinds=None):
+    """Return (events, next cursor or None) for one page of a device's history."""
+    sources = [source for kind, source in SOURCES.items() if kinds is None or kind in kinds]
+    streams = [source.events(device_id, cursor, limit + 1) for source in sources]
+    merged = list(islice(heapq.merge(*streams, key=lambda event: event[0], reverse=True), limit + 1))
+    page = merged[:limit]
+    next_cursor = page[-1][0] if len(merged) > limit else None
+    return [event for _, event in page], next_cursor
+
+
+def encode_cursor(cursor):
+    moment, rank, last_id = cursor
+    data = json.dumps({'at': moment.isoformat(), 'rank': rank, 'id': last_id})
+    return base64.urlsafe_b64encode(data.encode()).decode()
+
+
+def decode_cursor(encoded):
+    """Parse a cursor from encode_cursor(); raises ValueError if it is malformed."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+        moment = datetime.fromisoformat(data['at'])
+        return _as_datetime(moment), int(data['rank']), int(data['id'])
+    except (TypeError, KeyError, UnicodeError, json.JSONDecodeError) as exc:
+        raise ValueError('Invalid cursor') from exc
@@ -3,34 +3,176 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from hospitals.permissions import IsTechnicianOrAdmin
 from hospitals.models import Hospital
+from hospitals.params import positive_int
+import base64
+import json
+from datetime import date
+from django.db.models import F, Prefetch, Q
 from django.shortcuts import get_object_or_404
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.utils.urls import replace_query_param
 from .models import Device, ServiceLog, Specification, Documentation, IncidentReport, Calibration
 from .serializers import DeviceSerializer, CalibrationSerializer, ServiceLogSerializer, SpecificationSerializer, DocumentationSerializer, IncidentReportSerializer
+from .serializers import DeviceListSerializer, requested_names
+from .filters import DeviceFilter
+from .nfc import resolve_tags
+from .bulk import FORMATS as IMPORT_FORMATS, DeviceImport, read_rows
+from .timeline import SOURCES, decode_cursor, device_timeline, encode_cursor
 from rest_framework.views import APIView
 
+# What each ?expand= relation needs so its nested EmployeeSerializer rows don't query per row
+DEVICE_PREFETCHES = {
+    'service_logs': lambda: Prefetch('service_logs', queryset=ServiceLog.objects.select_related('engineer__user')),
+    'specification': lambda: Prefetch('specification'),
+    'documentation': lambda: Prefetch('documentation'),
+    'calibrations': lambda: Prefetch('calibrations', queryset=Calibration.objects.select_related('engineer__user')),
+    'incident_reports': lambda: Prefetch(
+        'incident_reports',
+        queryset=IncidentReport.objects.select_related('reported_by__user', 'related_employee__user'),
+    ),
+}
+
+
+class DeviceKeysetPagination(BasePagination):
+    """
+    Keyset pagination over (id), or (next_calibration, id) with undated
+    devices last when ?ordering=next_calibration. The cursor carries the last
+    row's key, so every page is one range scan of the matching Device index
+    however deep the client pages.
+    """
+    page_size = 50
+    page_size_query_param = 'limit'
+    max_page_size = 200
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.by_calibration = request.query_params.get('ordering') == 'next_calibration'
+        page_size = self.get_page_size(request)
+        if self.by_calibration:
+            queryset = queryset.order_by(F('next_calibration').asc(nulls_last=True), 'id')
+        else:
+            queryset = queryset.order_by('id')
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            queryset = queryset.filter(self.after(cursor))
+        rows = list(queryset[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        self.last = rows[-1] if rows else None
+        return rows
+
+    def get_page_size(self, request):
+        limit = request.query_params.get(self.page_size_query_param)
+        if limit is None:
+            return self.page_size
+        try:
+            return positive_int(limit, cutoff=self.max_page_size)
+        except ValueError:
+            raise ValidationError({self.page_size_query_param: "Expected a positive integer."})
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            cursor['id'] = int(cursor['id'])
+            if self.by_calibration != ('due' in cursor):
+                raise ValueError
+            if cursor.get('due') is not None:
+                cursor['due'] = date.fromisoformat(cursor['due'])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def encode_cursor(self, device):
+        cursor = {'id': device.id}
+        if self.by_calibration:
+            cursor['due'] = device.next_calibration.isoformat() if device.next_calibration else None
+        return base64.urlsafe_b64encode(json.dumps(cursor).encode('ascii')).decode('ascii')
+
+    def after(self, cursor):
+        if not self.by_calibration:
+            return Q(id__gt=cursor['id'])
+        if cursor['due'] is None:
+            return Q(next_calibration__isnull=True, id__gt=cursor['id'])
+        return Q(next_calibration__gt=cursor['due']) \
+            | Q(next_calibration=cursor['due'], id__gt=cursor['id']) \
+            | Q(next_calibration__isnull=True)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.last))
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+
 class DeviceByNFCView(APIView):
+    """Resolve one scanned NFC tag to its device id (hit on every tap from the mobile app)."""
     permission_classes = [IsAuthenticated]
     
     def get(self, request, hospital_id, nfc_uuid):
-        try:
-            device = Device.objects.get(hospital_id=hospital_id, nfc_uuid=nfc_uuid)
-            serializer = DeviceSerializer(device)
-            return Response({'id': device.id, 'device_id':device.device_id}, status=status.HTTP_200_OK)
-        except Device.DoesNotExist:
+        device_id = resolve_tags(hospital_id, [nfc_uuid])[nfc_uuid]
+        if device_id is None:
             return Response(
                 {'error': "Device not found for this NFC UUID."},
                 status=status.HTTP_404_NOT_FOUND
             )
+        return Response({'id': device_id, 'nfc_uuid': nfc_uuid}, status=status.HTTP_200_OK)
+
+
+class DeviceTagResolveView(APIView):
+    """
+    Batch form for inventory rounds: POST {"tags": [...]} and get back
+    {"devices": {tag: device id}, "unknown": [tags without a device]}.
+    """
+    permission_classes = [IsAuthenticated]
+    max_tags = 500
+
+    def post(self, request, hospital_id):
+        tags = request.data.get('tags')
+        if not isinstance(tags, list) or not all(isinstance(tag, str) for tag in tags):
+            return Response({'error': "tags must be a list of strings."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(tags) > self.max_tags:
+            return Response({'error': f"At most {self.max_tags} tags per request."}, status=status.HTTP_400_BAD_REQUEST)
+        resolved = resolve_tags(hospital_id, list(dict.fromkeys(tags)))
+        return Response({
+            'devices': {tag: device_id for tag, device_id in resolved.items() if device_id is not None},
+            'unknown': [tag for tag, device_id in resolved.items() if device_id is None],
+        }, status=status.HTTP_200_OK)
 
 class DeviceListView(generics.ListCreateAPIView):
-    serializer_class = DeviceSerializer
+    """
+    Lists devices as compact rows; ?expand=service_logs,calibrations,... adds
+    those nested relations and ?fields= trims the row. Creation still takes
+    and returns the full DeviceSerializer.
+    """
     permission_classes = [IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = DeviceFilter
+    pagination_class = DeviceKeysetPagination
+
+    def get_serializer_class(self):
+        if self.request.method == 'GET':
+            return DeviceListSerializer
+        return DeviceSerializer
 
     def get_queryset(self):
         hospital_id = self.kwargs.get('hospital_id')
-        if hospital_id:
-            return Device.objects.filter(hospital__id=hospital_id).prefetch_related('calibrations')
-        return Device.objects.none()  # Safety fallback
+        if not hospital_id:
+            return Device.objects.none()  # Safety fallback
+        queryset = Device.objects.filter(hospital__id=hospital_id)
+        if self.request.method == 'GET':
+            expanded = requested_names(self.request, 'expand') & set(DEVICE_PREFETCHES)
+            return queryset.prefetch_related(*(DEVICE_PREFETCHES[name]() for name in sorted(expanded)))
+        return queryset
     
     def perform_create(self, serializer):
         hospital_id = self.kwargs.get('hospital_id')
@@ -53,6 +195,72 @@ class DeviceDetailView(generics.RetrieveUpdateDestroyAPIView):
         obj.calibrations.all()  # Force load
         return obj
 
+class DeviceImportView(APIView):
+    """
+    Creates or updates devices in bulk, keyed by serial_number. Send the rows
+    as the request body (text/csv, application/json array or
+    application/x-ndjson) or as a multipart ``file`` upload. The body is read
+    as a stream; rows that fail validation are reported by row number and
+    the rest are written.
+    """
+    permission_classes = [IsTechnicianOrAdmin]
+    content_types = {'text/csv': 'csv', 'application/json': 'json', 'application/x-ndjson': 'ndjson'}
+
+    def post(self, request, hospital_id):
+        hospital = get_object_or_404(Hospital, id=hospital_id)
+        content_type = (request.content_type or '').split(';')[0].strip().lower()
+        if content_type == 'multipart/form-data':
+            upload = request.FILES.get('file')
+            if upload is None:
+                return Response({"error": "No file uploaded"}, status=status.HTTP_400_BAD_REQUEST)
+            fmt = request.data.get('format') or upload.name.rsplit('.', 1)[-1].lower()
+            stream = upload
+        else:
+            fmt = request.query_params.get('format') or self.content_types.get(content_type)
+            stream = request.stream
+        if fmt not in IMPORT_FORMATS:
+            return Response({"error": f"Unsupported format; use one of {', '.join(IMPORT_FORMATS)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if stream is None:
+            return Response({"error": "No rows uploaded"}, status=status.HTTP_400_BAD_REQUEST)
+
+        summary = DeviceImport(hospital).run(read_rows(stream, fmt))
+        return Response(summary, status=status.HTTP_400_BAD_REQUEST if 'error' in summary else status.HTTP_200_OK)
+
+
+class DeviceTimelineView(APIView):
+    """
+    A device's service logs, calibrations, incidents and documents as one
+    newest-first stream, keyset-paginated. ?types=calibration,incident limits
+    the sources; ?limit= sets the page size.
+    """
+    permission_classes = [IsAuthenticated]
+    page_size = 20
+    max_page_size = 100
+
+    def get(self, request, hospital_id, device_id):
+        get_object_or_404(Device.objects.only('id'), id=device_id, hospital_id=hospital_id)
+        try:
+            limit = positive_int(request.query_params.get('limit', self.page_size), cutoff=self.max_page_size)
+        except ValueError:
+            limit = self.page_size
+        kinds = requested_names(request, 'types') or None
+        if kinds and not kinds <= set(SOURCES):
+            return Response({'error': f"Unknown types: {', '.join(sorted(kinds - set(SOURCES)))}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        cursor = request.query_params.get('cursor')
+        try:
+            cursor = decode_cursor(cursor) if cursor else None
+        except ValueError:
+            raise NotFound('Invalid cursor')
+
+        events, next_cursor = device_timeline(device_id, limit, cursor=cursor, kinds=kinds)
+        next_link = None
+        if next_cursor is not None:
+            next_link = replace_query_param(request.build_absolute_uri(), 'cursor', encode_cursor(next_cursor))
+        return Response({'next': next_link, 'results': events})
+
+
 class ServiceLogCreateView(generics.CreateAPIView):
     serializer_class = ServiceLogSerializer
     permission_classes = [IsAuthenticated]
@@ -0,0 +1,9 @@
+"""Query parameter parsing shared by the hospital-scoped APIs."""
+
+
+def positive_int(value, cutoff=None):
+    """``value`` as an integer of at least 1, capped at ``cutoff``; ValueError if it isn't one."""
+    number = int(value)
+    if number < 1:
+        raise ValueError(f"{value!r} is not a positive integer")
+    return number if cutoff is None else min(number, cutoff)
@@ -0,0 +1,22 @@
+"""Fixtures shared by the apps' test suites."""
+from django.contrib.auth.models import User
+from employees.models import Employee
+from .models import Hospital
+
+
+def create_user(username='admin@example.com', **fields):
+    """A user whose password is 'pw'."""
+    return User.objects.create_user(username=username, password='pw', **fields)
+
+
+def create_hospital(admin, name='General', **fields):
+    """A hospital run by ``admin``, with placeholder contact details and an email derived from its name."""
+    details = {
+        'hospital_type': 'General', 'address': '1 Main St', 'city': 'City', 'state': 'State',
+        'zipcode': '00000', 'phone_number': '000', 'email': f"{name.lower().replace(' ', '-')}@example.com",
+    }
+    return Hospital.objects.create(name=name, admin=admin, **{**details, **fields})
+
+
+def create_engineer(user, hospital, employee_id='E1'):
+    return Employee.objects.create(user=user, hospital=hospital, role='engineer', employee_id=employee_id)
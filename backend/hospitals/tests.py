@@ -1,3 +1,13 @@
-from django.test import TestCase
+from django.test import SimpleTestCase
+from .params import positive_int
 
-# Create your tests here.
+
+class PositiveIntTests(SimpleTestCase):
+    def test_parses_and_caps(self):
+        self.assertEqual(positive_int('7'), 7)
+        self.assertEqual(positive_int(500, cutoff=50), 50)
+
+    def test_rejects_everything_else(self):
+        for value in ('0', '-3', 'ten', '1.5', ''):
+            with self.assertRaises(ValueError):
+                positive_int(value)
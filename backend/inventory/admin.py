@@ -1,7 +1,9 @@
 from django.contrib import admin
-from .models import Category, Unit, InventoryItem
+from .models import Category, Unit, InventoryItem, StockMovement, StockCheckpoint
 # Register your models here.
 
 admin.site.register(Category)
 admin.site.register(Unit)
-admin.site.register(InventoryItem)
\ No newline at end of file
+admin.site.register(InventoryItem)
+admin.site.register(StockMovement)
+admin.site.register(StockCheckpoint)
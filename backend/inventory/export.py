@@ -0,0 +1,62 @@
+"""
+Inventory export as a stream: rows come from one values_list query read
+through .iterator(), stock level included as a stored column, so memory
+stays flat however many items a hospital has. CSV is generated as the response is
+sent. XLSX (needs XlsxWriter) is written in constant-memory mode to a
+temporary file, which is then streamed.
+"""
+import csv
+import io
+import tempfile
+try:
+    import xlsxwriter
+except ImportError:  # XLSX export is optional
+    xlsxwriter = None
+
+CHUNK_SIZE = 2000
+HEADER = [
+    'ID', 'Name', 'Category', 'Quantity', 'Unit', 'Stock Level', 'Expiry Date',
+    'Location', 'SKU', 'Barcode', 'Cost', 'Tax', 'Supplier', 'Batch',
+]
+FIELDS = [
+    'id', 'name', 'category__name', 'quantity', 'unit__name', 'stock_level', 'expiry_date',
+    'location', 'sku', 'barcode', 'cost', 'tax', 'supplier__name', 'batch',
+]
+EXPIRY = FIELDS.index('expiry_date')
+FORMATS = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def export_rows(queryset, chunk_size=CHUNK_SIZE):
+    """Yield one tuple per item, in HEADER order, without loading model instances."""
+    return queryset.values_list(*FIELDS).iterator(chunk_size=chunk_size)
+
+
+def stream_csv(rows, rows_per_chunk=500):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(HEADER)
+    for count, row in enumerate(rows, 1):
+        if row[EXPIRY] is None:
+            row = row[:EXPIRY] + ('N/A',) + row[EXPIRY + 1:]
+        writer.writerow(['' if value is None else value for value in row])
+        if count % rows_per_chunk == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def write_xlsx(rows):
+    """Write the rows to a temporary .xlsx file and return it rewound (the caller closes it)."""
+    output = tempfile.TemporaryFile()
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True, 'default_date_format': 'yyyy-mm-dd'})
+    sheet = workbook.add_worksheet('Inventory')
+    sheet.write_row(0, 0, HEADER, workbook.add_format({'bold': True}))
+    for number, row in enumerate(rows, 1):
+        sheet.write_row(number, 0, row)
+    workbook.close()
+    output.seek(0)
+    return output
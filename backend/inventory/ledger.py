@@ -0,0 +1,198 @@
+"""
+Stock movement ledger.
+
+Every change to InventoryItem.quantity is written down as a StockMovement:
+
+- move_stock and transfer_stock apply a delta with an F() UPDATE. Outgoing
+  movements are guarded by ``quantity >= amount`` in the same statement, so
+  concurrent movements add up rather than overwrite each other, and stock
+  never goes negative.
+- update_quantities (stock counts) records adjustments through apply_changes.
+- Plain saves that set quantity (item edits, creation) are recorded by
+  inventory.signals.
+
+Stock at a past moment is the item's latest StockCheckpoint before that
+moment plus the movements made since (with_stock_as_of). It costs one
+annotated query for any number of items and never replays the whole ledger.
+Checkpoints are written by the checkpoint_stock command.
+
+Movement totals also feed the monthly stock-in and stock-out chart counters.
+"""
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+from django.db import transaction
+from django.db.models import DateTimeField, F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from dashboard.activity import activity_event
+from dashboard.alerts import refresh_inventory_alerts
+from dashboard.cache import invalidate_dashboard
+from dashboard.counters import bump, month_of
+from dashboard.models import ActivityEvent, MonthlyChartCounter
+from .models import InventoryItem, StockCheckpoint, StockMovement
+
+CHECKPOINT_CHUNK_SIZE = 2000
+OUTGOING = {StockMovement.ISSUE, StockMovement.EXPIRY}
+# What the alerts, activity feed and chart counter read from a row before it changes
+FIELDS = ('id', 'hospital_id', 'name', 'sku', 'batch', 'quantity', 'reorder_level', 'expiry_date', 'last_updated')
+ACTIVITY = {
+    StockMovement.RECEIPT: 'received {amount} of',
+    StockMovement.ISSUE: 'issued {amount} of',
+    StockMovement.ADJUSTMENT: 'adjusted stock ({before} → {after}) of',
+    StockMovement.TRANSFER: 'transferred {amount} {direction}',
+    StockMovement.EXPIRY: 'wrote off {amount} expired',
+}
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class InsufficientStock(ValueError):
+    """An issue, write-off or transfer asked for more than the item holds."""
+
+
+def movement(item, kind, before, after, at, actor=None, reference='', note='', related_item_id=None):
+    """An unsaved ledger row taking ``item`` from ``before`` to ``after``."""
+    return StockMovement(
+        hospital_id=item.hospital_id, item_id=item.pk, kind=kind, quantity=after - before, balance=after,
+        related_item_id=related_item_id, reference=reference[:100], note=note[:255], performed_by=actor,
+        created_at=at,
+    )
+
+
+def record_movements(movements):
+    """Save ledger rows and add them to the monthly stock-in/stock-out counters."""
+    StockMovement.objects.bulk_create(movements)
+    totals = Counter()
+    for row in movements:
+        metric = MonthlyChartCounter.STOCK_IN if row.quantity > 0 else MonthlyChartCounter.STOCK_OUT
+        totals[row.hospital_id, metric, month_of(row.created_at)] += abs(row.quantity)
+    for (hospital_id, metric, month), value in totals.items():
+        bump(hospital_id, metric, month, value)
+    return movements
+
+
+def apply_changes(changes, now, kind=StockMovement.ADJUSTMENT, actor=None, reference='', note='', related=None):
+    """
+    Bookkeeping for quantities written with a queryset UPDATE, which sends no
+    signals. ``changes`` is [(item as loaded before the UPDATE, new quantity)]
+    and ``related`` maps item ids to the other side of a transfer. Records the
+    movements and does what the post_save receivers in dashboard.signals would
+    have done for each row: activity, chart counter, alerts and the cache.
+    Returns the movements.
+    """
+    related = related or {}
+    new_month = month_of(now)
+    months = Counter()
+    movements, events = [], []
+    for item, quantity in changes:
+        before = item.quantity
+        movements.append(movement(item, kind, before, quantity, now, actor=actor, reference=reference, note=note,
+                                  related_item_id=related.get(item.pk)))
+        action = ACTIVITY[kind].format(amount=abs(quantity - before), before=before, after=quantity,
+                                       direction='into' if quantity > before else 'out of')
+        events.append(activity_event(item.hospital_id, 'inventory_adjusted', action, item.name, actor=actor,
+                                     target=item))
+        months[item.hospital_id, month_of(item.last_updated)] += 1
+        item.quantity, item.last_updated = quantity, now
+        item._activity_quantity = item._ledger_quantity = quantity
+        item._chart_month = new_month
+
+    hospitals = Counter()
+    for (hospital_id, month), count in months.items():
+        hospitals[hospital_id] += count
+        if month != new_month:
+            bump(hospital_id, MonthlyChartCounter.INVENTORY, month, -count)
+    for hospital_id, count in hospitals.items():
+        bump(hospital_id, MonthlyChartCounter.INVENTORY, new_month, count - months[hospital_id, new_month])
+        invalidate_dashboard(hospital_id)
+    record_movements(movements)
+    ActivityEvent.objects.bulk_create(events)
+    refresh_inventory_alerts([item for item, _ in changes])
+    return movements
+
+
+def _apply_deltas(hospital_id, deltas, kind, actor=None, reference='', note='', related=None, now=None):
+    """Add each (item id, delta) with an F() UPDATE, in one transaction; returns the movements."""
+    now = now or timezone.now()
+    with transaction.atomic():
+        # Rows are locked in id order so two transfers between the same items can't deadlock
+        locked = {
+            item.pk: item for item in InventoryItem.objects.select_for_update()
+            .filter(hospital_id=hospital_id, pk__in=[item_id for item_id, _ in deltas]).order_by('pk').only(*FIELDS)
+        }
+        changes = []
+        for item_id, delta in deltas:
+            item = locked.get(item_id)
+            if item is None:
+                raise InventoryItem.DoesNotExist(f"No inventory item {item_id} in hospital {hospital_id}")
+            updated = InventoryItem.objects.filter(pk=item_id, quantity__gte=max(-delta, 0)) \
+                .update(quantity=F('quantity') + delta, last_updated=now)
+            if not updated:
+                raise InsufficientStock(f"{item.name} has {item.quantity} in stock, {-delta} requested")
+            changes.append((item, item.quantity + delta))
+        return apply_changes(changes, now, kind, actor=actor, reference=reference, note=note, related=related)
+
+
+def move_stock(item, kind, quantity, actor=None, reference='', note='', now=None):
+    """
+    Record one receipt, issue, expiry write-off (``quantity`` > 0) or
+    adjustment (signed ``quantity``) against ``item``; returns the movement.
+    """
+    if kind == StockMovement.TRANSFER:
+        raise ValueError("Use transfer_stock for transfers")
+    if kind not in dict(StockMovement.KIND_CHOICES):
+        raise ValueError(f"Unknown movement kind {kind!r}")
+    if not quantity or (kind != StockMovement.ADJUSTMENT and quantity < 0):
+        raise ValueError("Quantity must be positive")
+    delta = -quantity if kind in OUTGOING else quantity
+    return _apply_deltas(item.hospital_id, [(item.pk, delta)], kind, actor=actor, reference=reference,
+                         note=note, now=now)[0]
+
+
+def transfer_stock(source, destination, quantity, actor=None, reference='', note='', now=None):
+    """Move ``quantity`` from one item to another of the same hospital; returns (out, in) movements."""
+    if quantity <= 0:
+        raise ValueError("Quantity must be positive")
+    if source.pk == destination.pk or source.hospital_id != destination.hospital_id:
+        raise ValueError("Transfers move stock between two items of the same hospital")
+    return tuple(_apply_deltas(
+        source.hospital_id, [(source.pk, -quantity), (destination.pk, quantity)], StockMovement.TRANSFER,
+        actor=actor, reference=reference, note=note, related={source.pk: destination.pk, destination.pk: source.pk},
+        now=now,
+    ))
+
+
+def with_stock_as_of(items, when):
+    """
+    Annotate ``items`` with ``stock_as_of``, their quantity at ``when``: the
+    latest checkpoint at or before it plus the ledger rows after that checkpoint.
+    Items with no checkpoint count from zero.
+    """
+    checkpoints = StockCheckpoint.objects.filter(item=OuterRef('pk'), as_of__lte=when).order_by('-as_of')
+    items = items.annotate(
+        checkpoint_at=Coalesce(Subquery(checkpoints.values('as_of')[:1]), Value(EPOCH), output_field=DateTimeField()),
+        checkpoint_quantity=Coalesce(Subquery(checkpoints.values('quantity')[:1]), Value(0)),
+    )
+    since = StockMovement.objects.filter(
+        item=OuterRef('pk'), created_at__gt=OuterRef('checkpoint_at'), created_at__lte=when,
+    ).order_by().values('item').annotate(total=Sum('quantity')).values('total')
+    return items.annotate(
+        stock_as_of=F('checkpoint_quantity') + Coalesce(Subquery(since, output_field=IntegerField()), Value(0))
+    )
+
+
+def write_checkpoints(hospital_ids=None, chunk_size=CHECKPOINT_CHUNK_SIZE):
+    """Checkpoint every item's current quantity (or those of hospital_ids); returns how many were written."""
+    as_of = timezone.now()
+    items = InventoryItem.objects.order_by()
+    if hospital_ids is not None:
+        items = items.filter(hospital_id__in=hospital_ids)
+    written = 0
+    batch = []
+    for item_id, quantity in items.values_list('id', 'quantity').iterator(chunk_size=chunk_size):
+        batch.append(StockCheckpoint(item_id=item_id, as_of=as_of, quantity=quantity))
+        if len(batch) >= chunk_size:
+            written += len(StockCheckpoint.objects.bulk_create(batch, ignore_conflicts=True))
+            batch = []
+    if batch:
+        written += len(StockCheckpoint.objects.bulk_create(batch, ignore_conflicts=True))
+    return written
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from inventory.ledger import write_checkpoints
+
+
+class Command(BaseCommand):
+    help = 'Checkpoint every item\'s current quantity so stock-as-of queries only add recent ledger rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hospital', type=int, action='append', dest='hospitals',
+                            help='Limit to a hospital id (repeatable)')
+
+    def handle(self, *args, **options):
+        count = write_checkpoints(options['hospitals'])
+        self.stdout.write(self.style.SUCCESS(f'Wrote {count} stock checkpoint(s)'))
@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-17 15:15
+
+from django.db import migrations, models
+
+
+def mark_existing_codes_ready(apps, schema_editor):
+    # Rows rendered by the old synchronous receiver already have an image
+    InventoryItem = apps.get_model('inventory', 'InventoryItem')
+    InventoryItem.objects.exclude(qr_code__isnull=True).exclude(qr_code='').update(qr_status='ready')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_alter_category_name_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventoryitem',
+            name='qr_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='inventoryitem',
+            name='qr_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=10),
+        ),
+        migrations.RunPython(mark_existing_codes_ready, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-17 15:31
+
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospitals', '0001_initial'),
+        ('inventory', '0004_inventoryitem_qr_status'),
+        ('suppliers', '0003_alter_supplier_contact_email'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventoryitem',
+            name='stock_level',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(quantity__lte=models.F('reorder_level'), then=models.Value('Low')), models.When(quantity__lte=django.db.models.expressions.CombinedExpression(models.F('reorder_level'), '*', models.Value(2)), then=models.Value('Medium')), default=models.Value('High')), output_field=models.CharField(choices=[('Low', 'Low'), ('Medium', 'Medium'), ('High', 'High')], max_length=6)),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['hospital', 'stock_level'], name='item_hospital_stock_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(condition=models.Q(('stock_level', 'Low')), fields=['hospital', 'id'], name='item_low_stock_idx'),
+        ),
+    ]
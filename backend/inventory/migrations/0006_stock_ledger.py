@@ -0,0 +1,90 @@
+# Generated by Django 5.2 on 2026-10-17 15:38
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def opening_checkpoints(apps, schema_editor):
+    # Quantities from before the ledger are known only as of now
+    InventoryItem = apps.get_model('inventory', 'InventoryItem')
+    StockCheckpoint = apps.get_model('inventory', 'StockCheckpoint')
+    now = django.utils.timezone.now()
+    StockCheckpoint.objects.bulk_create(
+        (StockCheckpoint(item_id=item_id, as_of=now, quantity=quantity)
+         for item_id, quantity in InventoryItem.objects.values_list('id', 'quantity').iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0002_employee_unique_employee_per_hospital'),
+        ('hospitals', '0001_initial'),
+        ('inventory', '0005_inventoryitem_stock_level'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('as_of', models.DateTimeField()),
+                ('quantity', models.PositiveIntegerField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('receipt', 'Receipt'), ('issue', 'Issue'), ('adjustment', 'Adjustment'), ('transfer', 'Transfer'), ('expiry', 'Expiry write-off')], max_length=20)),
+                ('quantity', models.IntegerField()),
+                ('balance', models.PositiveIntegerField()),
+                ('reference', models.CharField(blank=True, max_length=100)),
+                ('note', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['-created_at', '-id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='stockcheckpoint',
+            name='item',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkpoints', to='inventory.inventoryitem'),
+        ),
+        migrations.AddField(
+            model_name='stockmovement',
+            name='hospital',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='hospitals.hospital'),
+        ),
+        migrations.AddField(
+            model_name='stockmovement',
+            name='item',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='inventory.inventoryitem'),
+        ),
+        migrations.AddField(
+            model_name='stockmovement',
+            name='performed_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to='employees.employee'),
+        ),
+        migrations.AddField(
+            model_name='stockmovement',
+            name='related_item',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='inventory.inventoryitem'),
+        ),
+        migrations.AddConstraint(
+            model_name='stockcheckpoint',
+            constraint=models.UniqueConstraint(fields=('item', 'as_of'), name='unique_checkpoint_per_item_time'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['item', 'created_at'], name='movement_item_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['hospital', 'created_at'], name='movement_hospital_time_idx'),
+        ),
+        migrations.RunPython(opening_checkpoints, migrations.RunPython.noop),
+    ]
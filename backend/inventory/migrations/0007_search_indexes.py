@@ -0,0 +1,46 @@
+# Generated by Django 5.2 on 2026-10-17 16:05
+
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Collate, Upper
+
+
+def search_indexes():
+    return [
+        # Must match inventory.search.VECTOR for the planner to use it
+        GinIndex(SearchVector('name', 'sku', 'location', config='simple'), name='item_search_idx'),
+        GinIndex(OpClass('name', name='gin_trgm_ops'), name='item_name_trgm_idx'),
+        models.Index(F('hospital'), Collate(Upper('name'), 'C'), F('id'), name='item_name_prefix_idx'),
+        models.Index(F('hospital'), Collate(Upper('sku'), 'C'), F('id'), name='item_sku_prefix_idx'),
+    ]
+
+
+def create_search_indexes(apps, schema_editor):
+    # PostgreSQL only; elsewhere inventory.search keeps an in-process index
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    InventoryItem = apps.get_model('inventory', 'InventoryItem')
+    for index in search_indexes():
+        schema_editor.add_index(InventoryItem, index)
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    InventoryItem = apps.get_model('inventory', 'InventoryItem')
+    for index in search_indexes():
+        schema_editor.remove_index(InventoryItem, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
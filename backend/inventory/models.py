@@ -1,7 +1,6 @@
 from django.db import models
+from django.utils import timezone
 from hospitals.models import Hospital
-from django.db.models.signals import post_save
-from django.dispatch import receiver
 import qrcode
 from django.core.files import File
 from io import BytesIO
@@ -31,6 +30,9 @@ class Unit(models.Model):
         return self.name
     
     
+STOCK_LEVELS = [('Low', 'Low'), ('Medium', 'Medium'), ('High', 'High')]
+
+
 class InventoryItem(models.Model):
     hospital = models.ForeignKey(Hospital, on_delete=models.CASCADE, related_name='inventory_items')
     name = models.CharField(max_length=100)
@@ -50,14 +52,36 @@ class InventoryItem(models.Model):
     batch = models.CharField(max_length=50, blank=True)
     description = models.TextField(blank=True)
     qr_code = models.ImageField(upload_to='inventory_qr_codes/%Y/%m/%d/', null=True, blank=True)
+    # Rendered by the qrcodes worker; qr_hash is the sha256 of the payload in qr_code
+    qr_status = models.CharField(max_length=10, choices=[('pending','Pending'),('ready','Ready'),('failed','Failed')], default='pending')
+    qr_hash = models.CharField(max_length=64, blank=True, editable=False)
+    # Computed by the database on every write, bulk and queryset updates included
+    stock_level = models.GeneratedField(
+        expression=models.Case(
+            models.When(quantity__lte=models.F('reorder_level'), then=models.Value('Low')),
+            models.When(quantity__lte=models.F('reorder_level') * 2, then=models.Value('Medium')),
+            default=models.Value('High'),
+        ),
+        output_field=models.CharField(max_length=6, choices=STOCK_LEVELS),
+        db_persist=True,
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['hospital', 'stock_level'], name='item_hospital_stock_idx'),
+            # Low-stock lists and counts read only this small slice
+            models.Index(fields=['hospital', 'id'], condition=models.Q(stock_level='Low'), name='item_low_stock_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.sku}) - {self.hospital.name}"
 
+    def qr_payload(self):
+        return f"https://meditrackpro.com/inventory/{self.hospital_id}/{self.id}"
+
     def generate_qr_code(self):
-        qr_url = f"https://meditrackpro.com/inventory/{self.hospital_id}/{self.id}"
         qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_L, box_size=10, border=4)
-        qr.add_data(qr_url)
+        qr.add_data(self.qr_payload())
         qr.make(fit=True)
         img = qr.make_image(fill_color="black", back_color="white")
         buffer = BytesIO()
@@ -66,8 +90,64 @@ class InventoryItem(models.Model):
         self.qr_code.save(file_name, File(buffer), save=False)
         buffer.close()
 
-@receiver(post_save, sender=InventoryItem)
-def create_or_update_qr_code(sender, instance, created, **kwargs):
-    if created or not instance.qr_code:
-        instance.generate_qr_code()
-        instance.save(update_fields=['qr_code'])
\ No newline at end of file
+
+class StockMovement(models.Model):
+    """
+    Append-only ledger of stock changes, written by inventory.ledger for every
+    path that changes InventoryItem.quantity. ``quantity`` is signed (positive
+    in, negative out) and ``balance`` is the item's quantity right after it.
+    """
+    RECEIPT = 'receipt'
+    ISSUE = 'issue'
+    ADJUSTMENT = 'adjustment'
+    TRANSFER = 'transfer'
+    EXPIRY = 'expiry'
+    KIND_CHOICES = [
+        (RECEIPT, 'Receipt'),
+        (ISSUE, 'Issue'),
+        (ADJUSTMENT, 'Adjustment'),
+        (TRANSFER, 'Transfer'),
+        (EXPIRY, 'Expiry write-off'),
+    ]
+
+    hospital = models.ForeignKey(Hospital, on_delete=models.CASCADE, related_name='stock_movements')
+    item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE, related_name='movements')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    quantity = models.IntegerField()
+    balance = models.PositiveIntegerField()
+    # The other side of a transfer
+    related_item = models.ForeignKey(InventoryItem, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    reference = models.CharField(max_length=100, blank=True)
+    note = models.CharField(max_length=255, blank=True)
+    performed_by = models.ForeignKey('employees.Employee', on_delete=models.SET_NULL, null=True, blank=True,
+                                     related_name='stock_movements')
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['item', 'created_at'], name='movement_item_time_idx'),
+            models.Index(fields=['hospital', 'created_at'], name='movement_hospital_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.quantity:+d} of item {self.item_id}"
+
+
+class StockCheckpoint(models.Model):
+    """
+    An item's quantity at a moment, written by the checkpoint_stock command.
+    Stock as of a date starts from the latest checkpoint before it and adds the
+    ledger rows since, so no query replays the whole history.
+    """
+    item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE, related_name='checkpoints')
+    as_of = models.DateTimeField()
+    quantity = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['item', 'as_of'], name='unique_checkpoint_per_item_time')
+        ]
+
+    def __str__(self):
+        return f"{self.item_id} @ {self.as_of:%Y-%m-%d %H:%M}: {self.quantity}"
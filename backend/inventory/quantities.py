@@ -0,0 +1,85 @@
+"""
+Bulk quantity updates, as sent by stock counts and scanners.
+
+Each chunk of changes is written with one UPDATE ... SET quantity = CASE id
+WHEN ... END, all inside one transaction. A change may carry the quantity the
+client last saw (``expected``). If the row no longer holds that value, the
+change is reported as a conflict rather than overwriting a concurrent count.
+The rows are read with select_for_update, so the check and the write see the
+same value.
+
+A queryset UPDATE sends no model signals. The changes are handed to
+ledger.apply_changes, which records them as adjustments and updates what the
+save signals would have (activity, alerts, chart counter and cache), once for
+the whole batch.
+"""
+from django.db import transaction
+from django.db.models import Case, PositiveIntegerField, Value, When
+from django.utils import timezone
+from .ledger import FIELDS, apply_changes
+
+CHUNK_SIZE = 500
+MAX_QUANTITY = 2147483647  # the largest PositiveIntegerField value on every backend
+UPDATED, UNCHANGED, CONFLICT, INVALID, NOT_FOUND = 'updated', 'unchanged', 'conflict', 'invalid', 'not_found'
+
+
+def parse_change(value):
+    """(quantity, expected) from ``12`` or ``{"quantity": 12, "expected": 10}``; None if malformed or out of range."""
+    expected = None
+    if isinstance(value, dict):
+        value, expected = value.get('quantity'), value.get('expected')
+    try:
+        quantity = int(value)
+        expected = None if expected is None else int(expected)
+    except (TypeError, ValueError):
+        return None
+    return (quantity, expected) if 0 <= quantity <= MAX_QUANTITY else None
+
+
+def update_quantities(items, changes, actor=None, chunk_size=CHUNK_SIZE):
+    """
+    Apply ``changes`` ({item id: change}) to the rows of ``items``. Returns a
+    result per id: {'status': ..., 'quantity': ...}, where quantity is the
+    row's value after the call (absent for invalid and not_found).
+    """
+    results, wanted = {}, {}
+    for key, value in changes.items():
+        change = parse_change(value)
+        try:
+            item_id = int(key)
+        except (TypeError, ValueError):
+            change = None
+        if change is None:
+            results[str(key)] = {'status': INVALID}
+        else:
+            wanted[item_id] = change
+
+    now = timezone.now()
+    updated = []
+    ids = list(wanted)
+    with transaction.atomic():
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            writes = []
+            for item in items.filter(id__in=chunk).select_for_update().only(*FIELDS):
+                quantity, expected = wanted.pop(item.id)
+                if expected is not None and expected != item.quantity:
+                    results[str(item.id)] = {'status': CONFLICT, 'quantity': item.quantity}
+                elif quantity == item.quantity:
+                    results[str(item.id)] = {'status': UNCHANGED, 'quantity': quantity}
+                else:
+                    writes.append((item, quantity))
+                    results[str(item.id)] = {'status': UPDATED, 'quantity': quantity}
+            if writes:
+                items.model.objects.filter(id__in=[item.id for item, _ in writes]).update(
+                    quantity=Case(*[When(id=item.id, then=Value(quantity)) for item, quantity in writes],
+                                  output_field=PositiveIntegerField()),
+                    last_updated=now,
+                )
+                updated.extend(writes)
+        for item_id in wanted:
+            results[str(item_id)] = {'status': NOT_FOUND}
+        if updated:
+            apply_changes(updated, now, actor=actor, note='Stock count')
+    return results
+
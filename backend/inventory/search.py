@@ -0,0 +1,255 @@
+"""
+Inventory search: ``?search=`` on the item list and export, and prefix
+autocomplete.
+
+On PostgreSQL, an item matches when every word of the query prefixes a word
+of its name, SKU or location. That check is a 'simple' full-text query served
+by the GIN index item_search_idx. An item also matches when its name is
+trigram-similar to the query (pg_trgm, item_name_trgm_idx), which absorbs
+typos. Results are ranked by ts_rank plus name similarity. Autocomplete is a
+range scan of the (hospital, upper(name) COLLATE "C") and
+(hospital, upper(sku) COLLATE "C") indexes, so the first N come straight off
+the index in order.
+
+Other databases (the SQLite dev setup) use SearchIndex instead. It is an
+in-process index per hospital with the same matching rules: word prefixes,
+plus pg_trgm-style trigram similarity for words of three or more letters.
+It is built on first use and kept current by inventory.signals. Saves made
+by other processes are not seen, which is fine for a single dev server.
+"""
+import re
+import threading
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+from django.contrib.postgres.lookups import TrigramSimilar
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+from django.db import connection
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.db.models.functions import Collate, Upper
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.settings import api_settings
+from .models import InventoryItem
+
+CONFIG = 'simple'
+# Must stay identical to the item_search_idx expression in migration 0007
+VECTOR = SearchVector('name', 'sku', 'location', config=CONFIG)
+SIMILARITY_THRESHOLD = 0.3  # pg_trgm's default for %
+MAX_RESULTS = 1000  # ids the in-process index hands to the database per search
+FIELDS = ('id', 'name', 'sku', 'location')
+# Sorts after every character, so [prefix, prefix + LAST) is the prefix's range
+LAST = '\U0010ffff'
+_WORD = re.compile(r'\w+')
+
+
+def words(text):
+    return _WORD.findall((text or '').lower())
+
+
+def trigrams(word):
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def uses_database_search():
+    return connection.vendor == 'postgresql'
+
+
+class SearchIndex:
+    """In-process search over one hospital's items, for databases without full-text search."""
+
+    def __init__(self):
+        self.items = {}                  # id -> (name, sku, location)
+        self.postings = defaultdict(set)  # word -> item ids
+        self.words = []                  # distinct words, sorted
+        self.grams = defaultdict(set)     # trigram -> words
+        self.names = []                  # (upper name, id), sorted
+        self.skus = []                   # (upper sku, id), sorted
+
+    @classmethod
+    def build(cls, rows):
+        """An index of (id, name, sku, location) rows, sorted once rather than insert by insert."""
+        index = cls()
+        for item_id, name, sku, location in rows:
+            index.items[item_id] = (name, sku, location)
+            for word in set(words(f"{name} {sku} {location}")):
+                index.postings[word].add(item_id)
+            index.names.append((name.upper(), item_id))
+            index.skus.append((sku.upper(), item_id))
+        index.words = sorted(index.postings)
+        for word in index.words:
+            for gram in trigrams(word):
+                index.grams[gram].add(word)
+        index.names.sort()
+        index.skus.sort()
+        return index
+
+    def add(self, item_id, name, sku, location):
+        self.remove(item_id)
+        self.items[item_id] = (name, sku, location)
+        for word in set(words(f"{name} {sku} {location}")):
+            if word not in self.postings:
+                insort(self.words, word)
+                for gram in trigrams(word):
+                    self.grams[gram].add(word)
+            self.postings[word].add(item_id)
+        insort(self.names, (name.upper(), item_id))
+        insort(self.skus, (sku.upper(), item_id))
+
+    def remove(self, item_id):
+        fields = self.items.pop(item_id, None)
+        if fields is None:
+            return
+        name, sku, location = fields
+        for word in set(words(f"{name} {sku} {location}")):
+            ids = self.postings[word]
+            ids.discard(item_id)
+            if not ids:
+                del self.postings[word]
+                del self.words[bisect_left(self.words, word)]
+                for gram in trigrams(word):
+                    self.grams[gram].discard(word)
+        del self.names[bisect_left(self.names, (name.upper(), item_id))]
+        del self.skus[bisect_left(self.skus, (sku.upper(), item_id))]
+
+    def _prefixed(self, sorted_list, prefix):
+        start = bisect_left(sorted_list, prefix)
+        end = bisect_left(sorted_list, prefix + LAST, start)
+        return sorted_list[start:end]
+
+    def _term_scores(self, term):
+        """{item id: score} for one query word: 1 exact, 0.75 prefix, similarity/2 fuzzy."""
+        scores = {}
+        matched = {word: (1.0 if word == term else 0.75) for word in self._prefixed(self.words, term)}
+        if len(term) >= 3:
+            term_grams = trigrams(term)
+            shared = Counter(word for gram in term_grams for word in self.grams.get(gram, ()))
+            for word, count in shared.items():
+                similarity = count / (len(term_grams) + len(trigrams(word)) - count)
+                if similarity >= SIMILARITY_THRESHOLD and word not in matched:
+                    matched[word] = similarity / 2
+        for word, score in matched.items():
+            for item_id in self.postings[word]:
+                if score > scores.get(item_id, 0):
+                    scores[item_id] = score
+        return scores
+
+    def search(self, text, limit=MAX_RESULTS):
+        """Ids of the items matching every word of ``text``, best first."""
+        scores = None
+        for term in words(text):
+            term_scores = self._term_scores(term)
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {item_id: score + term_scores[item_id]
+                          for item_id, score in scores.items() if item_id in term_scores}
+            if not scores:
+                return []
+        return sorted(scores or (), key=lambda item_id: (-scores[item_id], item_id))[:limit]
+
+    def complete(self, prefix, limit):
+        """Up to ``limit`` items whose name, then SKU, starts with ``prefix``, in name/SKU order."""
+        prefix = prefix.upper()
+        found = []
+        for sorted_list in (self.names, self.skus):
+            position = bisect_left(sorted_list, (prefix,))
+            while len(found) < limit and position < len(sorted_list) and sorted_list[position][0].startswith(prefix):
+                item_id = sorted_list[position][1]
+                if item_id not in found:
+                    found.append(item_id)
+                position += 1
+        return [dict(zip(FIELDS, (item_id, *self.items[item_id]))) for item_id in found]
+
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+def hospital_index(hospital_id):
+    """The hospital's SearchIndex, built from the database on first use. Callers hold _lock."""
+    index = _indexes.get(hospital_id)
+    if index is None:
+        rows = InventoryItem.objects.filter(hospital_id=hospital_id).values_list(*FIELDS).iterator(chunk_size=2000)
+        index = _indexes[hospital_id] = SearchIndex.build(rows)
+    return index
+
+
+def clear_indexes():
+    """Drop every built index; each is rebuilt from the database on its next use."""
+    with _lock:
+        _indexes.clear()
+
+
+def index_item(hospital_id, item_id, name, sku, location):
+    with _lock:
+        if hospital_id in _indexes:
+            _indexes[hospital_id].add(item_id, name, sku, location)
+
+
+def unindex_item(hospital_id, item_id):
+    with _lock:
+        if hospital_id in _indexes:
+            _indexes[hospital_id].remove(item_id)
+
+
+def search_items(queryset, hospital_id, text, ranked=True):
+    """``queryset`` narrowed to the items matching ``text``; ordered by relevance when ranked."""
+    if not words(text):
+        return queryset.none()
+    if uses_database_search():
+        query = SearchQuery(' & '.join(f"{word}:*" for word in words(text)), search_type='raw', config=CONFIG)
+        queryset = queryset.annotate(search_vector=VECTOR) \
+            .filter(Q(search_vector=query) | TrigramSimilar(F('name'), text))
+        if ranked:
+            queryset = queryset.annotate(
+                search_rank=SearchRank(F('search_vector'), query) + TrigramSimilarity('name', text)
+            ).order_by('-search_rank', 'id')
+        return queryset
+
+    with _lock:
+        ids = hospital_index(hospital_id).search(text)
+    if not ids:
+        return queryset.none()
+    queryset = queryset.filter(pk__in=ids)
+    if ranked:
+        queryset = queryset.annotate(search_rank=Case(
+            *[When(pk=item_id, then=Value(position)) for position, item_id in enumerate(ids)],
+            output_field=IntegerField(),
+        )).order_by('search_rank')
+    return queryset
+
+
+def autocomplete(hospital_id, prefix, limit=10):
+    """[{id, name, sku, location}] of up to ``limit`` items whose name, then SKU, starts with ``prefix``."""
+    prefix = prefix.strip()
+    if not prefix:
+        return []
+    if not uses_database_search():
+        with _lock:
+            return hospital_index(hospital_id).complete(prefix, limit)
+
+    items = InventoryItem.objects.filter(hospital_id=hospital_id)
+    key = prefix.upper()
+    found = []
+    for field in ('name', 'sku'):
+        matches = items.annotate(key=Collate(Upper(field), 'C')) \
+            .filter(key__gte=key, key__lt=key + LAST) \
+            .exclude(id__in=[row['id'] for row in found]) \
+            .order_by('key', 'id').values(*FIELDS)[:limit - len(found)]
+        found.extend(matches)
+        if len(found) >= limit:
+            break
+    return found
+
+
+class InventorySearchFilter(BaseFilterBackend):
+    """``?search=`` through search_items; ranked by relevance unless ``?ordering=`` is given."""
+    search_param = api_settings.SEARCH_PARAM
+    ordering_param = api_settings.ORDERING_PARAM
+
+    def filter_queryset(self, request, queryset, view):
+        text = request.query_params.get(self.search_param, '').strip()
+        if not text:
+            return queryset
+        ranked = not request.query_params.get(self.ordering_param)
+        return search_items(queryset, view.kwargs['hospital_id'], text, ranked=ranked)
@@ -1,6 +1,7 @@
 from rest_framework import serializers
-from .models import InventoryItem, Category, Unit
+from .models import InventoryItem, Category, Unit, StockMovement
 from django.utils import timezone
+from qrcodes.views import qr_url
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -37,18 +38,14 @@ class InventoryItemSerializer(serializers.ModelSerializer):
     unit_id = serializers.PrimaryKeyRelatedField(
         queryset=Unit.objects.all(), source='unit', write_only=True, allow_null=True
     )
-    stock_level = serializers.SerializerMethodField()
+    qr_url = serializers.SerializerMethodField()
     expiry_status = serializers.SerializerMethodField()
     cost = serializers.FloatField()
     tax = serializers.FloatField(allow_null=True)
     
-    def get_stock_level(self,  obj):
-        if obj.quantity <= obj.reorder_level:
-            return 'Low'
-        elif obj.quantity <= obj.reorder_level * 2:
-            return 'Medium'
-        return 'High'
-    
+    def get_qr_url(self, obj):
+        return qr_url(obj, self.context.get('request'))
+
     def get_expiry_status(self, obj):
         if not obj.expiry_date:
             return 'N/A'
@@ -59,6 +56,12 @@ class InventoryItemSerializer(serializers.ModelSerializer):
             return 'Warning'
         return 'Safe'
     
+    def update(self, instance, validated_data):
+        instance = super().update(instance, validated_data)
+        # stock_level is computed by the database; unlike an INSERT, an UPDATE doesn't return it
+        instance.refresh_from_db(fields=['stock_level'])
+        return instance
+
     def validate(self, data):
         if data.get('expiry_date') and data['expiry_date'] < timezone.now().date():
             raise serializers.ValidationError({"expiry_date": "Expiry date must be in the future."})
@@ -75,7 +78,40 @@ class InventoryItemSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'hospital', 'name', 'category', 'category_id', 'quantity', 'unit', 'unit_id',
             'reorder_level', 'last_updated', 'expiry_date', 'location', 'sku', 'barcode',
-            'cost', 'tax', 'supplier', 'batch', 'description', 'qr_code',
+            'cost', 'tax', 'supplier', 'batch', 'description', 'qr_code', 'qr_url', 'qr_status',
             'stock_level', 'expiry_status'
         ]
-        read_only_fields = ['hospital', 'id', 'last_updated', 'qr_code', 'stock_level', 'expiry_status']
\ No newline at end of file
+        read_only_fields = ['hospital', 'id', 'last_updated', 'qr_code', 'qr_status', 'stock_level', 'expiry_status']
+
+
+class StockMovementSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = StockMovement
+        fields = ['id', 'item', 'kind', 'quantity', 'balance', 'related_item', 'reference', 'note',
+                  'performed_by', 'created_at']
+        read_only_fields = fields
+
+
+class StockMovementCreateSerializer(serializers.Serializer):
+    """A movement to record: quantity is positive, except for adjustments, which are signed."""
+    kind = serializers.ChoiceField(choices=StockMovement.KIND_CHOICES)
+    quantity = serializers.IntegerField()
+    to_item = serializers.IntegerField(required=False, help_text="Destination item of a transfer")
+    reference = serializers.CharField(max_length=100, required=False, allow_blank=True, default='')
+    note = serializers.CharField(max_length=255, required=False, allow_blank=True, default='')
+
+    def validate(self, data):
+        if data['kind'] == StockMovement.TRANSFER and not data.get('to_item'):
+            raise serializers.ValidationError({"to_item": "Transfers need a destination item."})
+        if not data['quantity'] or (data['kind'] != StockMovement.ADJUSTMENT and data['quantity'] < 0):
+            raise serializers.ValidationError({"quantity": "Quantity must be positive."})
+        return data
+
+
+class StockAsOfSerializer(serializers.ModelSerializer):
+    stock_as_of = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = InventoryItem
+        fields = ['id', 'name', 'sku', 'location', 'quantity', 'stock_as_of']
+        read_only_fields = fields
@@ -0,0 +1,45 @@
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from .ledger import movement, record_movements
+from .models import InventoryItem, StockMovement
+from .search import index_item, unindex_item, uses_database_search
+
+SEARCH_FIELDS = {'name', 'sku', 'location'}
+
+
+# Quantities set by a plain save (item forms, creation) are written to the
+# ledger here. F() movements and stock counts go through inventory.ledger,
+# which records them itself.
+
+@receiver(post_init, sender=InventoryItem)
+def remember_ledger_quantity(sender, instance, **kwargs):
+    instance._ledger_quantity = instance.__dict__.get('quantity')
+
+
+@receiver(post_save, sender=InventoryItem)
+def record_saved_quantity(sender, instance, created, **kwargs):
+    previous = 0 if created else instance._ledger_quantity
+    quantity = instance.__dict__.get('quantity')
+    if previous is not None and quantity is not None and previous != quantity:
+        kind = StockMovement.RECEIPT if created else StockMovement.ADJUSTMENT
+        record_movements([movement(instance, kind, previous, quantity, instance.last_updated,
+                                   note='Opening stock' if created else '')])
+    instance._ledger_quantity = quantity
+
+
+# --- In-process search index (databases without full-text search) ---
+
+@receiver(post_save, sender=InventoryItem)
+def reindex_item(sender, instance, update_fields=None, **kwargs):
+    if uses_database_search() or (update_fields is not None and not SEARCH_FIELDS & set(update_fields)):
+        return
+    fields = (instance.hospital_id, instance.pk, instance.name, instance.sku, instance.location)
+    transaction.on_commit(lambda: index_item(*fields))
+
+
+@receiver(post_delete, sender=InventoryItem)
+def unindex_deleted_item(sender, instance, **kwargs):
+    if not uses_database_search():
+        hospital_id, item_id = instance.hospital_id, instance.pk
+        transaction.on_commit(lambda: unindex_item(hospital_id, item_id))
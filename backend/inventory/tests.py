@@ -1,3 +1,338 @@
-from django.test import TestCase
+import csv
+import io
+import tempfile
+from datetime import date, datetime, timedelta
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.urls import reverse
+from rest_framework.test import APIClient
+from hospitals.testing import create_hospital, create_user
+from dashboard.models import ActivityEvent, Alert, MonthlyChartCounter
+from suppliers.models import Supplier
+from .ledger import move_stock, with_stock_as_of
+from .search import clear_indexes
+from .models import InventoryItem, Category, Unit, StockCheckpoint, StockMovement
 
-# Create your tests here.
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), QR_WORKER='command')
+class InventoryExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        cls.hospital = create_hospital(cls.user)
+        category = Category.objects.create(hospital=cls.hospital, name='Consumables')
+        unit = Unit.objects.create(hospital=cls.hospital, name='Box')
+        supplier = Supplier.objects.create(hospital=cls.hospital, name='MedSupply')
+        for i, (quantity, location) in enumerate([(1, 'Store A'), (5, 'Store A'), (20, 'Store B')]):
+            InventoryItem.objects.create(
+                hospital=cls.hospital, name=f'Gloves {i}', sku=f'SKU-{i}', quantity=quantity, reorder_level=3,
+                location=location, category=category, unit=unit, supplier=supplier,
+                expiry_date=date(2030, 1, i + 1) if i else None,
+            )
+
+    def setUp(self):
+        clear_indexes()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def export(self, fmt=None, **params):
+        if fmt:
+            url = reverse('inventory-export-format', kwargs={'hospital_id': self.hospital.id, 'fmt': fmt})
+        else:
+            url = reverse('inventory-export', kwargs={'hospital_id': self.hospital.id})
+        return self.client.get(url, params)
+
+    def test_csv_streams_one_query(self):
+        response = self.export()
+        with self.assertNumQueries(1):
+            body = b''.join(response.streaming_content).decode()
+        rows = list(csv.reader(io.StringIO(body)))
+        self.assertEqual(rows[0][:6], ['ID', 'Name', 'Category', 'Quantity', 'Unit', 'Stock Level'])
+        self.assertEqual(
+            [(row[1], row[2], row[4], row[5], row[6], row[12]) for row in rows[1:]],
+            [
+                ('Gloves 0', 'Consumables', 'Box', 'Low', 'N/A', 'MedSupply'),
+                ('Gloves 1', 'Consumables', 'Box', 'Medium', '2030-01-02', 'MedSupply'),
+                ('Gloves 2', 'Consumables', 'Box', 'High', '2030-01-03', 'MedSupply'),
+            ],
+        )
+
+    def test_uses_list_filters(self):
+        def names(**params):
+            body = b''.join(self.export(**params).streaming_content).decode()
+            return [row[1] for row in list(csv.reader(io.StringIO(body)))[1:]]
+
+        self.assertEqual(names(location='Store A', ordering='-quantity'), ['Gloves 1', 'Gloves 0'])
+        self.assertEqual(names(stock_level='High'), ['Gloves 2'])
+        self.assertEqual(names(search='SKU-1'), ['Gloves 1'])
+        self.assertEqual(names(expiry_soon=36500), ['Gloves 1', 'Gloves 2'])
+
+    def test_invalid_expiry_soon(self):
+        list_url = reverse('inventory-list-create', kwargs={'hospital_id': self.hospital.id})
+        for value in ('x', '-1', '99999999'):
+            self.assertEqual(self.export(expiry_soon=value).status_code, 400)
+            self.assertEqual(self.client.get(list_url, {'expiry_soon': value}).status_code, 400)
+
+    def test_xlsx(self):
+        response = self.export('xlsx', stock_level='Low')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('inventory_export_', response['Content-Disposition'])
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'PK'))
+        self.assertEqual(self.export('pdf').status_code, 404)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), QR_WORKER='command')
+class StockLevelTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        cls.hospital = create_hospital(cls.user)
+        cls.item = InventoryItem.objects.create(hospital=cls.hospital, name='Gloves', sku='SKU-1', quantity=10, reorder_level=3)
+
+    def level(self):
+        return InventoryItem.objects.values_list('stock_level', flat=True).get(pk=self.item.pk)
+
+    def test_follows_every_write_path(self):
+        self.assertEqual(self.level(), 'High')
+        InventoryItem.objects.filter(pk=self.item.pk).update(quantity=5)
+        self.assertEqual(self.level(), 'Medium')
+        item = InventoryItem.objects.get(pk=self.item.pk)
+        item.reorder_level = 5
+        InventoryItem.objects.bulk_update([item], ['reorder_level'])
+        self.assertEqual(self.level(), 'Low')
+        item.quantity = 11
+        item.save()
+        self.assertEqual(self.level(), 'High')
+
+    def test_write_responses_carry_the_new_level(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = reverse('inventory-detail', kwargs={'hospital_id': self.hospital.id, 'id': self.item.id})
+        response = client.patch(url, {'quantity': 1}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['stock_level'], 'Low')
+        self.assertEqual(client.patch(url, {'quantity': 100}, format='json').data['stock_level'], 'High')
+
+        url = reverse('inventory-list-create', kwargs={'hospital_id': self.hospital.id})
+        response = client.post(url, {
+            'name': 'Masks', 'sku': 'SKU-2', 'quantity': 2, 'reorder_level': 3, 'category_id': None,
+            'unit_id': None, 'cost': 1.5, 'tax': 0,
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['stock_level'], 'Low')
+
+    def test_low_stock_filter_reads_index(self):
+        plan = InventoryItem.objects.filter(hospital=self.hospital, stock_level='Low').values('id').explain()
+        self.assertRegex(plan, 'item_low_stock_idx|item_hospital_stock_idx')
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = reverse('inventory-list-create', kwargs={'hospital_id': self.hospital.id})
+        self.assertEqual(client.get(url, {'stock_level': 'Low'}).data['count'], 0)
+        response = client.get(url, {'stock_level': 'High'})
+        self.assertEqual(response.data['results'][0]['stock_level'], 'High')
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), QR_WORKER='command')
+class BulkQuantityUpdateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(is_staff=True)
+        cls.hospital = create_hospital(cls.user)
+        cls.items = [
+            InventoryItem.objects.create(hospital=cls.hospital, name=f'Gloves {i}', sku=f'SKU-{i}', quantity=10, reorder_level=3)
+            for i in range(6)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def bulk(self, changes, item_ids=None):
+        url = reverse('inventory-bulk', kwargs={'hospital_id': self.hospital.id})
+        ids = item_ids if item_ids is not None else [item.id for item in self.items]
+        return self.client.patch(url, {'action': 'update_quantity', 'item_ids': ids, 'quantity_changes': changes},
+                                 format='json')
+
+    def quantities(self):
+        return list(InventoryItem.objects.order_by('id').values_list('quantity', flat=True))
+
+    def test_result_per_item(self):
+        first, second, third, fourth = self.items[:4]
+        response = self.bulk({
+            str(first.id): 2,
+            str(second.id): {'quantity': 7, 'expected': 10},
+            str(third.id): {'quantity': 8, 'expected': 9},
+            str(fourth.id): 10,
+            'abc': 1,
+            str(first.id + 100): 1,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['updated'], response.data['conflicts']), (2, 1))
+        self.assertEqual(response.data['results'], {
+            str(first.id): {'status': 'updated', 'quantity': 2},
+            str(second.id): {'status': 'updated', 'quantity': 7},
+            str(third.id): {'status': 'conflict', 'quantity': 10},
+            str(fourth.id): {'status': 'unchanged', 'quantity': 10},
+            'abc': {'status': 'invalid'},
+            str(first.id + 100): {'status': 'not_found'},
+        })
+        self.assertEqual(self.quantities(), [2, 7, 10, 10, 10, 10])
+
+        # The side effects of a save: activity, low-stock alert, stock level
+        self.assertEqual(
+            sorted(ActivityEvent.objects.filter(kind='inventory_adjusted').values_list('action', flat=True)),
+            ['adjusted stock (10 → 2) of', 'adjusted stock (10 → 7) of'],
+        )
+        self.assertEqual(list(Alert.objects.filter(is_open=True).values_list('target_id', flat=True)), [first.id])
+        self.assertEqual(InventoryItem.objects.get(pk=first.id).stock_level, 'Low')
+
+    def test_out_of_range_quantity_is_invalid(self):
+        first, second = self.items[:2]
+        response = self.bulk({str(first.id): 2147483648, str(second.id): 2147483647})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][str(first.id)], {'status': 'invalid'})
+        self.assertEqual(response.data['results'][str(second.id)]['status'], 'updated')
+
+    def test_queries_do_not_grow_with_items(self):
+        def queries(quantity):
+            with CaptureQueriesContext(connection) as context:
+                self.bulk({str(item.id): quantity for item in self.items[:count]})
+            return len(context)
+
+        count = 6
+        queries(15)  # creates this month's chart counters
+        count = 2
+        few = queries(20)
+        count = 6
+        self.assertEqual(queries(30), few)
+        self.assertEqual(self.quantities(), [30] * 6)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), QR_WORKER='command')
+class StockLedgerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(is_staff=True)
+        cls.hospital = create_hospital(cls.user)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def item(self, quantity, sku='SKU-1'):
+        return InventoryItem.objects.create(hospital=self.hospital, name=f'Gloves {sku}', sku=sku, quantity=quantity)
+
+    def move(self, item, **data):
+        url = reverse('inventory-movements', kwargs={'hospital_id': self.hospital.id, 'id': item.id})
+        return self.client.post(url, data, format='json')
+
+    def quantity(self, item):
+        return InventoryItem.objects.values_list('quantity', flat=True).get(pk=item.pk)
+
+    def test_every_change_is_in_the_ledger(self):
+        store, ward = self.item(10), self.item(0, sku='SKU-2')
+        self.assertEqual(self.move(store, kind='receipt', quantity=5, reference='PO-1').data[0]['balance'], 15)
+        response = self.move(store, kind='issue', quantity=20)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.quantity(store), 15)
+        self.move(store, kind='expiry', quantity=2)
+        response = self.move(store, kind='transfer', quantity=4, to_item=ward.id)
+        self.assertEqual([(row['item'], row['quantity'], row['related_item']) for row in response.data],
+                         [(store.id, -4, ward.id), (ward.id, 4, store.id)])
+        self.assertEqual(self.move(store, kind='issue', quantity=-1).status_code, 400)
+
+        url = reverse('inventory-detail', kwargs={'hospital_id': self.hospital.id, 'id': store.id})
+        self.client.patch(url, {'quantity': 8}, format='json')
+
+        self.assertEqual((self.quantity(store), self.quantity(ward)), (8, 4))
+        self.assertEqual(
+            list(StockMovement.objects.filter(item=store).order_by('id').values_list('kind', 'quantity', 'balance')),
+            [('receipt', 10, 10), ('receipt', 5, 15), ('expiry', -2, 13), ('transfer', -4, 9), ('adjustment', -1, 8)],
+        )
+        listed = self.client.get(reverse('inventory-movements', kwargs={'hospital_id': self.hospital.id, 'id': store.id}))
+        self.assertEqual(listed.data['count'], 5)
+        self.assertEqual(listed.data['results'][0]['kind'], 'adjustment')
+
+        self.assertIn('wrote off 2 expired', ActivityEvent.objects.values_list('action', flat=True))
+        counters = dict(MonthlyChartCounter.objects.filter(
+            metric__in=[MonthlyChartCounter.STOCK_IN, MonthlyChartCounter.STOCK_OUT]
+        ).values_list('metric', 'value'))
+        self.assertEqual(counters, {'stock_in': 19, 'stock_out': 7})
+
+    def test_stock_as_of_starts_from_checkpoint(self):
+        item = self.item(0)
+        start = timezone.make_aware(datetime(2026, 1, 1, 12))
+        move_stock(item, StockMovement.RECEIPT, 10, now=start)
+        move_stock(item, StockMovement.ISSUE, 3, now=start + timedelta(days=4))
+        move_stock(item, StockMovement.RECEIPT, 5, now=start + timedelta(days=9))
+
+        def stock(days):
+            return with_stock_as_of(InventoryItem.objects.filter(pk=item.pk), start + timedelta(days=days)) \
+                .values_list('stock_as_of', flat=True).get()
+
+        self.assertEqual([stock(-1), stock(2), stock(5), stock(10)], [0, 10, 7, 12])
+        # Later reads add only the rows after the checkpoint, whatever came before it
+        StockCheckpoint.objects.create(item=item, as_of=start + timedelta(days=6), quantity=100)
+        self.assertEqual([stock(5), stock(7), stock(10)], [7, 100, 105])
+
+        url = reverse('inventory-stock-as-of', kwargs={'hospital_id': self.hospital.id})
+        response = self.client.get(url, {'as_of': '2026-01-03'})
+        self.assertEqual([(row['id'], row['quantity'], row['stock_as_of']) for row in response.data['results']],
+                         [(item.id, 12, 10)])
+        for value in ('yesterday', '2026-13-01', '2026-02-30', '2026-10-17T25:00'):
+            self.assertEqual(self.client.get(url, {'as_of': value}).status_code, 400)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), QR_WORKER='command')
+class InventorySearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        cls.hospital = create_hospital(cls.user)
+        cls.gloves, cls.masks, cls.gauze = [
+            InventoryItem.objects.create(hospital=cls.hospital, name=name, sku=sku, location=location)
+            for name, sku, location in [
+                ('Nitrile Gloves', 'GLV-001', 'Store A'),
+                ('Surgical Masks', 'MSK-002', 'Store B'),
+                ('Gauze Pads', 'GZ-003', 'Ward Gloves Cart'),
+            ]
+        ]
+
+    def setUp(self):
+        clear_indexes()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def search(self, text, **params):
+        url = reverse('inventory-list-create', kwargs={'hospital_id': self.hospital.id})
+        return [row['name'] for row in self.client.get(url, {'search': text, **params}).data['results']]
+
+    def complete(self, prefix, **params):
+        url = reverse('inventory-autocomplete', kwargs={'hospital_id': self.hospital.id})
+        return [row['name'] for row in self.client.get(url, {'q': prefix, **params}).data['results']]
+
+    def test_prefix_and_typo_matches(self):
+        self.assertEqual(self.search('nitr glo'), ['Nitrile Gloves'])
+        self.assertEqual(self.search('glovse'), ['Nitrile Gloves', 'Gauze Pads'])
+        self.assertEqual(self.search('gloves', ordering='-name'), ['Nitrile Gloves', 'Gauze Pads'])
+        self.assertEqual(self.search('msk 002'), ['Surgical Masks'])
+        self.assertEqual(self.search('store c'), [])
+
+    def test_autocomplete(self):
+        self.assertEqual(self.complete('g'), ['Gauze Pads', 'Nitrile Gloves'])
+        self.assertEqual(self.complete('G', limit=1), ['Gauze Pads'])
+        self.assertEqual(self.complete('su'), ['Surgical Masks'])
+        self.assertEqual(self.complete(''), [])
+
+    def test_index_follows_saves(self):
+        self.assertEqual(self.search('mask'), ['Surgical Masks'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.masks.name = 'Face Shields'
+            self.masks.save()
+            self.gauze.delete()
+        self.assertEqual(self.search('mask'), [])
+        self.assertEqual(self.search('shield'), ['Face Shields'])
+        self.assertEqual(self.complete('g'), ['Nitrile Gloves'])
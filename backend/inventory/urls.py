@@ -4,6 +4,9 @@ from .views import (
     InventoryItemDetailView,
     InventoryBulkActionView,
     InventoryExportView,
+    StockMovementListView,
+    InventoryStockAsOfView,
+    InventoryAutocompleteView,
     CategoryListView,
     UnitListView,
     InventoryCheckView,
@@ -14,6 +17,10 @@ urlpatterns = [
     path('<int:hospital_id>/inventory/<int:id>/', InventoryItemDetailView.as_view(), name='inventory-detail'),
     path('<int:hospital_id>/inventory/bulk/', InventoryBulkActionView.as_view(), name='inventory-bulk'),
     path('<int:hospital_id>/inventory/export/', InventoryExportView.as_view(), name='inventory-export'),
+    path('<int:hospital_id>/inventory/export.<str:fmt>', InventoryExportView.as_view(), name='inventory-export-format'),
+    path('<int:hospital_id>/inventory/<int:id>/movements/', StockMovementListView.as_view(), name='inventory-movements'),
+    path('<int:hospital_id>/inventory/stock/', InventoryStockAsOfView.as_view(), name='inventory-stock-as-of'),
+    path('<int:hospital_id>/inventory/autocomplete/', InventoryAutocompleteView.as_view(), name='inventory-autocomplete'),
     path('<int:hospital_id>/categories/', CategoryListView.as_view(), name='category-list'),
     path('<int:hospital_id>/units/', UnitListView.as_view(), name='unit-list'),
     path('<int:hospital_id>/inventory/check/', InventoryCheckView.as_view(), name='inventory-check'),
@@ -2,48 +2,74 @@ from rest_framework import generics, permissions, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from hospitals.models import Hospital
-from .models import InventoryItem, Category, Unit
-from .serializers import InventoryItemSerializer, CategorySerializer, UnitSerializer
+from .models import InventoryItem, Category, Unit, StockMovement
+from .serializers import (
+    InventoryItemSerializer, CategorySerializer, UnitSerializer,
+    StockMovementSerializer, StockMovementCreateSerializer, StockAsOfSerializer,
+)
+from .ledger import InsufficientStock, move_stock, transfer_stock, with_stock_as_of
+from .search import InventorySearchFilter, autocomplete
+from .quantities import CONFLICT as QUANTITY_CONFLICT, UPDATED as QUANTITY_UPDATED, update_quantities
+from .export import FORMATS as EXPORT_FORMATS, export_rows, stream_csv, write_xlsx, xlsxwriter
+from dashboard.models import Alert
+from qrcodes.worker import INVENTORY as QR_INVENTORY, enqueue as enqueue_qr
 from hospitals.permissions import IsInventoryManager
+from hospitals.params import positive_int
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.filters import OrderingFilter, SearchFilter
-from django.db.models import Q, F
-import csv
-from django.http import HttpResponse
-from datetime import datetime, timedelta
+from rest_framework.filters import OrderingFilter
+from django.conf import settings
+from django.http import FileResponse, Http404, StreamingHttpResponse
+from django.urls import reverse
+from collections import Counter
+from datetime import datetime, time, timedelta
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
 from rest_framework.pagination import PageNumberPagination
 
+MAX_EXPIRY_DAYS = 36500  # ?expiry_soon= beyond this would overflow the date
+
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 10
     page_size_query_param = 'limit'
     max_page_size = 50
     
-class InventoryItemListCreateView(generics.ListCreateAPIView):
-    serializer_class = InventoryItemSerializer
-    permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, OrderingFilter, SearchFilter]
+class InventoryItemQueryMixin:
+    """Hospital scoping and the list filters (search, ordering, stock level, expiry, alert)."""
+    filter_backends = [DjangoFilterBackend, OrderingFilter, InventorySearchFilter]
     filterset_fields = ['category__id', 'location']
     ordering_fields = ['id', 'name', 'quantity', 'expiry_date', 'location']
     ordering = ['id']
-    search_fields = ['name', 'sku', 'location']
-    pagination_class =StandardResultsSetPagination
     
     def get_queryset(self):
         hospital_id = self.kwargs['hospital_id']
         queryset = InventoryItem.objects.filter(hospital_id=hospital_id)
         stock_level = self.request.query_params.get('stock_level')
         expiry_soon = self.request.query_params.get('expiry_soon')
-        if stock_level:
-            if stock_level == 'Low':
-                queryset = queryset.filter(quantity__lte=F('reorder_level'))
-            elif stock_level == 'Medium':
-                queryset = queryset.filter(quantity__lte=F('reorder_level') * 2, quantity__gt=F('reorder_level'))
-            elif stock_level == 'High':
-                queryset = queryset.filter(quantity__gt=F('reorder_level') * 2)
+        alert = self.request.query_params.get('alert')
+        if stock_level in ('Low', 'Medium', 'High'):
+            queryset = queryset.filter(stock_level=stock_level)
         if expiry_soon:
-            cutoff = datetime.now().date() + timedelta(days=int(expiry_soon))
+            try:
+                days = int(expiry_soon)
+                if not 0 <= days <= MAX_EXPIRY_DAYS:
+                    raise ValueError
+            except ValueError:
+                raise ValidationError({"expiry_soon": f"Expected a number of days from 0 to {MAX_EXPIRY_DAYS}."})
+            cutoff = datetime.now().date() + timedelta(days=days)
             queryset = queryset.filter(expiry_date__lte=cutoff, expiry_date__isnull=False)
+        if alert:
+            # Items with an open alert of this type (low_stock, expiring), read from the alert index
+            queryset = queryset.filter(id__in=Alert.objects.filter(
+                hospital_id=hospital_id, is_open=True, type=alert, target_type='inventoryitem'
+            ).values('target_id'))
         return queryset
+
+
+class InventoryItemListCreateView(InventoryItemQueryMixin, generics.ListCreateAPIView):
+    serializer_class = InventoryItemSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class =StandardResultsSetPagination
     
     def perform_create(self, serializer):
         serializer.save(hospital_id=self.kwargs['hospital_id'])
@@ -64,63 +90,134 @@ class InventoryBulkActionView(APIView):
         items_ids = request.data.get('item_ids', [])
         action = request.data.get('action')
         items = InventoryItem.objects.filter(hospital_id=hospital_id, id__in=items_ids)
-        if not items:
+        if not items.exists():
             return Response({"error": "No items selected"}, status=status.HTTP_400_BAD_REQUEST)
         if action == 'delete':
             items.delete()
             return Response({"message": "Items deleted"}, status=status.HTTP_200_OK)
         elif action == 'update_quantity':
+            # {id: quantity} or {id: {"quantity": q, "expected": last seen}}; stale expectations conflict
             quantity_changes = request.data.get('quantity_changes', {})
-            for item in items:
-                new_quantity = quantity_changes.get(str(item.id))
-                if new_quantity is not None and int(new_quantity) >= 0:
-                    item.quantity = int(new_quantity)
-                    item.save()
-            return Response({"message": "Quantities updated"}, status=status.HTTP_200_OK)
+            if not isinstance(quantity_changes, dict):
+                return Response({"error": "quantity_changes must be an object"}, status=status.HTTP_400_BAD_REQUEST)
+            results = update_quantities(items, quantity_changes, actor=getattr(request.user, 'employee_profile', None))
+            counts = Counter(result['status'] for result in results.values())
+            return Response({
+                "message": "Quantities updated",
+                "updated": counts[QUANTITY_UPDATED],
+                "conflicts": counts[QUANTITY_CONFLICT],
+                "results": results,
+            }, status=status.HTTP_200_OK)
         elif action == 'generate_qr':
-            for item in items:
-                if item.qr_code:
-                    item.qr_code.delete()
-                item.generate_qr_code()
-                item.save()
-            return Response({"message": "QR codes generated"}, status=status.HTTP_200_OK)
+            ids = list(items.values_list('id', flat=True))
+            if not settings.QR_STORE_IMAGES:
+                sheet = reverse('qr-sheet', kwargs={'hospital_id': hospital_id, 'fmt': 'pdf'})
+                return Response({
+                    "message": "QR codes are rendered on demand",
+                    "sheet": request.build_absolute_uri(f"{sheet}?target=inventory&ids={','.join(map(str, ids))}"),
+                }, status=status.HTTP_200_OK)
+            # Rendered by the QR worker; items whose code is already current are skipped there
+            queued = enqueue_qr(QR_INVENTORY, ids, mark_pending=True)
+            return Response({"message": "QR codes queued", "queued": queued}, status=status.HTTP_202_ACCEPTED)
         return Response({"error": "Invalid action"}, status=status.HTTP_400_BAD_REQUEST)
     
-class InventoryExportView(APIView):
+class InventoryExportView(InventoryItemQueryMixin, generics.GenericAPIView):
+    """
+    Streams the items matching the list view's filters as export/ (CSV) or
+    export.xlsx.
+    """
     permission_classes = [permissions.IsAuthenticated]
 
-    def get(self, request, hospital_id):
-        items = InventoryItem.objects.filter(hospital_id=hospital_id)
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="inventory_export_{hospital_id}.csv"'
-        writer = csv.writer(response)
-        writer.writerow([
-            'ID', 'Name', 'Category', 'Quantity', 'Unit', 'Stock Level', 'Expiry Date',
-            'Location', 'SKU', 'Barcode', 'Cost', 'Tax', 'Supplier', 'Batch'
-        ])
-        for item in items:
-            stock_level = (
-                'Low' if item.quantity <= item.reorder_level else
-                'Medium' if item.quantity <= item.reorder_level * 2 else 'High'
-            )
-            writer.writerow([
-                item.id,
-                item.name,
-                item.category.name if item.category else '',
-                item.quantity,
-                item.unit.name if item.unit else '',
-                stock_level,
-                item.expiry_date or 'N/A',
-                item.location,
-                item.sku,
-                item.barcode,
-                item.cost,
-                item.tax,
-                item.supplier,
-                item.batch
-            ])
+    def get(self, request, hospital_id, fmt='csv'):
+        if fmt not in EXPORT_FORMATS:
+            raise Http404
+        rows = export_rows(self.filter_queryset(self.get_queryset()))
+        filename = f"inventory_export_{hospital_id}.{fmt}"
+        if fmt == 'xlsx':
+            if xlsxwriter is None:
+                return Response({"error": "XLSX export is not available on this server"},
+                                status=status.HTTP_501_NOT_IMPLEMENTED)
+            return FileResponse(write_xlsx(rows), as_attachment=True, filename=filename,
+                                content_type=EXPORT_FORMATS[fmt])
+        response = StreamingHttpResponse(stream_csv(rows), content_type=EXPORT_FORMATS[fmt])
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
         return response
 
+class StockMovementListView(generics.ListAPIView):
+    """
+    An item's ledger, newest first (GET), and recording a receipt, issue,
+    adjustment, transfer or expiry write-off against it (POST).
+    """
+    serializer_class = StockMovementSerializer
+    permission_classes = [permissions.IsAuthenticated, IsInventoryManager]
+    pagination_class = StandardResultsSetPagination
+
+    def get_item(self, item_id):
+        return generics.get_object_or_404(
+            InventoryItem.objects.only('id', 'hospital_id', 'name'), hospital_id=self.kwargs['hospital_id'], id=item_id
+        )
+
+    def get_queryset(self):
+        return StockMovement.objects.filter(hospital_id=self.kwargs['hospital_id'], item_id=self.kwargs['id'])
+
+    def post(self, request, hospital_id, id):
+        item = self.get_item(id)
+        serializer = StockMovementCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        actor = getattr(request.user, 'employee_profile', None)
+        try:
+            if data['kind'] == StockMovement.TRANSFER:
+                movements = transfer_stock(item, self.get_item(data['to_item']), data['quantity'], actor=actor,
+                                           reference=data['reference'], note=data['note'])
+            else:
+                movements = [move_stock(item, data['kind'], data['quantity'], actor=actor,
+                                        reference=data['reference'], note=data['note'])]
+        except InsufficientStock as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_409_CONFLICT)
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(StockMovementSerializer(movements, many=True).data, status=status.HTTP_201_CREATED)
+
+class InventoryStockAsOfView(InventoryItemQueryMixin, generics.ListAPIView):
+    """
+    Item quantities at ``?as_of=`` (a datetime, or a date meaning the end of
+    that day), read from stock checkpoints and the ledger. Takes the list filters.
+    """
+    serializer_class = StockAsOfSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = StandardResultsSetPagination
+
+    def as_of(self):
+        value = self.request.query_params.get('as_of', '')
+        invalid = ValidationError({"as_of": "Expected a date (YYYY-MM-DD) or an ISO datetime."})
+        try:
+            # Both return None for a malformed value and raise for an impossible one
+            moment = parse_datetime(value)
+            if moment is None:
+                day = parse_date(value) if value else timezone.localdate()
+                if day is None:
+                    raise invalid
+                moment = datetime.combine(day, time.max)
+        except ValueError:
+            raise invalid
+        return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+
+    def get_queryset(self):
+        items = super().get_queryset().only('id', 'hospital_id', 'name', 'sku', 'location', 'quantity')
+        return with_stock_as_of(items, self.as_of())
+
+class InventoryAutocompleteView(APIView):
+    """The first ``?limit=`` (default 10, at most 50) items whose name, then SKU, starts with ``?q=``."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, hospital_id):
+        try:
+            limit = positive_int(request.query_params.get('limit', 10), cutoff=50)
+        except ValueError:
+            return Response({"error": "limit must be a positive integer"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"results": autocomplete(hospital_id, request.query_params.get('q', ''), limit)})
+
 class CategoryListView(generics.ListCreateAPIView):
     serializer_class = CategorySerializer
     permission_classes = [permissions.IsAuthenticated]
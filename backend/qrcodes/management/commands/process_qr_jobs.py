@@ -0,0 +1,35 @@
+import time
+from django.core.management.base import BaseCommand
+from device.models import Device
+from inventory.models import InventoryItem
+from qrcodes.models import QRJob
+from qrcodes.worker import DEVICE, INVENTORY, POLL_INTERVAL, enqueue, run_pending
+
+
+class Command(BaseCommand):
+    help = 'Render queued QR codes (use with QR_WORKER=command, or to drain the queue by hand)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the queue and exit instead of polling')
+        parser.add_argument('--interval', type=float, default=POLL_INTERVAL,
+                            help='Seconds to sleep between polls when the queue is empty')
+        parser.add_argument('--backfill', action='store_true',
+                            help='First queue every device and inventory item without a current QR code')
+
+    def handle(self, *args, **options):
+        if options['backfill']:
+            queued = 0
+            for target_type, model in ((DEVICE, Device), (INVENTORY, InventoryItem)):
+                ids = model.objects.exclude(qr_status='ready', qr_hash__gt='').values_list('id', flat=True)
+                queued += enqueue(target_type, ids.iterator(), mark_pending=True)
+            self.stdout.write(f'Queued {queued} QR renders')
+
+        while True:
+            handled = run_pending()
+            if handled:
+                self.stdout.write(f'Rendered {handled} QR jobs')
+            if options['once']:
+                failed = QRJob.objects.filter(status=QRJob.FAILED).count()
+                self.stdout.write(self.style.SUCCESS(f'Queue drained ({failed} failed jobs kept)'))
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,35 @@
+from django.db import models
+from django.db.models import Q
+
+
+class QRJob(models.Model):
+    """
+    A queued QR render for a device or inventory item. At most one job per
+    target is pending at a time; completed jobs are deleted, failed ones are
+    kept with their error.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (RUNNING, 'Running'), (FAILED, 'Failed')]
+
+    target_type = models.CharField(max_length=20)
+    target_id = models.PositiveBigIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['target_type', 'target_id'], condition=Q(status='pending'), name='unique_pending_qr_job'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'id'], name='qrjob_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"QR {self.target_type} #{self.target_id} ({self.status})"
@@ -0,0 +1,177 @@
+import hashlib
+import math
+import os
+import threading
+import uuid
+from io import BytesIO
+import qrcode
+from qrcode.image.svg import SvgPathImage
+from PIL import Image, ImageDraw, ImageFont
+from django.conf import settings
+
+FORMATS = {'png': 'image/png', 'svg': 'image/svg+xml'}
+SHEET_FORMATS = {'png': 'image/png', 'pdf': 'application/pdf'}
+
+BOX_SIZE = 10
+BORDER = 4
+
+# Printable sheets: A4 at 150 dpi, labels laid out in a grid
+SHEET_PAGE = (1240, 1754)
+SHEET_MARGIN = 40
+SHEET_COLUMNS = 5
+SHEET_BOX_SIZE = 4
+CAPTION_HEIGHT = 24
+
+
+def _qr(payload, box_size, border=BORDER):
+    qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_L, box_size=box_size, border=border)
+    qr.add_data(payload)
+    qr.make(fit=True)
+    return qr
+
+
+def render(payload, fmt, box_size=BOX_SIZE):
+    """Encode payload as a PNG or SVG document and return its bytes."""
+    qr = _qr(payload, box_size)
+    buffer = BytesIO()
+    if fmt == 'svg':
+        qr.make_image(image_factory=SvgPathImage).save(buffer)
+    else:
+        qr.make_image(fill_color="black", back_color="white").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def render_sheet(labels, fmt):
+    """
+    Compose (payload, caption) labels into printable pages in one pass: a
+    multi-page PDF, or a single PNG as tall as the labels need.
+    """
+    cell_width = (SHEET_PAGE[0] - 2 * SHEET_MARGIN) // SHEET_COLUMNS
+    font = ImageFont.load_default()
+    cells = []
+    for payload, caption in labels:
+        image = _qr(payload, SHEET_BOX_SIZE).make_image(fill_color="black", back_color="white").get_image()
+        size = min(image.width, cell_width)
+        cells.append((image.convert('L').resize((size, size)), caption or ''))
+    cell_height = max((image.height for image, _ in cells), default=0) + CAPTION_HEIGHT
+    rows = math.ceil(len(cells) / SHEET_COLUMNS)
+
+    if fmt == 'pdf':
+        rows_per_page = max(1, (SHEET_PAGE[1] - 2 * SHEET_MARGIN) // cell_height)
+        per_page = rows_per_page * SHEET_COLUMNS
+        pages = [_compose(cells[i:i + per_page], cell_width, cell_height, SHEET_PAGE[1], font)
+                 for i in range(0, len(cells), per_page)] or [Image.new('L', SHEET_PAGE, 255)]
+        buffer = BytesIO()
+        pages[0].save(buffer, format='PDF', save_all=True, append_images=pages[1:], resolution=150)
+        return buffer.getvalue()
+
+    page = _compose(cells, cell_width, cell_height, rows * cell_height + 2 * SHEET_MARGIN, font)
+    buffer = BytesIO()
+    page.save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+
+def _compose(cells, cell_width, cell_height, page_height, font):
+    page = Image.new('L', (SHEET_PAGE[0], page_height), 255)
+    draw = ImageDraw.Draw(page)
+    for index, (image, caption) in enumerate(cells):
+        row, column = divmod(index, SHEET_COLUMNS)
+        x = SHEET_MARGIN + column * cell_width
+        y = SHEET_MARGIN + row * cell_height
+        page.paste(image, (x + (cell_width - image.width) // 2, y))
+        text_width = draw.textlength(caption, font=font)
+        draw.text((x + max(0, (cell_width - text_width) // 2), y + image.height + 4), caption, fill=0, font=font)
+    return page
+
+
+def content_key(*parts):
+    """sha256 over everything that determines a rendering's bytes."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class QRDiskCache:
+    """
+    Content-addressed file cache for renderings, stored at
+    <root>/<key[:2]>/<key>.<ext>. Hits bump the file's mtime; once the total
+    size passes max_bytes the least recently used files are evicted down to
+    90% of the cap. The size is tracked per process and re-measured on every
+    eviction, so several workers can share one directory.
+    """
+
+    def __init__(self, root, max_bytes):
+        self.root = str(root)
+        self.max_bytes = max_bytes
+        self.size = None
+        self.lock = threading.Lock()
+
+    def path(self, key, ext):
+        return os.path.join(self.root, key[:2], f"{key}.{ext}")
+
+    def get_or_render(self, key, ext, build):
+        path = self.path(key, ext)
+        try:
+            with open(path, 'rb') as handle:
+                data = handle.read()
+            os.utime(path)
+            return data
+        except FileNotFoundError:
+            pass
+        data = build()
+        self.store(path, data)
+        return data
+
+    def store(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(temporary, 'wb') as handle:
+            handle.write(data)
+        os.replace(temporary, path)
+        with self.lock:
+            if self.size is None:
+                self.size = sum(size for _, size, _ in self._files())
+            else:
+                self.size += len(data)
+            if self.size > self.max_bytes:
+                self.evict()
+
+    def evict(self):
+        files = sorted(self._files())
+        total = sum(size for _, size, _ in files)
+        target = self.max_bytes * 0.9
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self.size = total
+
+    def _files(self):
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield stat.st_mtime, stat.st_size, path
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_disk_cache():
+    root = getattr(settings, 'QR_CACHE_DIR', os.path.join(settings.BASE_DIR, 'cache', 'qr'))
+    max_bytes = getattr(settings, 'QR_CACHE_MAX_BYTES', 256 * 1024 * 1024)
+    with _caches_lock:
+        key = (str(root), max_bytes)
+        if key not in _caches:
+            _caches[key] = QRDiskCache(root, max_bytes)
+        return _caches[key]
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.db.models.signals import pre_save, post_save
+from django.dispatch import receiver
+from device.models import Device
+from inventory.models import InventoryItem
+from .worker import TARGETS, TARGET_TYPES, enqueue, payload_hash
+
+
+@receiver(pre_save, sender=Device)
+@receiver(pre_save, sender=InventoryItem)
+def mark_qr_stale(sender, instance, update_fields=None, **kwargs):
+    """
+    Flag a save whose QR payload changed so the stored image is re-rendered;
+    the status rides along in the same UPDATE.
+    """
+    _, payload_fields = TARGETS[TARGET_TYPES[sender]]
+    if update_fields is not None and not payload_fields & set(update_fields):
+        return
+    if not getattr(settings, 'QR_STORE_IMAGES', False):
+        instance.qr_status = 'ready'  # served on demand by QRCodeView
+        return
+    if instance.pk is None or not instance.qr_code or instance.qr_hash != payload_hash(instance):
+        instance.qr_status = 'pending'
+        instance._qr_stale = True
+
+
+@receiver(post_save, sender=Device)
+@receiver(post_save, sender=InventoryItem)
+def enqueue_qr_render(sender, instance, update_fields=None, **kwargs):
+    if not getattr(instance, '_qr_stale', False):
+        return
+    instance._qr_stale = False
+    if update_fields is not None and 'qr_status' not in update_fields:
+        sender.objects.filter(pk=instance.pk).update(qr_status='pending')
+    enqueue(TARGET_TYPES[sender], [instance.pk])
@@ -0,0 +1,194 @@
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from hospitals.testing import create_engineer, create_hospital, create_user
+from device.models import Device
+from inventory.models import InventoryItem
+from .models import QRJob
+from .render import QRDiskCache
+from .views import qr_url
+from .worker import DEVICE, INVENTORY, enqueue, payload_hash, run_pending
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), QR_STORE_IMAGES=True, QR_WORKER='command')
+class QRPipelineTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        cls.hospital = create_hospital(cls.user)
+        create_engineer(cls.user, cls.hospital)
+
+    def create_device(self, **kwargs):
+        return Device.objects.create(
+            hospital=self.hospital, make_model='Monitor', serial_number='SN-1', asset_number='A-1', **kwargs
+        )
+
+    def test_save_queues_instead_of_rendering(self):
+        device = self.create_device()
+        device.refresh_from_db()
+        self.assertEqual(device.qr_status, 'pending')
+        self.assertFalse(device.qr_code)
+        self.assertTrue(QRJob.objects.filter(target_type=DEVICE, target_id=device.id, status=QRJob.PENDING).exists())
+
+        self.assertEqual(run_pending(), 1)
+        device.refresh_from_db()
+        self.assertEqual(device.qr_status, 'ready')
+        self.assertEqual(device.qr_hash, payload_hash(device))
+        self.assertTrue(device.qr_code.storage.exists(device.qr_code.name))
+        self.assertFalse(QRJob.objects.exists())
+
+    def test_unchanged_payload_is_not_rerendered(self):
+        device = self.create_device()
+        run_pending()
+        device.refresh_from_db()
+        name = device.qr_code.name
+
+        device.make_model = 'Monitor II'  # not part of the payload
+        device.save()
+        self.assertFalse(QRJob.objects.exists())
+
+        enqueue(DEVICE, [device.id])
+        with mock.patch.object(Device, 'generate_qr_code') as generate:
+            run_pending()
+        generate.assert_not_called()
+        device.refresh_from_db()
+        self.assertEqual((device.qr_code.name, device.qr_status), (name, 'ready'))
+
+    def test_payload_change_rerenders_and_replaces_file(self):
+        device = self.create_device()
+        run_pending()
+        device.refresh_from_db()
+        old_name = device.qr_code.name
+
+        device.asset_number = 'A-2'
+        device.save()
+        self.assertEqual(Device.objects.get(id=device.id).qr_status, 'pending')
+        run_pending()
+        device.refresh_from_db()
+        self.assertEqual(device.qr_hash, payload_hash(device))
+        self.assertNotEqual(device.qr_code.name, old_name)
+        self.assertFalse(device.qr_code.storage.exists(old_name))
+
+    def test_pending_jobs_are_deduplicated(self):
+        device = self.create_device()
+        enqueue(DEVICE, [device.id, device.id])
+        device.nfc_uuid = 'tag-1'
+        device.save(update_fields=['nfc_uuid'])
+        self.assertEqual(QRJob.objects.count(), 1)
+        self.assertEqual(Device.objects.get(id=device.id).qr_status, 'pending')
+
+    def test_failures_are_retried_then_kept(self):
+        device = self.create_device()
+        with mock.patch.object(Device, 'generate_qr_code', side_effect=OSError('disk full')), \
+                self.assertLogs('qrcodes.worker', 'ERROR'):
+            run_pending()
+        job = QRJob.objects.get()
+        self.assertEqual((job.status, job.attempts, job.error), (QRJob.FAILED, 3, 'disk full'))
+        self.assertEqual(Device.objects.get(id=device.id).qr_status, 'failed')
+
+    def test_orphaned_running_jobs_are_recovered(self):
+        device = self.create_device()
+        QRJob.objects.update(status=QRJob.RUNNING, updated_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual(Device.objects.get(id=device.id).qr_status, 'ready')
+
+    def test_bulk_action_queues_items(self):
+        items = [
+            InventoryItem.objects.create(hospital=self.hospital, name=f'Item {i}', sku=f'SKU-{i}') for i in range(3)
+        ]
+        run_pending()
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.patch(
+            reverse('inventory-bulk', kwargs={'hospital_id': self.hospital.id}),
+            {'action': 'generate_qr', 'item_ids': [item.id for item in items]}, format='json',
+        )
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(QRJob.objects.filter(target_type=INVENTORY).count(), 3)
+        run_pending()
+        self.assertEqual(set(InventoryItem.objects.values_list('qr_status', flat=True)), {'ready'})
+
+
+@override_settings(QR_CACHE_DIR=tempfile.mkdtemp())
+class OnDemandQRTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        cls.hospital = create_hospital(cls.user)
+        cls.devices = [
+            Device.objects.create(hospital=cls.hospital, make_model='Monitor', serial_number=f'SN-{i}', asset_number=f'A-{i}')
+            for i in range(12)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_nothing_is_stored_or_queued(self):
+        device = Device.objects.get(id=self.devices[0].id)
+        self.assertEqual(device.qr_status, 'ready')
+        self.assertFalse(device.qr_code)
+        self.assertFalse(QRJob.objects.exists())
+
+    def test_signed_url_is_public_and_immutable(self):
+        url = qr_url(self.devices[0])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertTrue(response.content.startswith(b'\x89PNG'))
+        self.assertIn('immutable', response['Cache-Control'])
+
+        svg = self.client.get(qr_url(self.devices[0], fmt='svg'))
+        self.assertEqual(svg['Content-Type'], 'image/svg+xml')
+        self.assertIn(b'<svg', svg.content)
+
+    def test_url_changes_with_payload(self):
+        device = self.devices[1]
+        old_url = qr_url(device)
+        device.asset_number = 'A-99'
+        device.save()
+        self.assertNotEqual(qr_url(device), old_url)
+        # The stale link no longer authorizes anonymous access
+        self.assertEqual(self.client.get(old_url).status_code, 401)
+
+    def test_unsigned_requests_need_authentication(self):
+        url = reverse('device-qr', kwargs={'hospital_id': self.hospital.id, 'pk': self.devices[0].id, 'fmt': 'png'})
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.client.force_authenticate(self.user)
+        response = self.client.get(url)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_sheet(self):
+        self.client.force_authenticate(self.user)
+        url = reverse('qr-sheet', kwargs={'hospital_id': self.hospital.id, 'fmt': 'pdf'})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content.startswith(b'%PDF'))
+        ids = ','.join(str(device.id) for device in self.devices[:3])
+        png = self.client.get(reverse('qr-sheet', kwargs={'hospital_id': self.hospital.id, 'fmt': 'png'}), {'ids': ids})
+        self.assertEqual(png['Content-Type'], 'image/png')
+        self.assertEqual(self.client.get(url, {'ids': 'x'}).status_code, 400)
+
+    def test_serializer_links(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get(reverse('device-list', kwargs={'hospital_id': self.hospital.id}))
+        self.assertTrue(response.data['results'][0]['qr_url'].startswith('http://testserver/api/'))
+
+
+class QRDiskCacheTests(SimpleTestCase):
+    def test_lru_eviction(self):
+        cache = QRDiskCache(tempfile.mkdtemp(), max_bytes=350)
+        for key, mtime in (('aa1', 2), ('bb2', 1), ('cc3', 3)):
+            cache.get_or_render(key, 'png', lambda: b'x' * 100)
+            os.utime(cache.path(key, 'png'), (mtime, mtime))
+        # bb2 is the oldest entry until it is read, which leaves aa1 least recently used
+        self.assertEqual(cache.get_or_render('bb2', 'png', lambda: b'miss'), b'x' * 100)
+        cache.get_or_render('dd4', 'png', lambda: b'y' * 100)
+        self.assertFalse(os.path.exists(cache.path('aa1', 'png')))
+        self.assertTrue(os.path.exists(cache.path('bb2', 'png')))
+        self.assertLessEqual(cache.size, 350)
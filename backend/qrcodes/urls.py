@@ -0,0 +1,11 @@
+from django.urls import path
+from .views import QRCodeView, QRSheetView
+from .worker import DEVICE, INVENTORY
+
+urlpatterns = [
+    # Rendered on demand: qr.png / qr.svg
+    path('<int:hospital_id>/devices/<int:pk>/qr.<str:fmt>', QRCodeView.as_view(target_type=DEVICE), name='device-qr'),
+    path('<int:hospital_id>/inventory/<int:pk>/qr.<str:fmt>', QRCodeView.as_view(target_type=INVENTORY), name='inventory-qr'),
+    # Printable label sheets: sheet.pdf / sheet.png
+    path('<int:hospital_id>/qr/sheet.<str:fmt>', QRSheetView.as_view(), name='qr-sheet'),
+]
@@ -0,0 +1,116 @@
+from django.core import signing
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.crypto import constant_time_compare
+from rest_framework import status
+from rest_framework.exceptions import NotAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from device.models import Device
+from inventory.models import InventoryItem
+from .render import FORMATS, SHEET_FORMATS, content_key, get_disk_cache, render, render_sheet
+from .worker import DEVICE, INVENTORY, TARGET_TYPES, payload_hash
+
+MAX_SHEET_LABELS = 1000
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+# target_type -> (URL name, columns the payload and sheet caption read)
+QR_VIEWS = {
+    DEVICE: ('device-qr', ('id', 'hospital_id', 'asset_number', 'nfc_uuid', 'make_model')),
+    INVENTORY: ('inventory-qr', ('id', 'hospital_id', 'name', 'sku')),
+}
+
+_signer = signing.Signer(salt='qrcodes.url')
+
+
+def _token(target_type, pk, digest):
+    return _signer.signature(f"{target_type}:{pk}:{digest}")
+
+
+def qr_url(obj, request=None, fmt='png'):
+    """
+    Capability URL for obj's QR image. The token signs the payload hash, so
+    the URL changes whenever the encoded content does and its response can be
+    cached forever without authentication.
+    """
+    target_type = TARGET_TYPES[type(obj)]
+    url = reverse(QR_VIEWS[target_type][0], kwargs={'hospital_id': obj.hospital_id, 'pk': obj.pk, 'fmt': fmt})
+    url = f"{url}?t={_token(target_type, obj.pk, payload_hash(obj))}"
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+class QRCodeView(APIView):
+    """
+    Renders a device's or item's QR code on demand (qr.png / qr.svg) through
+    the content-addressed disk cache. Signed URLs from qr_url() are public and
+    immutable; otherwise the caller must be authenticated and gets an ETag.
+    """
+    permission_classes = [AllowAny]
+    target_type = None
+
+    def get(self, request, hospital_id, pk, fmt):
+        if fmt not in FORMATS:
+            raise Http404
+        model = {DEVICE: Device, INVENTORY: InventoryItem}[self.target_type]
+        fields = QR_VIEWS[self.target_type][1]
+        obj = get_object_or_404(model.objects.only(*fields), hospital_id=hospital_id, pk=pk)
+        digest = payload_hash(obj)
+        signed = constant_time_compare(request.query_params.get('t', ''), _token(self.target_type, obj.pk, digest))
+        if not signed and not request.user.is_authenticated:
+            raise NotAuthenticated()
+
+        etag = f'"{digest[:32]}"'
+        not_modified = get_conditional_response(request._request, etag=etag)
+        if not_modified is None:
+            payload = obj.qr_payload()
+            data = get_disk_cache().get_or_render(content_key(fmt, payload), fmt, lambda: render(payload, fmt))
+            response = HttpResponse(data, content_type=FORMATS[fmt])
+        else:
+            response = not_modified
+        response['ETag'] = etag
+        response['Cache-Control'] = IMMUTABLE if signed else 'private, no-cache'
+        return response
+
+
+class QRSheetView(APIView):
+    """
+    Printable label sheet (sheet.pdf / sheet.png) for a hospital's devices
+    (?target=devices, the default) or inventory items (?target=inventory),
+    optionally limited to ?ids=1,2,3. Labels are composed in one pass and the
+    sheet is cached by content like single codes.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, hospital_id, fmt):
+        if fmt not in SHEET_FORMATS:
+            raise Http404
+        target = request.query_params.get('target', 'devices')
+        if target not in ('devices', 'inventory'):
+            return Response({"error": "target must be 'devices' or 'inventory'"}, status=status.HTTP_400_BAD_REQUEST)
+        target_type, model = (DEVICE, Device) if target == 'devices' else (INVENTORY, InventoryItem)
+
+        queryset = model.objects.filter(hospital_id=hospital_id).only(*QR_VIEWS[target_type][1]).order_by('id')
+        ids = request.query_params.get('ids')
+        if ids:
+            try:
+                queryset = queryset.filter(id__in=[int(value) for value in ids.split(',') if value.strip()])
+            except ValueError:
+                return Response({"error": "ids must be comma-separated integers"}, status=status.HTTP_400_BAD_REQUEST)
+        objects = list(queryset[:MAX_SHEET_LABELS + 1])
+        if len(objects) > MAX_SHEET_LABELS:
+            return Response({"error": f"At most {MAX_SHEET_LABELS} labels per sheet"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if target_type == DEVICE:
+            labels = [(obj.qr_payload(), obj.asset_number) for obj in objects]
+        else:
+            labels = [(obj.qr_payload(), obj.sku) for obj in objects]
+        key = content_key('sheet', fmt, *(part for label in labels for part in label))
+        data = get_disk_cache().get_or_render(key, fmt, lambda: render_sheet(labels, fmt))
+        response = HttpResponse(data, content_type=SHEET_FORMATS[fmt])
+        response['Content-Disposition'] = f'inline; filename="qr_labels_{hospital_id}.{fmt}"'
+        response['ETag'] = f'"{key[:32]}"'
+        response['Cache-Control'] = 'private, no-cache'
+        return response
@@ -0,0 +1,208 @@
+import hashlib
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+from device.models import Device
+from inventory.models import InventoryItem
+from .models import QRJob
+
+logger = logging.getLogger(__name__)
+
+DEVICE = 'device'
+INVENTORY = 'inventoryitem'
+
+# target_type -> (model, fields whose change alters the encoded payload)
+TARGETS = {
+    DEVICE: (Device, {'hospital', 'hospital_id', 'asset_number', 'nfc_uuid'}),
+    INVENTORY: (InventoryItem, {'hospital', 'hospital_id'}),
+}
+TARGET_TYPES = {model: target_type for target_type, (model, _) in TARGETS.items()}
+
+BATCH_SIZE = 50
+RENDER_THREADS = 4
+MAX_ATTEMPTS = 3
+STALE_AFTER = timedelta(minutes=5)  # a running job this old was orphaned by a dead worker
+POLL_INTERVAL = 30  # seconds the in-process worker sleeps between unprompted checks
+
+
+def payload_hash(obj):
+    return hashlib.sha256(obj.qr_payload().encode()).hexdigest()
+
+
+def enqueue(target_type, ids, mark_pending=False):
+    """
+    Queue a render for each target id (a target with a pending job is not
+    queued twice) and wake the worker once the transaction commits.
+    """
+    ids = list(ids)
+    if not ids:
+        return 0
+    if mark_pending:
+        model, _ = TARGETS[target_type]
+        model.objects.filter(id__in=ids).exclude(qr_status='pending').update(qr_status='pending')
+    QRJob.objects.bulk_create(
+        [QRJob(target_type=target_type, target_id=target_id) for target_id in ids], ignore_conflicts=True
+    )
+    transaction.on_commit(wake)
+    return len(ids)
+
+
+def recover_stale():
+    """Put jobs orphaned by a dead worker back in the queue."""
+    stale = QRJob.objects.filter(status=QRJob.RUNNING, updated_at__lt=timezone.now() - STALE_AFTER)
+    queued = QRJob.objects.filter(
+        status=QRJob.PENDING, target_type=OuterRef('target_type'), target_id=OuterRef('target_id')
+    )
+    try:
+        with transaction.atomic():
+            stale.filter(Exists(queued)).delete()
+            stale.update(status=QRJob.PENDING, updated_at=timezone.now())
+    except IntegrityError:
+        pass  # raced with a fresh enqueue; picked up on the next pass
+
+
+def claim_batch(limit):
+    with transaction.atomic():
+        jobs = QRJob.objects.filter(status=QRJob.PENDING).order_by('id')
+        if connection.features.has_select_for_update_skip_locked:
+            jobs = jobs.select_for_update(skip_locked=True)
+        claimed = list(jobs[:limit])
+        if claimed:
+            QRJob.objects.filter(id__in=[job.id for job in claimed]).update(
+                status=QRJob.RUNNING, attempts=F('attempts') + 1, updated_at=timezone.now()
+            )
+    return claimed
+
+
+def render(obj):
+    """
+    Render obj's QR image unless the stored one already encodes its payload.
+    Returns (changed, replaced file name); runs in the render pool, so no queries.
+    """
+    digest = payload_hash(obj)
+    if obj.qr_code and obj.qr_hash == digest and obj.qr_code.storage.exists(obj.qr_code.name):
+        return False, None
+    replaced = obj.qr_code.name if obj.qr_code else None
+    obj.generate_qr_code()
+    obj.qr_hash = digest
+    return True, replaced
+
+
+def _render_safely(obj):
+    try:
+        return render(obj) + (None,)
+    except Exception as exc:  # one bad row must not fail the batch
+        logger.exception("QR render failed for %s #%s", type(obj).__name__, obj.pk)
+        return False, None, str(exc)
+
+
+def process_batch(limit=None):
+    """Claim and render one batch of jobs; returns the number of jobs handled."""
+    recover_stale()
+    jobs = claim_batch(limit or getattr(settings, 'QR_BATCH_SIZE', BATCH_SIZE))
+    if not jobs:
+        return 0
+
+    by_type = defaultdict(list)
+    for job in jobs:
+        by_type[job.target_type].append(job)
+
+    finished, failed = [], []
+    for target_type, type_jobs in by_type.items():
+        if target_type not in TARGETS:
+            failed += [(job, None, f"Unknown target type {target_type!r}") for job in type_jobs]
+            continue
+        model, _ = TARGETS[target_type]
+        objects = model.objects.in_bulk([job.target_id for job in type_jobs])
+        # Deleted targets have nothing left to render
+        finished += [job for job in type_jobs if job.target_id not in objects]
+        type_jobs = [job for job in type_jobs if job.target_id in objects]
+
+        with ThreadPoolExecutor(max_workers=getattr(settings, 'QR_RENDER_THREADS', RENDER_THREADS)) as pool:
+            results = list(pool.map(_render_safely, [objects[job.target_id] for job in type_jobs]))
+
+        rendered, replaced = [], []
+        for job, (changed, old_name, error) in zip(type_jobs, results):
+            obj = objects[job.target_id]
+            if error is not None:
+                failed.append((job, obj, error))
+                continue
+            obj.qr_status = 'ready'
+            rendered.append(obj)
+            finished.append(job)
+            if changed and old_name and old_name != obj.qr_code.name:
+                replaced.append((obj.qr_code.storage, old_name))
+        # bulk_update skips save signals, so storing the image doesn't re-enqueue it
+        model.objects.bulk_update(rendered, ['qr_code', 'qr_hash', 'qr_status'])
+        for storage, name in replaced:
+            storage.delete(name)
+
+    QRJob.objects.filter(id__in=[job.id for job in finished]).delete()
+    for job, obj, error in failed:
+        _retry_or_fail(job, obj, error)
+    return len(jobs)
+
+
+def _retry_or_fail(job, obj, error):
+    if job.attempts + 1 < MAX_ATTEMPTS:
+        try:
+            with transaction.atomic():
+                QRJob.objects.filter(id=job.id).update(status=QRJob.PENDING, error=error)
+        except IntegrityError:
+            # The target was queued again meanwhile; that job supersedes this one
+            QRJob.objects.filter(id=job.id).delete()
+        return
+    QRJob.objects.filter(id=job.id).update(status=QRJob.FAILED, error=error)
+    if obj is not None:
+        type(obj).objects.filter(pk=obj.pk).update(qr_status='failed')
+
+
+def run_pending():
+    """Process batches until the queue is empty; returns the number of jobs handled."""
+    total = 0
+    while True:
+        handled = process_batch()
+        if not handled:
+            return total
+        total += handled
+
+
+class QRWorker(threading.Thread):
+    """In-process worker: drains the queue whenever woken, and every POLL_INTERVAL."""
+
+    def __init__(self):
+        super().__init__(name='qr-worker', daemon=True)
+        self.wakeup = threading.Event()
+
+    def run(self):
+        while True:
+            self.wakeup.wait(POLL_INTERVAL)
+            self.wakeup.clear()
+            try:
+                run_pending()
+            except Exception:
+                logger.exception("QR worker pass failed")
+            finally:
+                close_old_connections()
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def wake():
+    """Nudge the in-process worker (started on first use) unless jobs run via process_qr_jobs."""
+    global _worker
+    if getattr(settings, 'QR_WORKER', 'command') != 'thread':
+        return
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = QRWorker()
+            _worker.start()
+    _worker.wakeup.set()
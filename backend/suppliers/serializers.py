@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from .models import Supplier, PurchaseOrder, PurchaseOrderItem
-from inventory.models import Category, InventoryItem
+from inventory.models import Category, InventoryItem, StockMovement
+from inventory.ledger import move_stock
 from inventory.serializers import InventoryItemSerializer
 from hospitals.models import Hospital
 from django.utils import timezone
@@ -100,6 +101,7 @@ class PurchaseOrderSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         items_data = validated_data.pop('items', None)
         hospital_id = validated_data.pop('hospital_id', None)
+        was_received = instance.status == 'RECEIVED'
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
         instance.save()
@@ -118,12 +120,13 @@ class PurchaseOrderSerializer(serializers.ModelSerializer):
             for item in existing_item_ids.values():
                 item.delete()
 
-        if instance.status == 'RECEIVED':
-            for item in instance.items.all():
-                inventory_item = item.inventory_item
-                inventory_item.quantity += item.received_quantity
-                inventory_item.supplier = instance.supplier
-                inventory_item.save()
+        if instance.status == 'RECEIVED' and not was_received:
+            # Stock is received once, as ledger movements, when the order first becomes RECEIVED
+            for item in instance.items.select_related('inventory_item'):
+                if item.received_quantity:
+                    move_stock(item.inventory_item, StockMovement.RECEIPT, item.received_quantity,
+                               reference=instance.po_number)
+                InventoryItem.objects.filter(pk=item.inventory_item_id).update(supplier=instance.supplier)
 
         instance.update_total_cost()
         return instance
\ No newline at end of file
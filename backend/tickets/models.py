@@ -59,19 +59,35 @@ class Ticket(models.Model):
     #            last_number = int(last_ticket.ticket_id.split('-')[1]) if last_ticket and last_ticket.ticket_id else 1000
     #            self.ticket_id = f"TIC{last_number + 1}"
     #    super().save(*args, **kwargs)
+    @staticmethod
+    def last_number(hospital_id):
+        """Number of the hospital's newest ticket id, TIC-<number> (1000 if there is none)."""
+        last_ticket = Ticket.objects.filter(hospital_id=hospital_id).order_by('-id').first()
+        if last_ticket and last_ticket.ticket_id and '-' in last_ticket.ticket_id:
+            try:
+                return int(last_ticket.ticket_id.split('-')[1])
+            except (IndexError, ValueError):
+                return 1000  # Fallback to 1000 if parsing fails
+        return 1000  # Start at 1000 if no valid ticket_id
+
+    @staticmethod
+    def next_number(hospital_id):
+        """
+        The hospital's next ticket number. Locks the hospital row until the
+        caller's transaction ends, so everything that numbers tickets (saves,
+        the calibration scheduler) takes turns; call inside transaction.atomic.
+        """
+        list(Hospital.objects.select_for_update().filter(pk=hospital_id).values_list('pk'))
+        return Ticket.last_number(hospital_id) + 1
+
     def save(self, *args, **kwargs):
         if not self.ticket_id:
+            # The insert stays inside the lock so the next number sees this ticket
             with transaction.atomic():
-                last_ticket = Ticket.objects.filter(hospital=self.hospital).order_by('-id').first()
-                if last_ticket and last_ticket.ticket_id and '-' in last_ticket.ticket_id:
-                    try:
-                        last_number = int(last_ticket.ticket_id.split('-')[1])
-                    except (IndexError, ValueError):
-                        last_number = 1000  # Fallback to 1000 if parsing fails
-                else:
-                    last_number = 1000  # Start at 1000 if no valid ticket_id
-                self.ticket_id = f"TIC-{last_number + 1:04d}"  # Ensure consistent format
-        super().save(*args, **kwargs)    
+                self.ticket_id = f"TIC-{Ticket.next_number(self.hospital_id):04d}"  # Ensure consistent format
+                super().save(*args, **kwargs)
+            return
+        super().save(*args, **kwargs)
     
 class TicketComment(models.Model):
     ticket = models.ForeignKey(Ticket, on_delete=models.CASCADE, related_name='comments')